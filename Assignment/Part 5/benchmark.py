@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+""" Load Benchmarks
+
+This script times how long it takes to build a TransactionSystem, both from the sample web api
+response and from scaled-up synthetic data, to show that loading grows linearly with the number of records.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * loader - To load responses record by record
+    * validator - To validate records with compiled schemas
+    * columnar - To compare the columnar transaction system with the object one
+    * snapshot - To time cold and warm loads through the snapshot cache
+    * transaction - To compare the slotted entity classes with dict backed ones
+    * parallel - To time validation across a pool of processes
+    * sqlite_system - To compare the SQLite transaction system with the object one
+    * lazy - To time the first query of a system which loads its sections on demand
+    * sharded - To time a report over every branch with a growing number of processes
+    * generator - To generate the synthetic data
+    * json - To deal with Json Files
+    * time - To time the loads
+    * tracemalloc - To measure the peak memory of the loads
+
+This file contains the following functions:
+
+    * time_call - Returns the best wall time of a callable over a number of repeats.
+    * peak_memory - Returns the peak memory allocated while running a callable.
+    * load_whole - Loads a response file by decoding it whole and handing it to the schema.
+    * load_streaming - Loads a response file record by record.
+    * load_into_sqlite - Loads a response file into a SQLite database in memory.
+    * load_lazily - Loads a response file whose sections are built on first access.
+    * first_inventory - Loads a response file and returns the inventory of the branch of its first staff.
+    * validation_rates - Returns the records per second validated by marshmallow and by the compiled schemas.
+    * retained_memory - Returns the result of a callable and the memory it still holds.
+    * all_staff_performance - Runs the staff performance query for every staff, with or without the query cache.
+    * dict_backed - Returns a dict backed twin of a slotted entity class.
+    * build_entities - Builds the entity objects of validated response data with the given classes.
+    * replicate - Returns a response with the records of every section repeated.
+    * parallel_scaling - Returns the load time of a response with 1 to N processes.
+    * branch_report - Loads a response into per branch shards and runs a report over every branch.
+    * sharded_scaling - Returns the time of the branch report with 1 to N processes.
+    * main - Runs the benchmarks and prints the results.
+
+"""
+# Built-In Packages
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# User Packages
+from columnar import ColumnarTransactionSystem
+from generator import generate_records
+from lazy import load_lazy
+from loader import load_stream
+from parallel import load_parallel
+from schema import TransactionSystemSchema
+from sharded import ShardedTransactionSystem
+from snapshot import load_cached
+from sqlite_system import load_sqlite
+from transaction import Staff, Customer, Branch, Transaction, Product, Purchase
+from validator import CompiledSchema
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses', 'date.json')
+
+SYNTHETIC_SIZES = (10_000, 100_000, 1_000_000)
+
+COLUMNAR_SIZE = 100_000
+
+PARALLEL_COPIES = 25
+
+JUNE = (datetime(2018, 6, 1), datetime(2018, 7, 1))
+
+
+def time_call(func, *args, repeat=3):
+    """
+    Timing a callable
+
+    ...
+
+    Parameters
+    ----------
+    func : callable
+        Callable to be timed.
+
+    args : tuple
+        Positional arguments passed to the callable.
+
+    repeat : int
+        Number of times the callable is run.
+
+    Returns
+    -------
+    float
+        Best wall time in seconds.
+    """
+    _best = float('inf')
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        func(*args)
+        _best = min(_best, time.perf_counter() - _start)
+    return _best
+
+
+def peak_memory(func, *args):
+    """
+    Measuring the peak memory allocated by a callable
+
+    ...
+
+    Parameters
+    ----------
+    func : callable
+        Callable to be measured.
+
+    args : tuple
+        Positional arguments passed to the callable.
+
+    Returns
+    -------
+    int
+        Peak number of bytes allocated while the callable ran.
+    """
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_whole(path):
+    """ Loading a response file by decoding it whole and handing the dict to TransactionSystemSchema """
+    with open(path, 'r') as json_file:
+        return TransactionSystemSchema().load(json.load(json_file))
+
+
+def load_streaming(path):
+    """ Loading a response file record by record with the streaming loader """
+    with open(path, 'r') as json_file:
+        return load_stream(json_file)
+
+
+def load_into_sqlite(path):
+    """ Loading a response file into a SQLite database in memory """
+    with open(path, 'r') as json_file:
+        return load_sqlite(json_file)
+
+
+def load_lazily(path):
+    """ Loading a response file whose sections are validated and built on first access """
+    with open(path, 'r') as json_file:
+        return load_lazy(json_file)
+
+
+def first_inventory(load, path):
+    """ Loading a response file with load, returns the inventory of the branch of its first staff """
+    with open(path, 'r') as json_file:
+        _branch_id = json.load(json_file)['STAFF'][0]['B_Id']
+    return load(path).get_branch_inventory(_branch_id)
+
+
+def validation_rates(data):
+    """
+    Measuring the validation throughput of each section
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    Returns
+    -------
+    dict
+        (marshmallow, compiled) records per second, keyed by section name.
+    """
+    _rates = {}
+    for _section, _field in TransactionSystemSchema().fields.items():
+        _records = data.get(_section, [])
+        if not _records:
+            continue
+        _schema = type(_field.schema)(many=True)
+        _compiled = CompiledSchema(type(_field.schema)())
+        _rates[_section] = (len(_records) / time_call(_schema.load, _records),
+                            len(_records) / time_call(_compiled.load_many, _records))
+    return _rates
+
+
+def retained_memory(func, *args):
+    """
+    Measuring the memory a callable allocates and keeps
+
+    ...
+
+    Parameters
+    ----------
+    func : callable
+        Callable to be measured.
+
+    args : tuple
+        Positional arguments passed to the callable.
+
+    Returns
+    -------
+    tuple
+        Result of the callable, and the number of bytes it allocated which are still held.
+    """
+    tracemalloc.start()
+    try:
+        _result = func(*args)
+        return _result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def all_staff_performance(ts, cached=False):
+    """ Running get_staff_performance for every staff, with the query cache emptied first unless cached """
+    if not cached:
+        ts.clear_cache()
+    for _staff in ts.staffs:
+        try:
+            ts.get_staff_performance(_staff.id)
+        except LookupError:
+            continue
+
+
+def dict_backed(cls):
+    """
+    Making a dict backed twin of a slotted entity class, laid out as the entity classes were before __slots__
+
+    ...
+
+    Parameters
+    ----------
+    cls : type
+        Entity class, whose __slots__ are in the order of its constructor arguments.
+
+    Returns
+    -------
+    type
+        Class without __slots__ taking the same constructor arguments.
+    """
+    _slots = cls.__slots__
+
+    def __init__(self, *args):
+        for _name, _value in zip(_slots, args):
+            setattr(self, _name, _value)
+    return type(f"Dict{cls.__name__}", (), {'__init__': __init__})
+
+
+def build_entities(data, classes):
+    """
+    Building the entity objects of validated response data
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Validated response data.
+
+    classes : tuple
+        Staff, Customer, Branch, Transaction, Product and Purchase classes to build with.
+
+    Returns
+    -------
+    list
+        Lists of the built objects.
+    """
+    _staff_cls, _customer_cls, _branch_cls, _transaction_cls, _product_cls, _purchase_cls = classes
+    _products = {_pr['Id']: _product_cls(_pr['Id'], _pr['name'], _pr['Price']) for _pr in data['PRODUCTS']}
+    _branches = {}
+    for _br in data['BRANCHES']:
+        _branches.setdefault(_br['B_Id'], _branch_cls(_br['B_Id'], _br['name'], {}))
+    _customers = {_cu['Id']: _customer_cls(_cu['Id'], _cu['name'], _cu['Email']) for _cu in data['CUSTOMERS']}
+    _staffs = {_st['Id']: _staff_cls(_st['Id'], _st['name'], _st['Email'], _branches[_st['B_Id']])
+               for _st in data['STAFF']}
+    _transactions = {_tr['T_Id']: _transaction_cls(_tr['T_Id'], _staffs[_tr['S_Id']], _customers[_tr['C_Id']],
+                                                   _branches[_tr['B_Id']], _tr['DateTime'])
+                     for _tr in data['TRANSACTIONS']}
+    _purchases = [_purchase_cls(_pu['P_Id'], _transactions[_pu['T_Id']], _products[_pu['Pr_Id']], _pu['Quantity'],
+                                _pu['T_price']) for _pu in data['PURCHASES']]
+    return [_products, _branches, _customers, _staffs, _transactions, _purchases]
+
+
+def replicate(data, copies):
+    """
+    Repeating the records of every section of a response
+
+    The repeated records keep their Ids, so the response stays valid and links to the same objects, while the
+    validation work grows with the number of copies.
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    copies : int
+        Number of times the records are repeated.
+
+    Returns
+    -------
+    dict
+        Response with the repeated records.
+    """
+    return {_section: _records * copies for _section, _records in data.items()}
+
+
+def parallel_scaling(data, max_workers=None):
+    """
+    Timing the parallel load of a response with a growing number of processes
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    max_workers : int, optional
+        Largest number of processes, the number of CPUs if not given.
+
+    Returns
+    -------
+    dict
+        Best wall time in seconds, keyed by the number of processes.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    return {_workers: time_call(load_parallel, data, _workers) for _workers in range(1, max_workers + 1)}
+
+
+def branch_report(data, workers):
+    """ Loading a response into per branch shards, returns the sales summary, inventories and top staff """
+    with ShardedTransactionSystem(data, workers) as _sharded:
+        return _sharded.get_sales_summary(), _sharded.map_branches('get_branch_inventory'), _sharded.get_top('staff')
+
+
+def sharded_scaling(data, max_workers=None):
+    """
+    Timing the load and report over every branch of a response with a growing number of processes
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    max_workers : int, optional
+        Largest number of processes, the number of CPUs if not given.
+
+    Returns
+    -------
+    dict
+        Wall time in seconds, keyed by the number of processes.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    return {_workers: time_call(branch_report, data, _workers, repeat=1) for _workers in range(1, max_workers + 1)}
+
+
+def main():
+    """
+    Runs the load benchmarks on the sample response and on synthetic data
+    """
+    with open(RESPONSE_FILE, 'r') as json_file:
+        data = json.load(json_file)
+
+    _records = sum(len(section) for section in data.values())
+    _seconds = time_call(TransactionSystemSchema().load, data)
+    print(f"Responses/date.json: {_records} records loaded in {_seconds:.3f} s")
+
+    for _section, (_marshmallow, _compiled) in validation_rates(data).items():
+        print(f"Responses/date.json: {_section} validated at {_marshmallow:,.0f} records/s with marshmallow, "
+              f"{_compiled:,.0f} records/s compiled ({_compiled / _marshmallow:.1f}x)")
+
+    for _name, _load in (('json.load + schema', load_whole), ('streaming', load_streaming),
+                         ('sqlite', load_into_sqlite)):
+        print(f"Responses/date.json: {_name} load in {time_call(_load, RESPONSE_FILE):.3f} s, "
+              f"peak memory {peak_memory(_load, RESPONSE_FILE) / 2 ** 20:.2f} MiB")
+
+    for _name, _load in (('streaming', load_streaming), ('lazy', load_lazily)):
+        print(f"Responses/date.json: {_name} load and first branch inventory "
+              f"in {time_call(first_inventory, _load, RESPONSE_FILE):.3f} s")
+
+    _sqlite = load_into_sqlite(RESPONSE_FILE)
+    for _name, _ts in (('objects', load_streaming(RESPONSE_FILE)), ('sqlite', _sqlite)):
+        print(f"Responses/date.json {_name}: performance of every staff "
+              f"in {time_call(all_staff_performance, _ts):.3f} s, "
+              f"{time_call(all_staff_performance, _ts, True):.4f} s from the query cache, "
+              f"transactions of June in {time_call(_ts.get_transactions_between, *JUNE):.4f} s")
+    _sqlite.close()
+
+    _slotted = (Staff, Customer, Branch, Transaction, Product, Purchase)
+    _data = generate_records(transactions=COLUMNAR_SIZE // 2, purchases=COLUMNAR_SIZE)
+    for _name, _classes in (('dict backed', tuple(dict_backed(_cls) for _cls in _slotted)), ('slotted', _slotted)):
+        _bytes = retained_memory(build_entities, _data, _classes)[1]
+        print(f"Synthetic {_name} entities: {_bytes / COLUMNAR_SIZE:.0f} bytes per purchase")
+
+    _cache_dir = tempfile.mkdtemp()
+    try:
+        _cold = time_call(load_cached, RESPONSE_FILE, _cache_dir, repeat=1)
+        _warm = time_call(load_cached, RESPONSE_FILE, _cache_dir)
+    finally:
+        shutil.rmtree(_cache_dir)
+    print(f"Responses/date.json: snapshot cache cold load in {_cold:.3f} s, warm load in {_warm:.3f} s")
+
+    _data = replicate(data, PARALLEL_COPIES)
+    _timings = parallel_scaling(_data)
+    for _workers, _seconds in _timings.items():
+        print(f"Responses/date.json x{PARALLEL_COPIES}: parallel load with {_workers} processes in {_seconds:.3f} s "
+              f"({_timings[1] / _seconds:.2f}x)")
+
+    _timings = sharded_scaling(_data)
+    for _workers, _seconds in _timings.items():
+        print(f"Responses/date.json x{PARALLEL_COPIES}: sharded load and branch report with {_workers} processes "
+              f"in {_seconds:.3f} s ({_timings[1] / _seconds:.2f}x)")
+
+    schema = TransactionSystemSchema()
+    for size in SYNTHETIC_SIZES:
+        _data = generate_records(transactions=size // 2, purchases=size)
+        _seconds = time_call(schema.make_transaction_system, _data, repeat=1)
+        print(f"Synthetic: {size} purchases linked in {_seconds:.3f} s "
+              f"({_seconds / size * 1e6:.2f} us per purchase)")
+
+    _data = generate_records(transactions=COLUMNAR_SIZE // 2, purchases=COLUMNAR_SIZE)
+    _objects, _object_bytes = retained_memory(schema.make_transaction_system, _data)
+    _columnar, _columnar_bytes = retained_memory(ColumnarTransactionSystem.from_system, _objects)
+    for _name, _ts, _bytes in (('objects', _objects, _object_bytes), ('columnar', _columnar, _columnar_bytes)):
+        print(f"Synthetic {_name}: {_bytes / COLUMNAR_SIZE:.0f} bytes per purchase, performance of every staff "
+              f"in {time_call(all_staff_performance, _ts):.3f} s, sales summary of every group "
+              f"in {time_call(_ts.get_sales_summary, repeat=1):.3f} s")
+
+
+if __name__ == '__main__':
+    main()
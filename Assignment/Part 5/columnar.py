@@ -0,0 +1,635 @@
+# -*- coding: utf-8 -*-
+""" Columnar Transaction System
+
+This module has a TransactionSystem which stores transactions and purchases as NumPy columns instead of one object
+per row: int64 Ids, datetime64 timestamps, float64 prices and int64 foreign keys holding the row of the referenced
+staff, customer, branch, transaction or product. Staff, customers, branches and products, of which there are few,
+stay objects.
+
+Transaction and Purchase objects are only made when they are asked for, from their row, so the object api keeps
+working as a lazy view over the columns while the performance and value queries run as vectorized masked sums.
+The rollup queries read daily sales tables: the quantity and revenue of every staff, customer, branch and product
+on each day it has purchases on, overall and within each branch, with their prefix sums. A table is bincounted from
+the columns by the first rollup query of its group after purchases were added, and answers range sums and top sellers
+from its prefix sums until the next purchase is added.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * numpy - For the columns and the vectorized queries.
+    * transaction - To store transaction details and perform operations on them.
+
+This file contains the following Classes:
+
+    * ColumnarTransactionSystem - This class stores the transactions and purchases as columns.
+
+"""
+# Built-In Packages
+import heapq
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+
+# External Packages
+import numpy as np
+
+# User Packages
+from rollup import PERIODS
+from transaction import Transaction, Purchase, TransactionSystem, Sales, SalesRecord, RollupRecord, PurchaseFact, \
+    SALES_GROUPS, FACT_CHUNK_SIZE
+
+__author__ = 'praveen@gyandata.com'
+
+_EPOCH = datetime(1970, 1, 1)
+
+_MICROSECOND = timedelta(microseconds=1)
+
+# Columns of each table with the typecode of the buffer rows are appended to, and the dtype of the column
+TRANSACTION_COLUMNS = {'id': ('q', np.int64), 'datetime': ('q', 'datetime64[us]'), 'staff': ('q', np.int64),
+                       'customer': ('q', np.int64), 'branch': ('q', np.int64)}
+
+PURCHASE_COLUMNS = {'id': ('q', np.int64), 'transaction': ('q', np.int64), 'product': ('q', np.int64),
+                    'quantity': ('q', np.int64), 'total_price': ('d', np.float64)}
+
+# Entity list of each group of the rollups
+_GROUP_ENTITIES = {'staff': 'staffs', 'customer': 'customers', 'branch': 'branches', 'product': 'products'}
+
+# Unit of the datetime64 buckets of each rollup period
+PERIOD_UNITS = {'day': 'datetime64[D]', 'month': 'datetime64[M]'}
+
+# Datetime64 day of the first day of every bucket
+_DAY = 'datetime64[D]'
+
+
+class _Table:
+    """
+    Columns of one table. Rows are appended to compact buffers and moved into the NumPy columns when they are read.
+    """
+    def __init__(self, columns):
+        self._dtypes = {_name: _dtype for _name, (_, _dtype) in columns.items()}
+        self._buffers = {_name: array(_typecode) for _name, (_typecode, _) in columns.items()}
+        self._columns = {_name: np.empty(0, dtype=_dtype) for _name, _dtype in self._dtypes.items()}
+        self.version = 0
+
+    def append(self, **row):
+        """ Appending a row """
+        for _name, _value in row.items():
+            self._buffers[_name].append(_value)
+
+    def __len__(self):
+        return len(self._columns['id']) + len(self._buffers['id'])
+
+    def __getitem__(self, name):
+        """ Returns a column, with every appended row """
+        if self._buffers['id']:
+            for _name, _buffer in self._buffers.items():
+                _rows = np.frombuffer(_buffer, dtype=_buffer.typecode).astype(self._dtypes[_name])
+                self._columns[_name] = np.concatenate((self._columns[_name], _rows))
+                self._buffers[_name] = array(_buffer.typecode)
+            self.version += 1
+        return self._columns[name]
+
+
+class _RowView(Sequence):
+    """ Read only sequence of the objects of a table, each made from its row when it is accessed """
+    def __init__(self, table, make):
+        self._table = table
+        self._make = make
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._make(_row) for _row in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row out of range")
+        return self._make(row)
+
+    def __iter__(self):
+        for _row in range(len(self)):
+            yield self._make(_row)
+
+
+class ColumnarTransactionSystem(TransactionSystem):
+    """
+    ColumnarTransactionSystem class which stores the transactions and purchases as columns.
+
+    It can be loaded like a TransactionSystem (for example load_stream(json_file, system=ColumnarTransactionSystem())
+    or from_system), and answers the same queries.
+
+    ...
+
+    Attributes
+    ----------
+    transactions : Sequence
+        Lazy view of the transactions, a new Transaction object is made on each access.
+
+    purchases : Sequence
+        Lazy view of the purchases, a new Purchase object is made on each access.
+
+    Methods
+    -------
+    from_system(ts)
+        Returns a ColumnarTransactionSystem holding the data of a transaction system.
+
+    transaction_columns(), purchase_columns()
+        Returns the columns of the transactions or purchases, keyed by name.
+
+    Raises
+    ------
+    LookupError
+        If Id (Product Id, Branch Id, etc) is not found.
+
+    """
+    def __init__(self):
+        self._transaction_table = _Table(TRANSACTION_COLUMNS)
+        self._purchase_table = _Table(PURCHASE_COLUMNS)
+        self._transaction_arrays = {}
+        self._transaction_index_version = -1
+        self._purchase_arrays = {}
+        self._purchase_index_versions = (-1, -1)
+
+        # Rows of the staff, customers, branches, products and transactions, which the foreign key columns hold
+        self._staff_rows = {}
+        self._customer_rows = {}
+        self._branch_rows = {}
+        self._product_rows = {}
+        self._transaction_rows = {}
+
+        # Daily sales tables keyed by group and whether they are kept within each branch, dropped on add_purchase
+        self._daily_tables = {}
+        super().__init__()
+
+    @classmethod
+    def from_system(cls, ts):
+        """
+        Making a columnar copy of a transaction system
+
+        ...
+
+        Parameters
+        ----------
+        ts : TransactionSystem
+            Transaction system to be copied.
+
+        Returns
+        -------
+        ColumnarTransactionSystem
+            Transaction system holding the same data.
+        """
+        _columnar = cls()
+        for _add, _entities in ((_columnar.add_product, ts.products), (_columnar.add_branch, ts.branches),
+                                (_columnar.add_customer, ts.customers), (_columnar.add_staff, ts.staffs),
+                                (_columnar.add_transaction, ts.transactions), (_columnar.add_purchase, ts.purchases)):
+            for _entity in _entities:
+                _add(_entity)
+        return _columnar
+
+    @property
+    def transactions(self):
+        return _RowView(self._transaction_table, self._make_transaction)
+
+    @transactions.setter
+    def transactions(self, transactions_):
+        self._transaction_table = _Table(TRANSACTION_COLUMNS)
+        self._transaction_rows = {}
+        self._daily_tables = {}
+        self._transaction_index_version = -1
+        self._purchase_index_versions = (-1, -1)
+        for _transaction in transactions_:
+            self.add_transaction(_transaction)
+
+    @property
+    def purchases(self):
+        return _RowView(self._purchase_table, self._make_purchase)
+
+    @purchases.setter
+    def purchases(self, purchases_):
+        self._purchase_table = _Table(PURCHASE_COLUMNS)
+        self._purchase_index_versions = (-1, -1)
+        for _purchase in purchases_:
+            self.add_purchase(_purchase)
+
+    def transaction_columns(self):
+        """ Returns the transaction columns keyed by name: id, datetime, staff, customer and branch rows """
+        return {_name: self._transaction_table[_name] for _name in TRANSACTION_COLUMNS}
+
+    def purchase_columns(self):
+        """ Returns the purchase columns keyed by name: id, transaction and product rows, quantity, total_price """
+        return {_name: self._purchase_table[_name] for _name in PURCHASE_COLUMNS}
+
+    def add_staff(self, staff_):
+        super().add_staff(staff_)
+        self._staff_rows.setdefault(staff_.id, len(self.staffs) - 1)
+
+    def add_customer(self, customer_):
+        super().add_customer(customer_)
+        self._customer_rows.setdefault(customer_.id, len(self.customers) - 1)
+
+    def add_branch(self, branch_):
+        super().add_branch(branch_)
+        self._branch_rows.setdefault(branch_.id, len(self.branches) - 1)
+
+    def add_product(self, product_):
+        super().add_product(product_)
+        self._product_rows.setdefault(product_.id, len(self.products) - 1)
+
+    def add_transaction(self, transaction_):
+        """
+        Adding a Transaction, as a row of the transaction columns
+
+        ...
+
+        Parameters
+        ----------
+        transaction_ : Transaction
+            Transaction to be added, its staff, customer and branch must be in the system.
+
+        """
+        # The first row of an Id is the one looked up, as with the other entities
+        self._transaction_rows.setdefault(transaction_.id, len(self._transaction_table))
+        self._transaction_table.append(id=transaction_.id,
+                                       datetime=(transaction_.datetime - _EPOCH) // _MICROSECOND,
+                                       staff=self._staff_rows[transaction_.staff.id],
+                                       customer=self._customer_rows[transaction_.customer.id],
+                                       branch=self._branch_rows[transaction_.branch.id])
+        self._invalidate_sales(transaction_)
+
+    def add_purchase(self, purchase_):
+        """
+        Adding a Purchase, as a row of the purchase columns
+
+        ...
+
+        Parameters
+        ----------
+        purchase_ : Purchase
+            Purchase to be added, its transaction and product must be in the system.
+
+        Raises
+        ------
+        LookupError
+            If the transaction of the purchase is not in the system.
+        """
+        _transaction_row = self._transaction_row(purchase_.transaction.id)
+        if _transaction_row < 0:
+            raise LookupError("Transaction Not in DB")
+        self._sales_summary = None
+        self._daily_tables = {}
+        self._purchase_table.append(id=purchase_.id, transaction=_transaction_row,
+                                    product=self._product_rows[purchase_.product.id],
+                                    quantity=purchase_.quantity, total_price=purchase_.total_price)
+        self._invalidate_sales(purchase_.transaction)
+
+    def _sorted_transactions(self):
+        """
+        Returns the arrays derived from the transaction columns, the datetime sort order and the sorted datetimes,
+        rebuilt when transactions were added since they were last built.
+        """
+        _datetimes = self._transaction_table['datetime']
+        if self._transaction_index_version != self._transaction_table.version:
+            _datetime_order = np.argsort(_datetimes, kind='stable')
+            self._transaction_arrays = {
+                'datetime_order': _datetime_order,
+                'sorted_datetimes': _datetimes[_datetime_order],
+            }
+            self._transaction_index_version = self._transaction_table.version
+        return self._transaction_arrays
+
+    def _sorted_purchases(self):
+        """
+        Returns the arrays derived from the purchase columns, the Id sort order and the purchase rows grouped by
+        transaction row with the offset of each group, rebuilt when rows were added since they were last built.
+        """
+        _n_transactions = len(self._transaction_table['id'])
+        _transaction = self._purchase_table['transaction']
+        _versions = (self._transaction_table.version, self._purchase_table.version)
+        if self._purchase_index_versions != _versions:
+            _offsets = np.zeros(_n_transactions + 1, dtype=np.int64)
+            np.cumsum(np.bincount(_transaction, minlength=_n_transactions), out=_offsets[1:])
+            self._purchase_arrays = {
+                'id_order': np.argsort(self._purchase_table['id'], kind='stable'),
+                'by_transaction': np.argsort(_transaction, kind='stable'),
+                'transaction_offsets': _offsets,
+            }
+            self._purchase_index_versions = _versions
+        return self._purchase_arrays
+
+    @staticmethod
+    def _find_row(ids, order, id_):
+        """ Returns the first row holding id_, given the stable sort order of the ids, or -1 """
+        _pos = np.searchsorted(ids, id_, sorter=order)
+        if _pos < len(ids) and ids[order[_pos]] == id_:
+            return int(order[_pos])
+        return -1
+
+    def _transaction_row(self, id_):
+        """ Returns the row of the transaction whose Id matches id_, or -1, without reading the columns """
+        return self._transaction_rows.get(id_, -1)
+
+    def _make_transaction(self, row):
+        """ Making the Transaction object of a row """
+        _table = self._transaction_table
+        return Transaction(int(_table['id'][row]), self.staffs[_table['staff'][row]],
+                           self.customers[_table['customer'][row]], self.branches[_table['branch'][row]],
+                           _EPOCH + int(_table['datetime'][row].astype(np.int64)) * _MICROSECOND)
+
+    def _make_purchase(self, row):
+        """ Making the Purchase object of a row """
+        _table = self._purchase_table
+        return Purchase(int(_table['id'][row]), self._make_transaction(_table['transaction'][row]),
+                        self.products[_table['product'][row]], int(_table['quantity'][row]),
+                        float(_table['total_price'][row]))
+
+    def get_transaction(self, id_):
+        _row = self._transaction_row(id_)
+        if _row < 0:
+            raise LookupError("Transaction Not in DB")
+        return self._make_transaction(_row)
+
+    def get_purchase(self, id_):
+        _row = self._find_row(self._purchase_table['id'], self._sorted_purchases()['id_order'], id_)
+        if _row < 0:
+            raise LookupError("Purchase Not in DB")
+        return self._make_purchase(_row)
+
+    def _transaction_rows_where(self, column, rows, id_):
+        """ Returns the transaction rows whose foreign key column refers to the entity whose Id matches id_ """
+        _row = rows.get(id_)
+        if _row is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self._transaction_table[column] == _row)
+
+    def get_staff_transactions(self, id_):
+        return [self._make_transaction(_row)
+                for _row in self._transaction_rows_where('staff', self._staff_rows, id_)]
+
+    def get_customer_transactions(self, id_):
+        return [self._make_transaction(_row)
+                for _row in self._transaction_rows_where('customer', self._customer_rows, id_)]
+
+    def get_branch_transactions(self, id_):
+        return [self._make_transaction(_row)
+                for _row in self._transaction_rows_where('branch', self._branch_rows, id_)]
+
+    def get_transaction_purchases(self, id_):
+        _row = self._transaction_row(id_)
+        if _row < 0:
+            return []
+        _index = self._sorted_purchases()
+        _offsets = _index['transaction_offsets']
+        return [self._make_purchase(_p_row)
+                for _p_row in _index['by_transaction'][_offsets[_row]:_offsets[_row + 1]]]
+
+    def get_transactions_between(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        _index = self._sorted_transactions()
+        _sorted = _index['sorted_datetimes']
+        start = self._as_datetime(start)
+        end = self._as_datetime(end)
+        _low = 0 if start is None else np.searchsorted(_sorted, np.datetime64(start, 'us'), side='left')
+        _high = len(_sorted) if end is None else np.searchsorted(_sorted, np.datetime64(end, 'us'), side='left')
+        _rows = _index['datetime_order'][_low:_high]
+
+        for _column, _entity_rows, _id in (('staff', self._staff_rows, staff_id),
+                                           ('customer', self._customer_rows, customer_id),
+                                           ('branch', self._branch_rows, branch_id)):
+            if _id is not None:
+                _rows = _rows[self._transaction_table[_column][_rows] == _entity_rows.get(_id, -1)]
+        return [self._make_transaction(_row) for _row in _rows]
+
+    def get_purchase_facts(self, chunk_size=FACT_CHUNK_SIZE):
+        """
+        Getting every purchase joined with its transaction, staff, customer, branch and product, gathering the
+        transaction columns of a chunk of purchase rows at once instead of making Purchase objects
+
+        ...
+
+        Parameters
+        ----------
+        chunk_size : int
+            Number of facts in a chunk.
+
+        Yields
+        ------
+        list
+            PurchaseFact of up to chunk_size purchases, in the order the purchases were added.
+        """
+        _purchases = self.purchase_columns()
+        _transactions = self.transaction_columns()
+        for _start in range(0, len(_purchases['id']), chunk_size):
+            _stop = _start + chunk_size
+            _rows = _purchases['transaction'][_start:_stop]
+            _staffs = [self.staffs[_row] for _row in _transactions['staff'][_rows].tolist()]
+            _customers = [self.customers[_row] for _row in _transactions['customer'][_rows].tolist()]
+            _branches = [self.branches[_row] for _row in _transactions['branch'][_rows].tolist()]
+            _products = [self.products[_row] for _row in _purchases['product'][_start:_stop].tolist()]
+            yield [PurchaseFact(_id, _transaction_id, _datetime, _staff.id, _staff.name, _customer.id, _customer.name,
+                                _branch.id, _branch.name, _product.id, _product.name, _quantity, _product.price,
+                                _total_price)
+                   for _id, _transaction_id, _datetime, _staff, _customer, _branch, _product, _quantity, _total_price
+                   in zip(_purchases['id'][_start:_stop].tolist(), _transactions['id'][_rows].tolist(),
+                          _transactions['datetime'][_rows].tolist(), _staffs, _customers, _branches, _products,
+                          _purchases['quantity'][_start:_stop].tolist(),
+                          _purchases['total_price'][_start:_stop].tolist())]
+
+    def get_sales_summary(self):
+        """
+        Getting the sales of every staff, customer, branch and product, with one bincount per group and measure
+
+        ...
+
+        Returns
+        -------
+        dict
+            Maps each group ('staff', 'customer', 'branch', 'product') to a dict of Sales keyed by Id. Entities
+            without purchases are left out.
+        """
+        if self._sales_summary is None:
+            _transaction = self._purchase_table['transaction']
+            _quantity = self._purchase_table['quantity']
+            _total_price = self._purchase_table['total_price']
+            _rows = {'staff': self._transaction_table['staff'][_transaction],
+                     'customer': self._transaction_table['customer'][_transaction],
+                     'branch': self._transaction_table['branch'][_transaction],
+                     'product': self._purchase_table['product']}
+            _entities = {'staff': self.staffs, 'customer': self.customers, 'branch': self.branches,
+                         'product': self.products}
+            self._sales_summary = {}
+            for _group in SALES_GROUPS:
+                _size = len(_entities[_group])
+                _counts = np.bincount(_rows[_group], minlength=_size)
+                _quantities = np.bincount(_rows[_group], weights=_quantity, minlength=_size)
+                _revenues = np.bincount(_rows[_group], weights=_total_price, minlength=_size)
+                self._sales_summary[_group] = {_entities[_group][_row].id: Sales(int(_quantities[_row]),
+                                                                                 float(_revenues[_row]))
+                                               for _row in np.flatnonzero(_counts)}
+        return self._sales_summary
+
+    def _column_totals(self, column, rows, id_):
+        """
+        Summing the quantity and total price of the purchases whose transactions refer to an entity
+
+        ...
+
+        Parameters
+        ----------
+        column : str
+            Foreign key column of the transactions, 'staff' or 'customer'.
+
+        rows : dict
+            Rows of the staff or customers keyed by Id.
+
+        id_ : int
+            Id of the staff or customer.
+
+        Returns
+        -------
+        Sales or None
+            Total quantity and total price, None if no transaction refers to the entity.
+        """
+        _transaction_mask = self._transaction_table[column] == rows.get(id_, -1)
+        if not _transaction_mask.any():
+            return None
+        if self._sales_summary is not None:
+            return self._sales_summary[column].get(id_, Sales(0, 0))
+        _mask = _transaction_mask[self._purchase_table['transaction']]
+        if not _mask.any():
+            return Sales(0, 0)
+        return Sales(int(self._purchase_table['quantity'][_mask].sum()),
+                     float(self._purchase_table['total_price'][_mask].sum()))
+
+    def _staff_performance(self, _id):
+        _totals = self._column_totals('staff', self._staff_rows, _id)
+        if _totals is None:
+            raise LookupError("Staff Not in DB")
+        return SalesRecord(_id, self.get_staff(_id).name, *_totals)
+
+    def _customer_value(self, _id):
+        _totals = self._column_totals('customer', self._customer_rows, _id)
+        if _totals is None:
+            raise LookupError("Customer Not in DB")
+        return SalesRecord(_id, self.get_customer(_id).name, *_totals)
+
+    def _group_rows(self, group):
+        """ Returns the row of the staff, customer, branch or product of every purchase """
+        if group == 'product':
+            return self._purchase_table['product']
+        return self._transaction_table[group][self._purchase_table['transaction']]
+
+    def _sales_days(self):
+        """ Returns the days with purchases in order and the day of every purchase, as datetime64 day numbers """
+        _days = self._transaction_table['datetime'][self._purchase_table['transaction']].astype(_DAY).view(np.int64)
+        _tables = self._daily_tables
+        if 'days' not in _tables:
+            _tables['days'] = np.unique(_days)
+        return _tables['days'], _days
+
+    def _daily_sales(self, group, by_branch=False):
+        """
+        Returns the daily sales table of a group, bincounted from the columns on first use after purchases were added
+
+        The cells of the table are the days each entity has purchases on, sorted by entity and day and keyed by
+        entity * the number of days with purchases + the day. Within each branch the entity is branch row * the
+        number of entities + entity row.
+
+        ...
+
+        Parameters
+        ----------
+        group : str
+            'staff', 'customer', 'branch' or 'product'.
+
+        by_branch : bool
+            Whether the sales of each entity are kept apart by branch.
+
+        Returns
+        -------
+        dict
+            keys, the sorted keys of the cells, quantity and revenue, the sales of each cell, quantity_sums and
+            revenue_sums, their prefix sums from 0, and first, the first purchase of each entity or the number of
+            purchases if it has none.
+        """
+        _table = self._daily_tables.get((group, by_branch))
+        if _table is None:
+            _days, _purchase_days = self._sales_days()
+            _rows = self._group_rows(group)
+            _entities = len(getattr(self, _GROUP_ENTITIES[group]))
+            if by_branch:
+                _rows = self._group_rows('branch') * _entities + _rows
+                _entities *= len(self.branches)
+            _keys, _cells = np.unique(_rows * len(_days) + np.searchsorted(_days, _purchase_days), return_inverse=True)
+            _quantity = np.bincount(_cells, weights=self._purchase_table['quantity'],
+                                    minlength=len(_keys)).astype(np.int64)
+            _revenue = np.bincount(_cells, weights=self._purchase_table['total_price'], minlength=len(_keys))
+            _first = np.full(_entities, len(_rows), dtype=np.int64)
+            _sold, _first_purchase = np.unique(_rows, return_index=True)
+            _first[_sold] = _first_purchase
+            _table = self._daily_tables[(group, by_branch)] = {
+                'keys': _keys, 'quantity': _quantity, 'revenue': _revenue,
+                'quantity_sums': np.concatenate(([0], np.cumsum(_quantity))),
+                'revenue_sums': np.concatenate(([0.0], np.cumsum(_revenue))),
+                'first': _first,
+            }
+        return _table
+
+    def _range_sales(self, table, entities, start, end, period='day'):
+        """
+        Returns the quantity and revenue of entities from the day or month holding start up to, not including, the
+        one holding end, from the prefix sums of a daily sales table
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unknown Period: {period}")
+        _days = self._sales_days()[0]
+        _low = 0 if start is None else np.searchsorted(_days, np.datetime64(PERIODS[period](start), 'D').view(np.int64))
+        _high = len(_days) if end is None else \
+            np.searchsorted(_days, np.datetime64(PERIODS[period](end), 'D').view(np.int64))
+        _first = np.searchsorted(table['keys'], entities * len(_days) + _low)
+        _last = np.maximum(np.searchsorted(table['keys'], entities * len(_days) + _high), _first)
+        return (table['quantity_sums'][_last] - table['quantity_sums'][_first],
+                table['revenue_sums'][_last] - table['revenue_sums'][_first])
+
+    def get_rollup(self, group, id_, period='month'):
+        self._check_group(group, id_)
+        if period not in PERIODS:
+            raise ValueError(f"Unknown Period: {period}")
+        _table = self._daily_sales(group)
+        _days = self._sales_days()[0]
+        _row = getattr(self, f"_{group}_rows")[id_]
+        _first, _last = np.searchsorted(_table['keys'], [_row * len(_days), (_row + 1) * len(_days)])
+        _cell_days = _days[_table['keys'][_first:_last] - _row * len(_days)].astype(_DAY)
+        _starts, _inverse = np.unique(_cell_days.astype(PERIOD_UNITS[period]), return_inverse=True)
+        _quantities = np.bincount(_inverse, weights=_table['quantity'][_first:_last], minlength=len(_starts))
+        _revenues = np.bincount(_inverse, weights=_table['revenue'][_first:_last], minlength=len(_starts))
+        return [RollupRecord(_start, int(_quantity), _revenue)
+                for _start, _quantity, _revenue in zip(_starts.astype(_DAY).tolist(), _quantities.tolist(),
+                                                       _revenues.tolist())]
+
+    def get_sales_between(self, group, id_, start=None, end=None, period='day'):
+        self._check_group(group, id_)
+        _row = getattr(self, f"_{group}_rows")[id_]
+        _quantity, _revenue = self._range_sales(self._daily_sales(group), np.array([_row]), start, end, period)
+        return Sales(int(_quantity[0]), float(_revenue[0]))
+
+    def _top_sales(self, group, k, index, start, end, branch_id):
+        _size = len(getattr(self, _GROUP_ENTITIES[group]))
+        _rows = np.arange(_size)
+        if branch_id is None:
+            _entities, _table = _rows, self._daily_sales(group)
+        elif group == 'branch':
+            # The only branch with sales in a branch is the branch itself
+            _rows = np.array([self._branch_rows[branch_id]])
+            _entities, _table = _rows, self._daily_sales(group)
+        else:
+            _entities, _table = self._branch_rows[branch_id] * _size + _rows, self._daily_sales(group, by_branch=True)
+        _quantities, _revenues = self._range_sales(_table, _entities, start, end)
+        # Entities with sales, in the order of their first purchase
+        _sold = np.flatnonzero((_quantities != 0) | (_revenues != 0))
+        _sold = _sold[np.argsort(_table['first'][_entities[_sold]], kind='stable')]
+        _entities = getattr(self, _GROUP_ENTITIES[group])
+        _sums = ((_entities[_row].id, _quantity, _revenue)
+                 for _row, _quantity, _revenue in zip(_rows[_sold].tolist(), _quantities[_sold].tolist(),
+                                                      _revenues[_sold].tolist()))
+        return heapq.nlargest(k, _sums, key=lambda _sum: _sum[index + 1])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+""" Fixtures shared by the tests
+
+A test taking response_name runs once for every valid response of the Responses directory. The report fixture
+returns the answers of the queries every transaction system shares, and expected_report is the report of the
+response loaded with TransactionSystemSchema, which the loaders are compared with.
+
+"""
+# Built-In Packages
+import functools
+import json
+import os
+
+# External Packages
+import pytest
+
+# User Packages
+from schema import TransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses')
+
+RESPONSES = ('date', 'branch', 'customer', 'staff')
+
+# Response failing validation
+INVALID_RESPONSE = 'staff_testing'
+
+# Ids queried, known and unknown to the responses
+IDS = (100000, 100001, 100057, 100100)
+
+GROUPS = ('staff', 'customer', 'branch', 'product')
+
+
+def _path(name):
+    """ Returns the path of a response of the Responses directory """
+    return os.path.join(RESPONSES_DIR, f"{name}.json")
+
+
+@functools.lru_cache(maxsize=None)
+def _text(name):
+    """ Returns the text of a response of the Responses directory """
+    with open(_path(name), 'r') as json_file:
+        return json_file.read()
+
+
+def _answer(query, *args):
+    """ Returns the result of a query, the message of its LookupError if it raised one """
+    try:
+        _result = query(*args)
+    except LookupError as err:
+        return 'LookupError', str(err)
+    return _result if isinstance(_result, (tuple, list, dict)) else list(_result)
+
+
+def _round(rows):
+    """ Returns rows with their floats rounded, as the systems sum prices in another order """
+    return [tuple(round(_value, 6) if isinstance(_value, float) else _value for _value in _row) for _row in rows]
+
+
+def _report(ts):
+    """ Returns the answers of the queries shared by the transaction systems """
+    _answers = []
+    for _id in IDS:
+        _answers.append(_answer(ts.get_staff_details, _id))
+        _answers.append(_answer(ts.get_customer_details, _id))
+        _answers.append(_answer(ts.get_staff_performance, _id))
+        _answers.append(_answer(ts.get_customer_value, _id))
+        _answers.append(_answer(ts.get_branch_inventory, _id))
+    _answers.append(list(ts.get_transaction_details()))
+    _answers.append(ts.get_sales_summary())
+    for _group in GROUPS:
+        _answers.append(_answer(lambda group: _round(ts.get_top(group, 5)), _group))
+        _answers.append(_answer(lambda group: _round(ts.get_top(group, 5, 'quantity', branch_id=100001)), _group))
+    return _answers
+
+
+@functools.lru_cache(maxsize=None)
+def _expected(name):
+    """ Returns the report of a response loaded with TransactionSystemSchema """
+    return _report(TransactionSystemSchema().load(json.loads(_text(name))))
+
+
+@pytest.fixture(name='response_name', params=RESPONSES)
+def fixture_response_name(request):
+    """ Returns the name of each valid response in turn """
+    return request.param
+
+
+@pytest.fixture(name='response_path')
+def fixture_response_path(response_name):
+    """ Returns the path of the response """
+    return _path(response_name)
+
+
+@pytest.fixture(name='response_text')
+def fixture_response_text(response_name):
+    """ Returns the text of the response """
+    return _text(response_name)
+
+
+@pytest.fixture(name='invalid_text')
+def fixture_invalid_text():
+    """ Returns the text of the response failing validation """
+    return _text(INVALID_RESPONSE)
+
+
+@pytest.fixture(name='expected_report')
+def fixture_expected_report(response_name):
+    """ Returns the report of the response loaded with TransactionSystemSchema """
+    return _expected(response_name)
+
+
+@pytest.fixture(name='report')
+def fixture_report():
+    """ Returns the function giving the report of a transaction system """
+    return _report
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+""" Purchase Fact Exporter
+
+This module exports a flat purchase fact table for BI tools: one row per purchase with the datetime of its
+transaction, the Id and name of its staff, customer, branch and product, the quantity, the unit price and the total
+price.
+
+The rows are taken from TransactionSystem.get_purchase_facts one chunk at a time and written before the next chunk
+is made, so exporting holds a chunk of rows in memory however many purchases there are. The columnar and SQLite
+transaction systems make their chunks from their columns or with one joined query, without Purchase objects.
+
+CSV and JSON lines are always available, Parquet when pyarrow is installed:
+
+    python export.py Responses/date.json facts.csv
+    python export.py Responses/date.json facts.parquet --chunk-size 50000
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * loader - To load the response record by record
+    * csv - To write CSV files
+    * json - To write JSON lines files
+    * pyarrow - To write Parquet files, optional
+    * argparse - To read the command line arguments
+
+This file contains the following functions:
+
+    * write_csv - Writes chunks of facts to a text stream as CSV.
+    * write_jsonl - Writes chunks of facts to a text stream as JSON lines.
+    * write_parquet - Writes chunks of facts to a Parquet file.
+    * export_facts - Writes the purchase facts of a transaction system to a file.
+    * main - Exports the purchase facts of the response given on the command line.
+
+"""
+# Built-In Packages
+import argparse
+import csv
+import json
+import os
+
+# External Packages
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# User Packages
+from loader import load_stream
+from transaction import PurchaseFact, FACT_CHUNK_SIZE
+
+__author__ = 'praveen@gyandata.com'
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Format of the files with each extension
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet'}
+
+
+def write_csv(chunks, stream):
+    """
+    Writing chunks of facts as CSV, with a header row
+
+    ...
+
+    Parameters
+    ----------
+    chunks : Iterable
+        Lists of PurchaseFact.
+
+    stream : file
+        Text stream the rows are written to, opened with newline=''.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    _writer = csv.writer(stream, lineterminator='\n')
+    _writer.writerow(PurchaseFact._fields)
+    _rows = 0
+    for _chunk in chunks:
+        _writer.writerows(_chunk)
+        _rows += len(_chunk)
+    return _rows
+
+
+def write_jsonl(chunks, stream):
+    """
+    Writing chunks of facts as JSON lines, one object per fact with datetimes in their str form
+
+    ...
+
+    Parameters
+    ----------
+    chunks : Iterable
+        Lists of PurchaseFact.
+
+    stream : file
+        Text stream the rows are written to.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    _rows = 0
+    for _chunk in chunks:
+        stream.write(''.join(json.dumps(_fact._asdict(), default=str) + "\n" for _fact in _chunk))
+        _rows += len(_chunk)
+    return _rows
+
+
+def _parquet_schema():
+    """ Returns the Parquet schema of the facts: Ids and quantities as int64, names as strings """
+    _types = {'datetime': pyarrow.timestamp('us'), 'price': pyarrow.float64(), 'total_price': pyarrow.float64()}
+    for _field in PurchaseFact._fields:
+        if _field not in _types:
+            _types[_field] = pyarrow.string() if _field.endswith('_name') else pyarrow.int64()
+    return pyarrow.schema([(_field, _types[_field]) for _field in PurchaseFact._fields])
+
+
+def write_parquet(chunks, path):
+    """
+    Writing chunks of facts to a Parquet file, one row group per chunk
+
+    ...
+
+    Parameters
+    ----------
+    chunks : Iterable
+        Lists of PurchaseFact.
+
+    path : str
+        Path of the Parquet file.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+    """
+    if pyarrow is None:
+        raise ImportError("pyarrow is needed to export Parquet")
+    _schema = _parquet_schema()
+    _rows = 0
+    with pyarrow.parquet.ParquetWriter(path, _schema) as _writer:
+        for _chunk in chunks:
+            _columns = [pyarrow.array(_column, type=_field.type) for _column, _field in zip(zip(*_chunk), _schema)]
+            _writer.write_table(pyarrow.Table.from_arrays(_columns, schema=_schema))
+            _rows += len(_chunk)
+    return _rows
+
+
+def export_facts(ts, path, fmt=None, chunk_size=FACT_CHUNK_SIZE):
+    """
+    Writing the purchase facts of a transaction system to a file
+
+    ...
+
+    Parameters
+    ----------
+    ts : TransactionSystem
+        Transaction system whose purchases are exported, such as a ColumnarTransactionSystem or a
+        SQLiteTransactionSystem.
+
+    path : str
+        Path of the file.
+
+    fmt : str, optional
+        'csv', 'jsonl' or 'parquet', from the extension of path if not given.
+
+    chunk_size : int
+        Number of facts made and written at a time.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+
+    Raises
+    ------
+    ValueError
+        If the format is not known.
+
+    ImportError
+        If the format is Parquet and pyarrow is not installed.
+    """
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown Format: {fmt or path}")
+    if fmt == 'parquet':
+        return write_parquet(ts.get_purchase_facts(chunk_size), path)
+    with open(path, 'w', newline='') as _stream:
+        _write = write_csv if fmt == 'csv' else write_jsonl
+        return _write(ts.get_purchase_facts(chunk_size), _stream)
+
+
+def main():
+    """
+    Exports the purchase facts of the response given on the command line
+    """
+    parser = argparse.ArgumentParser(description="Export the purchases of a response as a flat fact table")
+    parser.add_argument('response', help="Response file, such as Responses/date.json")
+    parser.add_argument('path', help="File the facts are written to, .csv, .jsonl or .parquet")
+    parser.add_argument('--format', choices=FORMATS, help="Format of the file (default from its extension)")
+    parser.add_argument('--chunk-size', type=int, default=FACT_CHUNK_SIZE,
+                        help=f"Facts written at a time (default {FACT_CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    with open(args.response, 'r') as json_file:
+        ts = load_stream(json_file)
+    print(f"{export_facts(ts, args.path, args.format, args.chunk_size)} purchases written to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
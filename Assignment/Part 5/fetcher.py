@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+""" Concurrent Response Fetcher
+
+This module fetches many web api responses at once with asyncio, and loads each into a TransactionSystem as soon as
+it arrives, instead of fetching the staff, customer, branch and date range responses one after another.
+
+Requests go over a small pool of HTTP/1.1 keep-alive connections, at most `concurrency` at a time, so the connection
+set up is paid once per connection rather than once per response. Requests which fail with a connection error or a
+5xx status are retried with exponential back-off. A response is loaded in a worker thread, so the event loop keeps
+fetching the others while it is parsed and validated. Responses are loaded one at a time, in the order they arrive,
+so merges into one system never overlap.
+
+The stub_server module serves the Responses directory, to run the fetcher without the web api:
+
+    python stub_server.py --port 8080
+    python fetcher.py http://127.0.0.1:8080 date staff customer branch
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * asyncio - To fetch the responses concurrently
+    * loader - To load the responses record by record
+    * argparse - To read the command line arguments
+
+This file contains the following Classes:
+
+    * Fetcher - This class fetches responses over a pool of keep-alive connections.
+
+This file contains the following functions:
+
+    * load_responses - Yields the TransactionSystem of each response as it arrives.
+    * fetch_systems - Returns the TransactionSystem of every response.
+    * main - Fetches the responses given on the command line and prints what they hold.
+
+"""
+# Built-In Packages
+import argparse
+import asyncio
+import io
+from urllib.parse import urlsplit
+
+# User Packages
+from loader import load_stream, merge_stream
+
+__author__ = 'praveen@gyandata.com'
+
+CONCURRENCY = 4
+
+RETRIES = 3
+
+BACKOFF = 0.1
+
+TIMEOUT = 30.0
+
+
+class Fetcher:
+    """
+    Fetcher class which fetches responses over a pool of keep-alive connections.
+
+    It is used as an async context manager, which closes the connections on exit.
+
+    ...
+
+    Attributes
+    ----------
+    base_url : str
+        Url of the web api, such as http://127.0.0.1:8080, which the paths are fetched from.
+
+    concurrency : int
+        Largest number of requests, and of connections, open at a time.
+
+    retries : int
+        Number of times a request failing with a connection error or a 5xx status is retried.
+
+    backoff : float
+        Seconds waited before the first retry, doubled on every further retry.
+
+    timeout : float
+        Seconds a request may take before it is failed.
+
+    connections : int
+        Number of connections opened.
+
+    Methods
+    -------
+    fetch(path)
+        Returns the body of the response to GET path.
+
+    fetch_all(paths)
+        Yields the path and body of every response, as they arrive.
+
+    close()
+        Closes the idle connections.
+
+    Raises
+    ------
+    LookupError
+        If the web api has no response at the path.
+
+    ConnectionError
+        If a request still fails after the retries.
+
+    """
+    def __init__(self, base_url, concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+        _url = urlsplit(base_url)
+        if _url.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported Url: {base_url}")
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.connections = 0
+        self._host = _url.hostname
+        self._port = _url.port or (443 if _url.scheme == 'https' else 80)
+        self._ssl = _url.scheme == 'https'
+        self._prefix = _url.path.rstrip('/')
+        self._idle = []
+        self._slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """ Closing the idle connections """
+        while self._idle:
+            _, _writer = self._idle.pop()
+            _writer.close()
+            try:
+                await _writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _connection(self):
+        """ Returns an idle connection, or a new one if none is idle """
+        if self._idle:
+            return self._idle.pop()
+        self.connections += 1
+        return await asyncio.open_connection(self._host, self._port, ssl=self._ssl)
+
+    @staticmethod
+    async def _read_body(reader, headers):
+        """ Reading the body of a response, returns it and whether the connection can be reused """
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            _chunks = []
+            while True:
+                _size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if not _size:
+                    # Trailers, up to the empty line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(_chunks), True
+                _chunks.append(await reader.readexactly(_size))
+                await reader.readline()
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length'])), True
+        return await reader.read(), False
+
+    async def _request(self, path):
+        """ Sending GET path over a pooled connection, returns the status and body of the response """
+        _reader, _writer = await self._connection()
+        _reusable = False
+        try:
+            _writer.write(f"GET {self._prefix}/{path.lstrip('/')} HTTP/1.1\r\nHost: {self._host}\r\n"
+                          f"Accept: application/json\r\nConnection: keep-alive\r\n\r\n".encode('latin-1'))
+            await _writer.drain()
+            _status_line = await _reader.readline()
+            if not _status_line:
+                raise ConnectionError("Connection closed by the web api")
+            _status = int(_status_line.split()[1])
+            _headers = {}
+            while True:
+                _line = await _reader.readline()
+                if _line in (b'\r\n', b'\n', b''):
+                    break
+                _key, _, _value = _line.decode('latin-1').partition(':')
+                _headers[_key.strip().lower()] = _value.strip()
+            _body, _reusable = await self._read_body(_reader, _headers)
+            _reusable = _reusable and _headers.get('connection', '').lower() != 'close'
+            return _status, _body
+        except (asyncio.IncompleteReadError, ValueError, IndexError) as err:
+            raise ConnectionError(f"Malformed response from the web api: {err}") from err
+        finally:
+            if _reusable:
+                self._idle.append((_reader, _writer))
+            else:
+                _writer.close()
+
+    async def fetch(self, path):
+        """
+        Fetching a response
+
+        ...
+
+        Parameters
+        ----------
+        path : str
+            Path of the response, relative to base_url.
+
+        Returns
+        -------
+        bytes
+            Body of the response.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            for _attempt in range(self.retries + 1):
+                try:
+                    _status, _body = await asyncio.wait_for(self._request(path), self.timeout)
+                except (OSError, asyncio.TimeoutError) as err:
+                    _error = ConnectionError(f"Fetching {path} failed: {err}")
+                else:
+                    if _status == 200:
+                        return _body
+                    if _status == 404:
+                        raise LookupError(f"Response Not Found: {path}")
+                    _error = ConnectionError(f"Fetching {path} failed with status {_status}")
+                    if _status < 500:
+                        raise _error
+                if _attempt < self.retries:
+                    await asyncio.sleep(self.backoff * 2 ** _attempt)
+            raise _error
+
+    async def _fetch_tagged(self, path):
+        return path, await self.fetch(path)
+
+    async def fetch_all(self, paths):
+        """
+        Fetching many responses at once
+
+        ...
+
+        Parameters
+        ----------
+        paths : Iterable
+            Paths of the responses, relative to base_url.
+
+        Yields
+        ------
+        tuple
+            Path and body of each response, in the order they arrive.
+        """
+        _tasks = [asyncio.ensure_future(self._fetch_tagged(_path)) for _path in paths]
+        try:
+            for _next in asyncio.as_completed(_tasks):
+                yield await _next
+        finally:
+            for _task in _tasks:
+                _task.cancel()
+
+
+async def load_responses(base_url, paths, concurrency=CONCURRENCY, retries=RETRIES, compiled=True, system=None):
+    """
+    Fetching responses and loading each into a TransactionSystem as it arrives
+
+    ...
+
+    Parameters
+    ----------
+    base_url : str
+        Url of the web api.
+
+    paths : Iterable
+        Paths of the responses, relative to base_url.
+
+    concurrency : int
+        Largest number of requests open at a time.
+
+    retries : int
+        Number of times a failing request is retried.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module.
+
+    system : TransactionSystem, optional
+        Transaction system every response is merged into, with merge_stream. Each response is loaded into a
+        TransactionSystem of its own if not given.
+
+    Yields
+    ------
+    tuple
+        Path of each response and the TransactionSystem loaded from it (or system), in the order they arrive.
+
+    Raises
+    ------
+    ValidationError
+        If a response is invalid.
+
+    LookupError
+        If the web api has no response at a path, or a record refers to an Id that is not in its response.
+    """
+    async with Fetcher(base_url, concurrency, retries) as fetcher:
+        async for _path, _body in fetcher.fetch_all(paths):
+            _response = io.StringIO(_body.decode('utf-8'))
+            # Loaded off the event loop, which keeps the other fetches going
+            if system is None:
+                yield _path, await asyncio.to_thread(load_stream, _response, compiled=compiled)
+            else:
+                yield _path, await asyncio.to_thread(merge_stream, system, _response, compiled=compiled)
+
+
+def fetch_systems(base_url, paths, concurrency=CONCURRENCY, retries=RETRIES, compiled=True):
+    """
+    Returns the TransactionSystem loaded from each response, keyed by path, see load_responses
+    """
+    async def _collect():
+        return {_path: _ts async for _path, _ts in load_responses(base_url, paths, concurrency, retries, compiled)}
+    return asyncio.run(_collect())
+
+
+def main():
+    """
+    Fetches the responses given on the command line and prints what they hold
+    """
+    parser = argparse.ArgumentParser(description="Fetch web api responses concurrently and load them")
+    parser.add_argument('base_url', help="Url of the web api, such as http://127.0.0.1:8080")
+    parser.add_argument('paths', nargs='+', help="Paths of the responses, such as date staff customer branch")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help="Requests open at a time")
+    parser.add_argument('--retries', type=int, default=RETRIES, help="Retries of a failing request")
+    args = parser.parse_args()
+
+    for _path, _ts in fetch_systems(args.base_url, args.paths, args.concurrency, args.retries).items():
+        print(f"{_path}: {len(_ts.staffs)} staff, {len(_ts.customers)} customers, {len(_ts.branches)} branches, "
+              f"{len(_ts.transactions)} transactions, {len(_ts.products)} products, {len(_ts.purchases)} purchases")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+""" Synthetic Response Generator
+
+This module generates web api responses in the shape of Responses/date.json, with any number of staff, customers,
+branches, products, transactions and purchases, to measure loading and querying well beyond the size of the sample
+responses.
+
+Ids start at 100000 like the sample responses. The record schemas bound the Ids with Range validators (no more than
+4000 purchases for instance), so a response larger than those bounds is only valid for unbounded_schema, which
+validates the same rules with the Id ranges dropped.
+
+Skew makes a few staff, customers and products take most of the transactions and purchases, as in real sales,
+instead of spreading them evenly.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * marshmallow - lightweight Object serialization and deserialization package.
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * json - To write the responses
+    * argparse - To read the command line arguments
+
+This file contains the following functions:
+
+    * fits_schema - Returns whether the Ids of a response with the given counts are within the ranges of a schema.
+    * unbounded_schema - Returns a subclass of a schema whose Integer fields have no Range validators.
+    * zipf_weights - Returns the cumulative weights that pick ranks with a given skew.
+    * generate_response - Returns a response with the given number of records in each section.
+    * generate_records - Returns the records of a generated response as the schema loads them.
+    * write_response - Writes a generated response to a file.
+    * main - Writes a generated response with the counts given on the command line.
+
+"""
+# Built-In Packages
+import argparse
+import itertools
+import json
+import random
+from datetime import datetime, timedelta
+
+# External Packages
+from marshmallow import fields, validate
+
+# User Packages
+from schema import TransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+FIRST_ID = 100000
+
+START = datetime(2017, 1, 1)
+
+DAYS = 3 * 365
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Counts of the sample response, Responses/date.json
+DEFAULT_COUNTS = {'staff': 100, 'customers': 100, 'branches': 10, 'products': 21, 'transactions': 2000,
+                  'purchases': 4000}
+
+# Section and Id field of the records of each count
+ID_FIELDS = {'staff': ('STAFF', 'Id'), 'customers': ('CUSTOMERS', 'Id'), 'branches': ('BRANCHES', 'B_Id'),
+             'products': ('PRODUCTS', 'Id'), 'transactions': ('TRANSACTIONS', 'T_Id'),
+             'purchases': ('PURCHASES', 'P_Id')}
+
+
+def fits_schema(counts, schema_cls=TransactionSystemSchema):
+    """
+    Checking whether the Ids of a generated response are within the Range validators of a schema
+
+    ...
+
+    Parameters
+    ----------
+    counts : dict
+        Number of records in each section, keyed as the arguments of generate_response.
+
+    schema_cls : type
+        Schema class the response is to be loaded with.
+
+    Returns
+    -------
+    bool
+        True if the schema accepts the Ids of every section.
+    """
+    for _name, _count in counts.items():
+        _section, _id = ID_FIELDS[_name]
+        _nested = schema_cls._declared_fields[_section].nested
+        _field = _nested._declared_fields[_id]
+        for _rule in _field.validators:
+            if type(_rule) is validate.Range and _count and _rule.max is not None and \
+                    FIRST_ID + _count - 1 > _rule.max:
+                return False
+    return True
+
+
+def unbounded_schema(schema_cls=TransactionSystemSchema):
+    """
+    Making a subclass of a schema without the Range validators of its Integer fields
+
+    Nested schemas are made unbounded as well, the other fields, validators and @validates hooks are kept.
+
+    ...
+
+    Parameters
+    ----------
+    schema_cls : type
+        Schema class to be made unbounded.
+
+    Returns
+    -------
+    type
+        Subclass of schema_cls.
+    """
+    _overrides = {'__module__': __name__}
+    for _name, _field in schema_cls._declared_fields.items():
+        if isinstance(_field, fields.Nested):
+            _nested = _field.nested if isinstance(_field.nested, type) else type(_field.nested)
+            _many = _field.many or getattr(_field.nested, 'many', False)
+            _overrides[_name] = fields.Nested(unbounded_schema(_nested)(many=_many), required=_field.required)
+        elif type(_field) is fields.Integer and any(type(_rule) is validate.Range for _rule in _field.validators):
+            _overrides[_name] = fields.Integer(
+                required=_field.required,
+                validate=[_rule for _rule in _field.validators if type(_rule) is not validate.Range])
+    return type(f"Unbounded{schema_cls.__name__}", (schema_cls,), _overrides)
+
+
+def zipf_weights(n, skew):
+    """
+    Making the cumulative weights that pick one of n ranks with a Zipf like skew
+
+    ...
+
+    Parameters
+    ----------
+    n : int
+        Number of ranks.
+
+    skew : float
+        Exponent of the skew, 0 picks every rank equally often.
+
+    Returns
+    -------
+    list
+        Cumulative weights, rank i weighing 1 / (i + 1) ** skew.
+    """
+    return list(itertools.accumulate(1 / (_rank + 1) ** skew for _rank in range(n)))
+
+
+def _generate(staff, customers, branches, products, transactions, purchases, skew, seed, loaded):
+    """ Returns the records of a response, as the web api returns them or, if loaded, as the schema loads them """
+    if (purchases and not transactions) or (transactions and not (staff and customers and branches)) or \
+            ((branches or purchases) and not products):
+        raise ValueError("Records cannot refer to a section without records")
+    _random = random.Random(seed)
+    _price = float if loaded else int
+
+    _branch_ids = range(FIRST_ID, FIRST_ID + branches)
+    _staff_ids = range(FIRST_ID, FIRST_ID + staff)
+    _customer_ids = range(FIRST_ID, FIRST_ID + customers)
+    _product_ids = range(FIRST_ID, FIRST_ID + products)
+    _staff_weights = zipf_weights(staff, skew)
+    _customer_weights = zipf_weights(customers, skew)
+    _product_weights = zipf_weights(products, skew)
+
+    _prices = {_pr_id: _price(_random.randrange(100, 10000)) for _pr_id in _product_ids}
+    _staff_branch = {_s_id: _random.choice(_branch_ids) for _s_id in _staff_ids}
+
+    _seconds = sorted(_random.randrange(DAYS * 86400) for _ in range(transactions))
+    _staff_picks = _random.choices(_staff_ids, cum_weights=_staff_weights, k=transactions)
+    _customer_picks = _random.choices(_customer_ids, cum_weights=_customer_weights, k=transactions)
+    _datetimes = (START + timedelta(seconds=_second) for _second in _seconds)
+    if not loaded:
+        _datetimes = (_datetime.strftime(DATETIME_FORMAT) for _datetime in _datetimes)
+    _transactions = [{'T_Id': FIRST_ID + _index, 'DateTime': _datetime,
+                      'C_Id': _c_id, 'S_Id': _s_id, 'B_Id': _staff_branch[_s_id]}
+                     for _index, (_datetime, _s_id, _c_id) in enumerate(zip(_datetimes, _staff_picks, _customer_picks))]
+
+    _purchases = []
+    _product_picks = _random.choices(_product_ids, cum_weights=_product_weights, k=purchases)
+    for _index, _pr_id in enumerate(_product_picks):
+        # Every transaction gets a purchase before any gets a second one
+        _t_id = FIRST_ID + (_index if _index < transactions else _random.randrange(transactions))
+        _quantity = _random.randrange(1, 10)
+        _purchases.append({'P_Id': FIRST_ID + _index, 'T_Id': _t_id, 'Pr_Id': _pr_id, 'Quantity': _quantity,
+                           'T_price': _prices[_pr_id] * _quantity})
+
+    return {
+        'STAFF': [{'Id': _s_id, 'name': f"staff{_s_id}", 'Email': f"staff{_s_id}@gmail.com",
+                   'B_Id': _staff_branch[_s_id]} for _s_id in _staff_ids],
+        'CUSTOMERS': [{'Id': _c_id, 'name': f"customer{_c_id}", 'Email': f"customer{_c_id}@gmail.com"}
+                      for _c_id in _customer_ids],
+        'BRANCHES': [{'B_Id': _b_id, 'name': f"branch{_b_id}", 'Pr_Id': _pr_id,
+                      'Inventory': _random.randrange(10000)} for _b_id in _branch_ids for _pr_id in _product_ids],
+        'TRANSACTIONS': _transactions,
+        'PRODUCTS': [{'Id': _pr_id, 'name': f"Product{_pr_id}", 'Price': _prices[_pr_id]} for _pr_id in _product_ids],
+        'PURCHASES': _purchases,
+    }
+
+
+def generate_response(staff=100, customers=100, branches=10, products=21, transactions=2000, purchases=4000,
+                      skew=0.0, seed=0):
+    """
+    Generating a response in the shape of Responses/date.json
+
+    Every branch stocks every product. Transactions are sorted by their DateTime, spread over the three years from
+    2017, and every purchase is of a product at its price.
+
+    ...
+
+    Parameters
+    ----------
+    staff, customers, branches, products, transactions, purchases : int
+        Number of records in each section.
+
+    skew : float
+        Zipf exponent of how often staff, customers and products are picked, 0 for evenly.
+
+    seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    dict
+        Json response, as the web api would return it.
+
+    Raises
+    ------
+    ValueError
+        If there are purchases without transactions, or transactions without staff, customers or branches, or
+        branches or purchases without products.
+    """
+    return _generate(staff, customers, branches, products, transactions, purchases, skew, seed, False)
+
+
+def generate_records(staff=100, customers=100, branches=10, products=21, transactions=2000, purchases=4000,
+                     skew=0.0, seed=0):
+    """
+    Generating the records of a response as TransactionSystemSchema loads them
+
+    The records are those of generate_response with the same arguments, with each DateTime parsed and the prices as
+    floats, so they can be handed straight to make_transaction_system to time the linking alone, with as many
+    records as needed whatever the Id ranges of the schema.
+
+    ...
+
+    Parameters
+    ----------
+    staff, customers, branches, products, transactions, purchases : int
+        Number of records in each section.
+
+    skew : float
+        Zipf exponent of how often staff, customers and products are picked, 0 for evenly.
+
+    seed : int
+        Seed for the random number generator.
+
+    Returns
+    -------
+    dict
+        Validated records of every section, keyed by the name of the section.
+
+    Raises
+    ------
+    ValueError
+        If there are purchases without transactions, or transactions without staff, customers or branches, or
+        branches or purchases without products.
+    """
+    return _generate(staff, customers, branches, products, transactions, purchases, skew, seed, True)
+
+
+def write_response(path, **counts):
+    """
+    Writing a generated response to a file
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        Path of the file written.
+
+    counts : dict
+        Keyword arguments of generate_response.
+
+    """
+    with open(path, 'w') as json_file:
+        json.dump(generate_response(**counts), json_file)
+
+
+def main():
+    """
+    Writes a generated response with the counts given on the command line
+    """
+    parser = argparse.ArgumentParser(description="Generate a web api response in the shape of Responses/date.json")
+    parser.add_argument('path', help="File the response is written to")
+    for _name, _count in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{_name}", type=int, default=_count, help=f"Number of {_name} (default {_count})")
+    parser.add_argument('--skew', type=float, default=0.0, help="Zipf exponent of the picks (default 0, even)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the random number generator")
+    args = vars(parser.parse_args())
+    write_response(args.pop('path'), **args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+""" Lazy Transaction System
+
+This module loads a web api response section by section, as the queries need them, instead of validating and
+linking every section up front as make_transaction_system does. A report on the inventory of a branch then only
+pays for the BRANCHES and PRODUCTS sections, and a staff report never touches PURCHASES.
+
+Each section is validated with its record schema on first access and built straight away. Transactions and
+purchases keep the Ids of the records they refer to, and look the staff, customer, branch, transaction or product
+up by Id when it is first used, so building the transactions does not build the staff and customers. Their Ids are
+checked against the sections they refer to before they are built, which validates those sections, so a reference
+to an Id that is not in the response, or to a section missing from it, fails as it does with load_stream.
+
+Errors surface when the section holding them is first used rather than on load: a ValidationError for an invalid
+section, a LookupError for a reference to an Id that is not in the response. A section which failed keeps raising
+the same error.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * loader - For the builders of the sections
+    * validator - To validate the records with compiled schemas
+    * json - To decode the response
+
+This file contains the following Classes:
+
+    * LazyTransaction - This class is a Transaction whose references are looked up by Id.
+    * LazyPurchase - This class is a Purchase whose references are looked up by Id.
+    * LazyTransactionSystem - This class is a TransactionSystem which loads its sections on first access.
+
+This file contains the following functions:
+
+    * load_lazy - Returns the LazyTransactionSystem of a response file.
+
+"""
+# Built-In Packages
+import functools
+import json
+
+# User Packages
+from loader import BUILD_STEPS, REFERENCES, SECTION_IDS
+from schema import TransactionSystemSchema, ValidationError
+from transaction import Transaction, Purchase, TransactionSystem
+from validator import CompiledTransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+# Steps each query needs built before it runs, beyond those its lookups build on their own. A branch is built without
+# its inventory, which the inventory queries build.
+QUERY_STEPS = {
+    'get_staff': ('STAFF',),
+    'get_customer': ('CUSTOMERS',),
+    'get_branch': ('BRANCHES',),
+    'get_transaction': ('TRANSACTIONS',),
+    'get_purchase': ('PURCHASES',),
+    'get_product': ('PRODUCTS',),
+    'get_staff_transactions': ('TRANSACTIONS',),
+    'get_customer_transactions': ('TRANSACTIONS',),
+    'get_branch_transactions': ('TRANSACTIONS',),
+    'get_transaction_purchases': ('PURCHASES',),
+    'get_transactions_between': ('TRANSACTIONS',),
+    'get_sales_summary': ('PURCHASES',),
+    'get_rollup': ('PURCHASES',),
+    'get_sales_between': ('PURCHASES',),
+    'get_top': ('PURCHASES',),
+    'add_inventory': ('INVENTORY',),
+    'apply_purchases': ('INVENTORY', 'PURCHASES'),
+    'get_branch_inventory': ('INVENTORY',),
+    'get_stock': ('INVENTORY',),
+    'get_product_stock': ('INVENTORY',),
+    'get_branches_stocking': ('INVENTORY',),
+    'get_low_stock': ('BRANCHES', 'INVENTORY'),
+    'get_inventory_matrix': ('BRANCHES', 'PRODUCTS', 'INVENTORY'),
+}
+
+# Steps the entity lists need built
+LIST_STEPS = {
+    'staffs': ('STAFF',),
+    'customers': ('CUSTOMERS',),
+    'branches': ('BRANCHES', 'INVENTORY'),
+    'transactions': ('TRANSACTIONS',),
+    'products': ('PRODUCTS',),
+    'purchases': ('PURCHASES',),
+}
+
+
+class LazyTransaction(Transaction):
+    """
+    LazyTransaction class, a Transaction which looks its staff, customer and branch up by Id when they are used.
+    """
+    __slots__ = ('_system', 'staff_id', 'customer_id', 'branch_id')
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, system, id_, staff_id, customer_id, branch_id, _datetime):
+        self._system = system
+        self.id = id_
+        self.staff_id = staff_id
+        self.customer_id = customer_id
+        self.branch_id = branch_id
+        self.datetime = _datetime
+
+    @property
+    def staff(self):
+        return self._system.get_staff(self.staff_id)
+
+    @property
+    def customer(self):
+        return self._system.get_customer(self.customer_id)
+
+    @property
+    def branch(self):
+        return self._system.get_branch(self.branch_id)
+
+
+class LazyPurchase(Purchase):
+    """
+    LazyPurchase class, a Purchase which looks its transaction and product up by Id when they are used.
+    """
+    __slots__ = ('_system', 'transaction_id', 'product_id')
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, system, pu_id_, transaction_id, product_id, quantity, total_price):
+        self._system = system
+        self.id = pu_id_
+        self.transaction_id = transaction_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.total_price = total_price
+
+    @property
+    def transaction(self):
+        return self._system.get_transaction(self.transaction_id)
+
+    @property
+    def product(self):
+        return self._system.get_product(self.product_id)
+
+
+def make_lazy_transaction(ts, transaction):
+    """Adding a LazyTransaction made from a validated transaction record to the transaction system"""
+    ts.add_transaction(LazyTransaction(ts, transaction['T_Id'], transaction['S_Id'], transaction['C_Id'],
+                                       transaction['B_Id'], transaction['DateTime']))
+
+
+def make_lazy_purchase(ts, purchase):
+    """Adding a LazyPurchase made from a validated purchase record to the transaction system"""
+    ts.add_purchase(LazyPurchase(ts, purchase['P_Id'], purchase['T_Id'], purchase['Pr_Id'], purchase['Quantity'],
+                                 purchase['T_price']))
+
+
+# Section and builder of each step
+_STEPS = {_step: (_section, _builder) for _step, _section, _, _builder in BUILD_STEPS}
+_STEPS['TRANSACTIONS'] = ('TRANSACTIONS', make_lazy_transaction)
+_STEPS['PURCHASES'] = ('PURCHASES', make_lazy_purchase)
+
+# Steps whose builders do not look their references up, which are checked before the step is built
+_CHECKED_STEPS = ('TRANSACTIONS', 'PURCHASES')
+
+
+class _SectionList:
+    """ Entity list of a LazyTransactionSystem, which builds the steps of its section on first access """
+    def __init__(self, steps):
+        self._steps = steps
+        self._name = None
+
+    def __set_name__(self, owner, name):
+        self._name = f"_{name}"
+
+    def __get__(self, ts, owner=None):
+        if ts is None:
+            return self
+        # The add_* methods append to the lists while a section is built, which must not build other sections
+        if not ts.building:
+            ts.require(*self._steps)
+        return ts.__dict__[self._name]
+
+    def __set__(self, ts, entities):
+        ts.__dict__[self._name] = entities
+
+
+class LazyTransactionSystem(TransactionSystem):
+    """
+    LazyTransactionSystem class, a TransactionSystem which validates and builds each section on first access.
+
+    ...
+
+    Attributes
+    ----------
+    loaded : set
+        Build steps done so far: the sections, and INVENTORY for the inventory of the branches.
+
+    building : int
+        Number of build steps in progress.
+
+    Methods
+    -------
+    require(*steps)
+        Validates and builds the sections of the steps which are not built yet.
+
+    Raises
+    ------
+    ValidationError
+        If a section is invalid, when it is first used.
+
+    LookupError
+        If Id (Product Id, Branch Id, etc) is not found.
+
+    """
+    staffs = _SectionList(LIST_STEPS['staffs'])
+    customers = _SectionList(LIST_STEPS['customers'])
+    branches = _SectionList(LIST_STEPS['branches'])
+    transactions = _SectionList(LIST_STEPS['transactions'])
+    products = _SectionList(LIST_STEPS['products'])
+    purchases = _SectionList(LIST_STEPS['purchases'])
+
+    def __init__(self, data, compiled=True):
+        self.loaded = set()
+        self.building = 0
+        self._failed = {}
+        self._schema = TransactionSystemSchema()
+        if not isinstance(data, dict):
+            self._schema.load(data)
+        _unknown = {_section: ['Unknown field.'] for _section in data if _section not in self._schema.fields}
+        if _unknown:
+            raise ValidationError(_unknown)
+        self._data = data
+        self._records = {}
+        self._ids = {}
+        if compiled:
+            _compiled = CompiledTransactionSystemSchema()
+            self._record_schemas = {_name: _compiled.record_schema(_name) for _name in self._schema.fields}
+        else:
+            self._record_schemas = {_name: type(_field.schema)() for _name, _field in self._schema.fields.items()}
+        super().__init__()
+
+    def _validated(self, section):
+        """ Returns the validated records of a section, validating them on first use """
+        _records = self._records.get(section)
+        if _records is None:
+            _raw = self._data.get(section, [])
+            if not isinstance(_raw, list):
+                try:
+                    self._schema.fields[section].deserialize(_raw)
+                except ValidationError as err:
+                    raise ValidationError({section: err.messages}) from err
+            _records = []
+            _errors = {}
+            _schema = self._record_schemas[section]
+            for _index, _record in enumerate(_raw):
+                try:
+                    _records.append(_schema.load(_record))
+                except ValidationError as err:
+                    _errors[_index] = err.messages
+            if _errors:
+                raise ValidationError({section: _errors})
+            self._records[section] = _records
+            # The raw records are not needed any more
+            self._data = {**self._data, section: []}
+        return _records
+
+    def _section_ids(self, section):
+        """ Returns the Ids of the validated records of a section """
+        _ids = self._ids.get(section)
+        if _ids is None:
+            _field = SECTION_IDS[section][0]
+            _ids = self._ids[section] = {_record[_field] for _record in self._validated(section)}
+        return _ids
+
+    def _check_references(self, section, records):
+        """ Raising the LookupError of the first record referring to an Id that is not in the response """
+        for _field, _target in REFERENCES[section]:
+            _ids = self._section_ids(_target)
+            for _record in records:
+                if _record[_field] not in _ids:
+                    # The lookup raises the same error as the other loaders
+                    getattr(self, SECTION_IDS[_target][1])(_record[_field])
+
+    def require(self, *steps):
+        """
+        Validating and building the sections of the steps which are not built yet
+
+        ...
+
+        Parameters
+        ----------
+        steps : str
+            Build steps, such as 'PURCHASES', or 'INVENTORY' for the inventory of the branches.
+
+        Raises
+        ------
+        ValidationError
+            If the section of a step is invalid.
+
+        LookupError
+            If a record refers to an Id that is not in the response.
+        """
+        for _step in steps:
+            if _step in self.loaded:
+                continue
+            if _step in self._failed:
+                raise self._failed[_step]
+            # Marked first, so the lookups of the builder do not build the step again
+            self.loaded.add(_step)
+            _section, _builder = _STEPS[_step]
+            self.building += 1
+            try:
+                _records = self._validated(_section)
+                if _step in _CHECKED_STEPS:
+                    self._check_references(_section, _records)
+                for _record in _records:
+                    _builder(self, _record)
+            except (ValidationError, LookupError) as err:
+                self.loaded.discard(_step)
+                self._failed[_step] = err
+                raise
+            finally:
+                self.building -= 1
+
+
+def _requiring(method, steps):
+    """ Wrapping a query so that it builds the steps it needs first """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.require(*steps)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name, _steps in QUERY_STEPS.items():
+    setattr(LazyTransactionSystem, _name, _requiring(getattr(TransactionSystem, _name), _steps))
+
+
+def load_lazy(json_file, compiled=True):
+    """
+    Loading a transaction system from a response file, building each section on first access
+
+    Only the JSON is decoded up front.
+
+    ...
+
+    Parameters
+    ----------
+    json_file : file
+        Text file holding the response.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module.
+
+    Returns
+    -------
+    LazyTransactionSystem
+        Transaction system which builds the sections of the response as they are needed.
+
+    Raises
+    ------
+    ValidationError
+        If the response is not an object of known sections. Invalid sections raise when first used.
+    """
+    return LazyTransactionSystem(json.load(json_file), compiled)
@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+""" Streaming Loader
+
+This module builds a TransactionSystem from a web api response while reading it, record by record, instead of
+decoding the whole response into a dict tree and handing it to TransactionSystemSchema. Every record is validated
+with the nested schema of its section and turned into an object straight away, so the peak memory stays close to
+the final object graph.
+
+Records whose references are not loaded yet (the responses list STAFF before BRANCHES, and BRANCHES before
+PRODUCTS) are held back until the sections they refer to are complete.
+
+A response can also be merged into a system which is already loaded, such as an hourly delta on top of the full
+response. Only the records of the new response are validated, records whose Id is already in the system are skipped,
+and references are linked against both the system and the new response.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * validator - To validate the records with compiled schemas
+    * json - To decode the records of the response
+
+This file contains the following Classes:
+
+    * StreamingLoader - This class validates records and builds the transaction system as they arrive.
+
+This file contains the following functions:
+
+    * iter_sections - Yields the sections of a response and lazily, their records.
+    * load_stream - Returns the TransactionSystem read from a response file.
+    * merge_stream - Merges a response file into a TransactionSystem which is already loaded.
+
+"""
+# Built-In Packages
+import json
+import re
+from collections import deque
+from collections.abc import Iterator
+
+# User Packages
+from schema import TransactionSystemSchema, ValidationError, make_customer, make_product, make_branch, \
+    make_inventory, make_staff, make_transaction, make_purchase
+from transaction import TransactionSystem
+from validator import CompiledTransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Build steps in dependency order: (step, section, steps it depends on, builder). Branches are split into the
+# branch objects, which the staff and transactions refer to, and their inventory, which needs the products.
+BUILD_STEPS = (
+    ('CUSTOMERS', 'CUSTOMERS', (), make_customer),
+    ('PRODUCTS', 'PRODUCTS', (), make_product),
+    ('BRANCHES', 'BRANCHES', (), make_branch),
+    ('INVENTORY', 'BRANCHES', ('PRODUCTS',), make_inventory),
+    ('STAFF', 'STAFF', ('BRANCHES',), make_staff),
+    ('TRANSACTIONS', 'TRANSACTIONS', ('STAFF', 'CUSTOMERS', 'BRANCHES'), make_transaction),
+    ('PURCHASES', 'PURCHASES', ('TRANSACTIONS', 'PRODUCTS'), make_purchase),
+)
+
+# Id field of the records of each section, and the TransactionSystem lookup of that Id
+SECTION_IDS = {
+    'STAFF': ('Id', 'get_staff'),
+    'CUSTOMERS': ('Id', 'get_customer'),
+    'BRANCHES': ('B_Id', 'get_branch'),
+    'TRANSACTIONS': ('T_Id', 'get_transaction'),
+    'PRODUCTS': ('Id', 'get_product'),
+    'PURCHASES': ('P_Id', 'get_purchase'),
+}
+
+# Fields of the records of each section which refer to the records of another section
+REFERENCES = {
+    'BRANCHES': (('Pr_Id', 'PRODUCTS'),),
+    'STAFF': (('B_Id', 'BRANCHES'),),
+    'TRANSACTIONS': (('S_Id', 'STAFF'), ('C_Id', 'CUSTOMERS'), ('B_Id', 'BRANCHES')),
+    'PURCHASES': (('T_Id', 'TRANSACTIONS'), ('Pr_Id', 'PRODUCTS')),
+}
+
+# Steps whose builders add a new object for every record, which are skipped when merging a record already loaded.
+# make_branch and make_inventory already keep the first branch and inventory of an Id.
+MERGE_STEPS = ('CUSTOMERS', 'PRODUCTS', 'STAFF', 'TRANSACTIONS', 'PURCHASES')
+
+
+class _JsonStream:
+    """
+    Reads JSON values one at a time from a text file, holding only the unread part of a chunk in memory.
+    """
+    def __init__(self, json_file, chunk_size):
+        self._file = json_file
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """ Reading the next chunk, returns False at the end of the file """
+        if self._eof:
+            return False
+        # Reading at least as much as is buffered keeps re-decoding a value that spans many chunks linear
+        _data = self._file.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not _data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + _data
+        self._pos = 0
+        return True
+
+    def error(self, msg):
+        """ Returns a JSONDecodeError at the current position """
+        return json.JSONDecodeError(msg, self._buffer, self._pos)
+
+    def peek(self):
+        """ Returns the next non whitespace character without consuming it, '' at the end of the file """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def next(self):
+        """ Consumes and returns the next non whitespace character """
+        _char = self.peek()
+        self._pos += 1
+        return _char
+
+    def expect(self, char):
+        """ Consumes the next non whitespace character, which must be char """
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def value(self):
+        """ Consumes and returns the next JSON value """
+        self.peek()
+        while True:
+            try:
+                _value, _end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number or literal ending at the end of the buffer may continue in the next chunk
+            if _end < len(self._buffer) or not self._fill():
+                self._pos = _end
+                return _value
+
+
+def _iter_records(stream):
+    """ Yields (index, record) for the elements of the array at the current position of the stream """
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.next()
+        return
+    _index = 0
+    while True:
+        yield _index, stream.value()
+        _index += 1
+        _char = stream.next()
+        if _char == ']':
+            return
+        if _char != ',':
+            raise stream.error("Expecting ',' delimiter")
+
+
+def iter_sections(json_file, chunk_size=CHUNK_SIZE):
+    """
+    Iterating over the sections of a response
+
+    Array sections are yielded as iterators over (index, record), which read the records from the file as they
+    are consumed. Any other value is yielded decoded. A section must be consumed before moving on to the next,
+    records which are skipped are still read, but discarded. A response which is not a JSON object is yielded
+    whole, as the value of the section None.
+
+    ...
+
+    Parameters
+    ----------
+    json_file : file
+        Text file holding the response.
+
+    chunk_size : int
+        Number of characters read at a time.
+
+    Yields
+    ------
+    tuple
+        Name of the section and its records, or its value if it is not an array.
+
+    Raises
+    ------
+    json.JSONDecodeError
+        If the file is not valid JSON.
+    """
+    stream = _JsonStream(json_file, chunk_size)
+    if stream.peek() != '{':
+        yield None, stream.value()
+        return
+    stream.next()
+    if stream.peek() == '}':
+        return
+    while True:
+        _key = stream.value()
+        if not isinstance(_key, str):
+            raise stream.error("Expecting property name enclosed in double quotes")
+        stream.expect(':')
+        if stream.peek() == '[':
+            _records = _iter_records(stream)
+            yield _key, _records
+            for _ in _records:
+                pass
+        else:
+            yield _key, stream.value()
+        _char = stream.next()
+        if _char == '}':
+            return
+        if _char != ',':
+            raise stream.error("Expecting ',' delimiter")
+
+
+def _skip_loaded(builder, section):
+    """ Returns a builder which only builds the records whose Id is not in the system yet """
+    _id_field, _lookup = SECTION_IDS[section]
+
+    def build(ts, record):
+        try:
+            getattr(ts, _lookup)(record[_id_field])
+        except LookupError:
+            builder(ts, record)
+    return build
+
+
+class StreamingLoader:
+    """
+    StreamingLoader class which validates records and builds the transaction system as they arrive.
+
+    ...
+
+    Attributes
+    ----------
+    transaction_system : TransactionSystem
+        Transaction system being built, a new TransactionSystem unless one is given.
+
+    errors : dict
+        Validation error messages, in the same layout as the ValidationError.messages of TransactionSystemSchema.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module.
+
+    merge : bool
+        Whether the response is merged into a system which is already loaded. Nothing is built then until the
+        whole response is read and found valid, with every reference either loaded or in the response, so an
+        invalid response leaves the system as it was.
+
+    Methods
+    -------
+    add_section(section, records)
+        Validates and builds every record of a section, as yielded by iter_sections.
+
+    add_record(section, index, record)
+        Validates a record and builds its object, or holds it back until its references are loaded.
+
+    end_section(section)
+        Marks a section as fully read and builds the records that were waiting for it.
+
+    finish()
+        Builds the records still held back and returns the transaction system.
+
+    Raises
+    ------
+    ValidationError
+        From finish, if any record was invalid.
+
+    LookupError
+        If a record refers to an Id that is not in the response.
+
+    """
+    def __init__(self, compiled=False, system=None, merge=False):
+        self._schema = TransactionSystemSchema()
+        self.transaction_system = TransactionSystem() if system is None else system
+        self.errors = {}
+        self.compiled = compiled
+        self.merge = merge
+
+        if compiled:
+            _compiled = CompiledTransactionSystemSchema()
+            self._record_schemas = {_name: _compiled.record_schema(_name) for _name in self._schema.fields}
+        else:
+            self._record_schemas = {_name: type(_field.schema)() for _name, _field in self._schema.fields.items()}
+        self._steps = {_step: (_section, _depends, _skip_loaded(_builder, _section)
+                               if merge and _step in MERGE_STEPS else _builder)
+                       for _step, _section, _depends, _builder in BUILD_STEPS}
+        self._section_steps = {}
+        for _step, _section, _, _ in BUILD_STEPS:
+            self._section_steps.setdefault(_section, []).append(_step)
+        self._pending = {_step: deque() for _step in self._steps}
+        self._read = set()
+        self._complete = set()
+
+    def _ready(self, step):
+        """ Returns whether every step that step depends on is complete """
+        return all(_depend in self._complete for _depend in self._steps[step][1])
+
+    def _flush(self):
+        """ Building held back records whose references are loaded, until no more steps complete """
+        _progress = True
+        while _progress:
+            _progress = False
+            for _step, (_section, _, _builder) in self._steps.items():
+                if _step in self._complete or not self._ready(_step):
+                    continue
+                _pending = self._pending[_step]
+                while _pending:
+                    _builder(self.transaction_system, _pending.popleft())
+                if _section in self._read:
+                    self._complete.add(_step)
+                    _progress = True
+
+    def _discard_pending(self):
+        """ Dropping held back records, nothing more is built once an invalid record is found """
+        for _pending in self._pending.values():
+            _pending.clear()
+
+    def add_section(self, section, records):
+        """
+        Validating and building every record of a section
+
+        ...
+
+        Parameters
+        ----------
+        section : str or None
+            Name of the section, None for a response which is not a JSON object.
+
+        records : Iterator or object
+            Iterator over (index, record), or the value of the section if it is not an array.
+
+        """
+        if section is None:
+            try:
+                self._schema.load(records)
+            except ValidationError as err:
+                self.errors.update(err.messages)
+        elif section not in self._record_schemas:
+            self.errors[section] = ['Unknown field.']
+            self._discard_pending()
+        elif isinstance(records, Iterator):
+            for _index, _record in records:
+                self.add_record(section, _index, _record)
+            self.end_section(section)
+        else:
+            try:
+                self._schema.fields[section].deserialize(records)
+            except ValidationError as err:
+                self.errors[section] = err.messages
+                self._discard_pending()
+            self.end_section(section)
+
+    def add_record(self, section, index, record):
+        """
+        Validating a record and building its object
+
+        ...
+
+        Parameters
+        ----------
+        section : str
+            Name of the section holding the record.
+
+        index : int
+            Position of the record in its section.
+
+        record : dict
+            Record as decoded from the response.
+
+        """
+        try:
+            _data = self._record_schemas[section].load(record)
+        except ValidationError as err:
+            self.errors.setdefault(section, {})[index] = err.messages
+            self._discard_pending()
+            return
+        if self.errors:
+            return
+        for _step in self._section_steps[section]:
+            if not self.merge and self._ready(_step) and not self._pending[_step]:
+                self._steps[_step][2](self.transaction_system, _data)
+            else:
+                self._pending[_step].append(_data)
+
+    def end_section(self, section):
+        """
+        Marking a section as fully read
+
+        ...
+
+        Parameters
+        ----------
+        section : str
+            Name of the section.
+
+        """
+        self._read.add(section)
+        if not self.errors and not self.merge:
+            self._flush()
+
+    def finish(self):
+        """
+        Finishing the load
+
+        Sections missing from the response are treated as empty.
+
+        ...
+
+        Returns
+        -------
+        TransactionSystem
+            The loaded transaction system.
+        """
+        if self.errors:
+            raise ValidationError(self.errors)
+        if self.merge:
+            self._check_references()
+        self._read.update(self._section_steps)
+        self._flush()
+        return self.transaction_system
+
+    def _check_references(self):
+        """ Checking that the references of the held back records are loaded or in the response, before merging """
+        _new_ids = {_section: {_record[_id_field] for _record in self._pending[_section]}
+                    for _section, (_id_field, _) in SECTION_IDS.items()}
+        # Branches holding stock, whose inventory of an unknown product make_inventory skips
+        _stocked = set()
+        for _section, _references in REFERENCES.items():
+            for _record in self._pending[_section]:
+                for _field, _target in _references:
+                    if _record[_field] in _new_ids[_target]:
+                        continue
+                    try:
+                        getattr(self.transaction_system, SECTION_IDS[_target][1])(_record[_field])
+                    except LookupError:
+                        if _section != 'BRANCHES' or not (_record['B_Id'] in _stocked
+                                                          or self._holds_stock(_record['B_Id'])):
+                            raise
+                if _section == 'BRANCHES':
+                    _stocked.add(_record['B_Id'])
+
+    def _holds_stock(self, branch_id):
+        """ Returns whether a loaded branch holds the stock of any product """
+        try:
+            return bool(self.transaction_system.get_branch(branch_id).products)
+        except LookupError:
+            return False
+
+
+def load_stream(json_file, chunk_size=CHUNK_SIZE, compiled=False, system=None, merge=False):
+    """
+    Loading a transaction system from a response file, record by record
+
+    ...
+
+    Parameters
+    ----------
+    json_file : file
+        Text file holding the response.
+
+    chunk_size : int
+        Number of characters read at a time.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module, which give the same
+        results faster.
+
+    system : TransactionSystem, optional
+        Empty transaction system (or subclass, such as ColumnarTransactionSystem) to load into.
+
+    merge : bool
+        Whether the response is merged into system, which is already loaded, see merge_stream.
+
+    Returns
+    -------
+    TransactionSystem
+        Transaction system populated with the data from the response.
+
+    Raises
+    ------
+    ValidationError
+        If the response does not match TransactionSystemSchema, with the same messages the schema would give.
+
+    LookupError
+        If a record refers to an Id that is not in the response.
+    """
+    loader = StreamingLoader(compiled, system, merge)
+    for section, records in iter_sections(json_file, chunk_size):
+        loader.add_section(section, records)
+    return loader.finish()
+
+
+def merge_stream(system, json_file, chunk_size=CHUNK_SIZE, compiled=True):
+    """
+    Merging a response file into a transaction system which is already loaded
+
+    Only the records of the response are validated. Records whose Id is already in the system are skipped in O(1),
+    the first record of an Id wins as in a single load. The other records are linked against the system and the
+    response, and added to the system.
+
+    ...
+
+    Parameters
+    ----------
+    system : TransactionSystem
+        Transaction system the response is merged into.
+
+    json_file : file
+        Text file holding the response.
+
+    chunk_size : int
+        Number of characters read at a time.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module.
+
+    Returns
+    -------
+    TransactionSystem
+        The system, with the records of the response merged in.
+
+    Raises
+    ------
+    ValidationError
+        If the response does not match TransactionSystemSchema. The system is left as it was.
+
+    LookupError
+        If a record refers to an Id that is neither in the system nor in the response. The system is left as it was.
+    """
+    return load_stream(json_file, chunk_size, compiled, system, merge=True)
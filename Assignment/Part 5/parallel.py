@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+""" Parallel Loader
+
+This module validates the sections of a web api response across a pool of processes. The records of every section
+are independent of each other until they are linked, so each section is split into chunks of records, the chunks are
+validated by the compiled record schemas in the worker processes, and the loaded records are linked into a
+TransactionSystem in one final pass in the calling process.
+
+The error messages of the chunks are merged back under the index the records have in their section, so the
+ValidationError raised is the same as the one of TransactionSystemSchema.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * validator - To validate the records with compiled schemas
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * concurrent.futures - To run the process pool
+
+This file contains the following functions:
+
+    * iter_chunks - Yields the chunks a section is split into.
+    * validate_chunk - Returns the loaded records and the error messages of one chunk.
+    * validate_parallel - Returns the loaded records of every section of the response.
+    * load_parallel - Returns the TransactionSystem populated with the data from the response.
+
+"""
+# Built-In Packages
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# User Packages
+from schema import TransactionSystemSchema, ValidationError
+from validator import CompiledTransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+CHUNK_SIZE = 5000
+
+# Compiled schemas of the process, compiled on the first chunk it validates
+_compiled = None
+
+
+def iter_chunks(records, chunk_size=CHUNK_SIZE):
+    """
+    Splitting the records of a section into chunks
+
+    ...
+
+    Parameters
+    ----------
+    records : list
+        Records of the section.
+
+    chunk_size : int
+        Number of records in a chunk.
+
+    Yields
+    ------
+    tuple
+        Index of the first record of the chunk in the section, and the records of the chunk.
+    """
+    for _start in range(0, len(records), chunk_size):
+        yield _start, records[_start:_start + chunk_size]
+
+
+def validate_chunk(section, start, records):
+    """
+    Validating a chunk of the records of a section
+
+    ...
+
+    Parameters
+    ----------
+    section : str
+        Name of the section.
+
+    start : int
+        Index of the first record of the chunk in the section.
+
+    records : list
+        Records of the chunk.
+
+    Returns
+    -------
+    tuple
+        List of the loaded valid records, and dict of error messages keyed by the index of the invalid records in
+        the section.
+    """
+    global _compiled
+    if _compiled is None:
+        _compiled = CompiledTransactionSystemSchema()
+    _loaded, _errors = _compiled.record_schema(section).load_many(records)
+    return _loaded, {start + _index: _messages for _index, _messages in _errors.items()}
+
+
+def validate_parallel(data, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Validating the sections of the response across a pool of processes
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    workers : int, optional
+        Number of processes, the number of CPUs if not given. With a single worker the chunks are validated in
+        the calling process, without starting a pool.
+
+    chunk_size : int
+        Number of records validated by a process at a time.
+
+    Returns
+    -------
+    dict
+        Loaded records of every section, keyed by the name of the section.
+
+    Raises
+    ------
+    ValidationError
+        If the response is invalid, with the same messages as TransactionSystemSchema.
+    """
+    schema = TransactionSystemSchema()
+    if type(data) is not dict:
+        # Raises the ValidationError of a response which is not an object
+        schema.load(data)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _errors = {}
+    _jobs = []
+    for _section, _records in data.items():
+        if _section not in schema.fields:
+            _errors[_section] = ['Unknown field.']
+        elif type(_records) is not list:
+            try:
+                schema.fields[_section].deserialize(_records)
+            except ValidationError as err:
+                _errors[_section] = err.messages
+        else:
+            _jobs.extend((_section, _start, _chunk) for _start, _chunk in iter_chunks(_records, chunk_size))
+
+    if workers > 1 and len(_jobs) > 1:
+        with ProcessPoolExecutor(min(workers, len(_jobs))) as pool:
+            _results = list(pool.map(validate_chunk, *zip(*_jobs)))
+    else:
+        _results = [validate_chunk(*_job) for _job in _jobs]
+
+    _loaded = {_section: [] for _section, _records in data.items()
+               if _section in schema.fields and type(_records) is list}
+    for (_section, _, _), (_chunk_loaded, _chunk_errors) in zip(_jobs, _results):
+        _loaded[_section].extend(_chunk_loaded)
+        if _chunk_errors:
+            _errors.setdefault(_section, {}).update(_chunk_errors)
+    if _errors:
+        raise ValidationError(_errors)
+    return _loaded
+
+
+def load_parallel(data, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Validating the response across a pool of processes and creating the transaction system
+
+    ...
+
+    Parameters
+    ----------
+    data : dict
+        Json response from the web api.
+
+    workers : int, optional
+        Number of processes, the number of CPUs if not given. With a single worker the chunks are validated in
+        the calling process, without starting a pool.
+
+    chunk_size : int
+        Number of records validated by a process at a time.
+
+    Returns
+    -------
+    TransactionSystem
+        Populates the transaction system class with data from response and returns an instance of it.
+
+    Raises
+    ------
+    ValidationError
+        If the response is invalid, with the same messages as TransactionSystemSchema.
+
+    LookupError
+        If a record refers to an Id that is not in the response.
+    """
+    schema = TransactionSystemSchema()
+    if type(data) is not dict:
+        return schema.load(data)
+    return schema.make_transaction_system(validate_parallel(data, workers, chunk_size))
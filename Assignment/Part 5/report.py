@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+""" Report Writers
+
+This module writes the records returned by the queries of TransactionSystem to a stream, as they are produced, so a
+report over many transactions is never built up as one string in memory.
+
+The text writer gives the same reports the queries used to print, the JSON lines and CSV writers give one row per
+record for other tools to consume.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * csv - To write CSV reports
+    * json - To write JSON lines reports
+
+This file contains the following Classes:
+
+    * ReportWriter - Base class which buffers the output of a report and writes it to a stream.
+
+    * TextWriter - This class writes reports as human readable text.
+
+    * JsonLinesWriter - This class writes reports with one JSON object per record.
+
+    * CsvWriter - This class writes reports as CSV rows.
+
+"""
+# Built-In Packages
+import csv
+import json
+from types import SimpleNamespace
+
+__author__ = 'praveen@gyandata.com'
+
+REPORTS = ('staff_details', 'customer_details', 'transaction_details', 'staff_performance', 'customer_value',
+           'branch_inventory')
+
+BUFFER_SIZE = 64 * 1024
+
+_RULE = "-------------------------------------"
+
+
+class ReportWriter:
+    """
+    ReportWriter class which buffers the output of a report and writes it to a stream.
+
+    ...
+
+    Attributes
+    ----------
+    stream : file
+        Text stream the reports are written to.
+
+    buffer_size : int
+        Number of characters collected before they are written to the stream.
+
+    Methods
+    -------
+    write(report, records, subject=None)
+        Writes the records of a report.
+
+    flush()
+        Writes the collected output to the stream.
+
+    """
+    def __init__(self, stream, buffer_size=BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def _emit(self, text):
+        """ Collecting text, which is written to the stream once buffer_size characters are collected """
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """ Writing the collected output to the stream """
+        if self._buffer:
+            self.stream.write(''.join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        self.stream.flush()
+
+    def write(self, report, records, subject=None):
+        """
+        Writing the records of a report
+
+        ...
+
+        Parameters
+        ----------
+        report : str
+            Name of the report, one of REPORTS.
+
+        records : Iterable or namedtuple
+            Records returned by the query of the report, a single record for staff_performance and customer_value.
+
+        subject : str, optional
+            Name of the staff, customer or branch the report is about, used by the text headers.
+
+        Raises
+        ------
+        ValueError
+            If the report is not one of REPORTS.
+        """
+        if report not in REPORTS:
+            raise ValueError(f"Unknown report: {report}")
+        if report in ('staff_performance', 'customer_value'):
+            records = (records,)
+        self._write(report, records, subject)
+
+    def _write(self, report, records, subject):
+        raise NotImplementedError
+
+
+class TextWriter(ReportWriter):
+    """
+    TextWriter class which writes reports as human readable text.
+
+    ...
+
+    Methods
+    -------
+    write_heading(title=None)
+        Writes a heading between reports.
+
+    """
+    def write_heading(self, title=None):
+        """ Writing a heading, or only its rule if no title is given """
+        if title is not None:
+            self._emit(f"\n{title}")
+        self._emit("\n--------------------------------------------------------\n")
+
+    def _write(self, report, records, subject):
+        getattr(self, f"_{report}")(records, subject)
+
+    def _staff_details(self, records, subject):
+        self._emit(f"The Transactions Handled by Staff: {subject}\n{_RULE}\n")
+        for _record in records:
+            self._emit(f"Transaction Id: {_record.transaction_id}\nCustomer: {_record.customer_name}\n"
+                       f"Handling Branch: {_record.branch_name}\nDate: {_record.datetime}\n\n{_RULE}\n")
+        self._emit("\n")
+
+    def _customer_details(self, records, subject):
+        self._emit(f"The Transactions In which the Customer: {subject} was involved:\n{_RULE}\n")
+        for _record in records:
+            self._emit(f"Transaction Id: {_record.transaction_id}\nStaff: {_record.staff_name}\n"
+                       f"Handling Branch: {_record.branch_name}\nDate: {_record.datetime}\n{_RULE}\n")
+        self._emit("\n")
+
+    def _transaction_details(self, records, subject):
+        _current = None
+        for _record in records:
+            if _record.transaction_id != _current:
+                if _current is not None:
+                    self._emit(f"\n{_RULE}\n\n")
+                _current = _record.transaction_id
+                self._emit(f"\nFor the Transaction: {_current}\n")
+            if _record.purchase_id is not None:
+                self._emit(f"\nPurchase Id: {_record.purchase_id}\nProduct Id: {_record.product_name}\n"
+                           f"Quantity: {_record.quantity}\nTotal Price: {_record.total_price}\n")
+        if _current is not None:
+            self._emit(f"\n{_RULE}\n\n")
+
+    def _staff_performance(self, records, subject):
+        for _record in records:
+            self._emit(f"The Number of Products sold by Staff {_record.name} is {_record.quantity}"
+                       f" and Total Monetary Value: {_record.revenue}\n")
+
+    def _customer_value(self, records, subject):
+        for _record in records:
+            self._emit(f"The Number of Products Bought by Customer {_record.name} is {_record.quantity}"
+                       f" and Total Monetary Value: {_record.revenue}\n")
+
+    def _branch_inventory(self, records, subject):
+        self._emit(f"\n\nThe Inventory Details for Branch: {subject}\n--------------------------------\n\n\n")
+        for _record in records:
+            self._emit(f"The Inventory for Product: {_record.product_id} is {_record.quantity}\n")
+
+
+class JsonLinesWriter(ReportWriter):
+    """
+    JsonLinesWriter class which writes reports with one JSON object per record, tagged with the name of the report.
+    Datetimes are written in their str form.
+    """
+    def _write(self, report, records, subject):
+        for _record in records:
+            _row = {'report': report}
+            _row.update(_record._asdict())
+            self._emit(json.dumps(_row, default=str) + "\n")
+
+
+class CsvWriter(ReportWriter):
+    """
+    CsvWriter class which writes reports as CSV rows, with a header row whenever the fields of the records change.
+    """
+    def __init__(self, stream, buffer_size=BUFFER_SIZE):
+        super().__init__(stream, buffer_size)
+        self._fields = None
+        self._writer = csv.writer(SimpleNamespace(write=self._emit), lineterminator='\n')
+
+    def _write(self, report, records, subject):
+        for _record in records:
+            if _record._fields != self._fields:
+                self._fields = _record._fields
+                self._writer.writerow(('report',) + _record._fields)
+            self._writer.writerow((report,) + tuple(_record))
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+""" Time Bucketed Rollups
+
+This module keeps the quantity and revenue of purchases summed per day, for every staff, customer, branch and
+product, so questions such as "revenue per branch per month" are answered from a few buckets instead of from every
+purchase.
+
+The totals of an entity are three arrays with one slot per day it has purchases on, the day and its quantity and
+revenue, so they take 24 bytes per day however many purchases there are. An added purchase goes straight into the
+totals of the day, nothing is kept per purchase. Monthly totals are summed from the daily ones when asked for. Range
+sums are answered from prefix sums over the days of an entity, built when the entity is first queried after a change
+and left out when the rollup is pickled, so a range sum costs two binary searches over its days. A range of months is
+the range of days from the first day of its first month.
+
+A rollup may be scoped by one of its groups, such as the branch: the totals of the entities of the other groups are
+then kept for every scope they have purchases in as well, so the sales of a staff within a branch come from the
+buckets too.
+
+The entities with the highest sales are selected with a heap of size k over the range sums of every entity, overall
+or within a scope, without sorting them all or reading the purchases.
+
+This file contains the following Classes:
+
+    * Rollup - This class keeps the daily purchase totals of every entity.
+
+This file contains the following functions:
+
+    * day_bucket - Returns the day holding a datetime.
+    * month_bucket - Returns the first day of the month holding a datetime.
+
+"""
+# Built-In Packages
+import heapq
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from itertools import accumulate
+
+__author__ = 'praveen@gyandata.com'
+
+
+def day_bucket(when):
+    """ Returns the day holding a datetime or date """
+    return when.date() if isinstance(when, datetime) else when
+
+
+def month_bucket(when):
+    """ Returns the first day of the month holding a datetime or date """
+    return date(when.year, when.month, 1)
+
+
+# First day of the bucket of a datetime, keyed by the name of the period
+PERIODS = {'day': day_bucket, 'month': month_bucket}
+
+
+class Rollup:
+    """
+    Rollup class which keeps the daily purchase totals of every entity.
+
+    Entities are keyed by group and Id, such as ('branch', 100001), and by group, Id and the Id of the scope within a
+    scope, such as ('staff', 100003, 100001). Days are kept as proleptic Gregorian ordinals.
+
+    ...
+
+    Attributes
+    ----------
+    groups : tuple
+        Groups of the Ids of a purchase, such as ('staff', 'customer', 'branch', 'product').
+
+    scope : int
+        Index of the group within which the other groups are also summed, None if they are only summed overall.
+
+    Methods
+    -------
+    add(ids, when, quantity, revenue)
+        Adds a purchase to the day holding when, for every entity in ids.
+
+    buckets(key, period)
+        Returns the first day, quantity and revenue of every day or month of an entity, in time order.
+
+    between(key, start, end, period)
+        Returns the quantity and revenue of an entity in the days or months from start up to end.
+
+    top(group, k, index, start, end, scope_id)
+        Returns the k entities of a group with the highest quantity or revenue in a range of days.
+
+    Raises
+    ------
+    ValueError
+        If the period is not known.
+
+    """
+    def __init__(self, groups, scope=None):
+        self.groups = groups
+        self.scope = scope
+
+        # Totals of an entity: the days with purchases in order, and the quantity and revenue of each
+        self._totals = {}
+
+        # Prefix sums of the quantity and revenue of the days of an entity, dropped on change
+        self._prefix = {}
+
+        # Ids of the entities of a group, keyed by the group alone or by the group and the Id of the scope, in the
+        # order of their first purchase
+        self._members = {}
+
+    def add(self, ids, when, quantity, revenue):
+        """
+        Adding a purchase to the day holding its datetime
+
+        ...
+
+        Parameters
+        ----------
+        ids : tuple
+            Ids of the entities of the purchase, one for each of the groups.
+
+        when : datetime
+            Datetime of the transaction of the purchase.
+
+        quantity : int
+            Quantity of the purchase.
+
+        revenue : float
+            Total price of the purchase.
+
+        """
+        _day = when.toordinal()
+        _totals = self._totals
+        _keys = list(zip(self.groups, ids))
+        if self.scope is not None:
+            _scope_id = ids[self.scope]
+            _keys += [(_group, _id, _scope_id) for _index, (_group, _id) in enumerate(_keys) if _index != self.scope]
+        for _key in _keys:
+            _series = _totals.get(_key)
+            if _series is None:
+                _series = self._new_series(_key)
+            _days, _quantities, _revenues = _series
+            _offset = bisect_left(_days, _day)
+            if _offset == len(_days) or _days[_offset] != _day:
+                _days.insert(_offset, _day)
+                _quantities.insert(_offset, 0)
+                _revenues.insert(_offset, 0)
+            _quantities[_offset] += quantity
+            _revenues[_offset] += revenue
+        if self._prefix:
+            for _key in _keys:
+                self._prefix.pop(_key, None)
+
+    def __getstate__(self):
+        # The prefix sums are rebuilt from the totals on the next query
+        return {**self.__dict__, '_prefix': {}}
+
+    def _new_series(self, key):
+        """ Returns the empty totals of an entity with no purchases yet, making it a member of its group """
+        self._members.setdefault(key[:1] + key[2:], []).append(key[1])
+        _series = self._totals[key] = (array('l'), array('q'), array('d'))
+        return _series
+
+    @staticmethod
+    def _bucket(period):
+        """ Returns the function giving the first day of the bucket of a datetime """
+        if period not in PERIODS:
+            raise ValueError(f"Unknown Period: {period}")
+        return PERIODS[period]
+
+    def buckets(self, key, period='day'):
+        """
+        Returns the first day, quantity and revenue of every day or month of an entity holding a purchase, in time
+        order
+        """
+        _bucket = self._bucket(period)
+        _sums = {}
+        for _day, _quantity, _revenue in zip(*self._totals.get(key, ((), (), ()))):
+            _start = _bucket(date.fromordinal(_day))
+            _sum = _sums.get(_start)
+            if _sum is None:
+                _sums[_start] = [_quantity, _revenue]
+            else:
+                _sum[0] += _quantity
+                _sum[1] += _revenue
+        return [(_start, *_sum) for _start, _sum in _sums.items()]
+
+    def _prefix_sums(self, key):
+        """ Returns the days of an entity and the prefix sums of their quantity and revenue """
+        _prefix = self._prefix.get(key)
+        if _prefix is None:
+            _days, _quantities, _revenues = self._totals.get(key, ((), (), ()))
+            _prefix = self._prefix[key] = (_days, array('q', accumulate(_quantities, initial=0)),
+                                           array('d', accumulate(_revenues, initial=0)))
+        return _prefix
+
+    def between(self, key, start=None, end=None, period='day'):
+        """
+        Summing the days or months of an entity from the one holding start up to, not including, the one holding end
+
+        ...
+
+        Parameters
+        ----------
+        key : tuple
+            Group and Id of the entity.
+
+        start : datetime or date, optional
+            The day or month holding start is the first summed, from the first day if not given.
+
+        end : datetime or date, optional
+            The day or month holding end is the first not summed, up to the last day if not given.
+
+        period : str
+            'day' or 'month'.
+
+        Returns
+        -------
+        tuple
+            Quantity and revenue of the summed days.
+        """
+        _bucket = self._bucket(period)
+        _days, _quantities, _revenues = self._prefix_sums(key)
+        _start = 0 if start is None else bisect_left(_days, _bucket(start).toordinal())
+        _end = len(_days) if end is None else bisect_left(_days, _bucket(end).toordinal())
+        if _end <= _start:
+            return 0, 0
+        return _quantities[_end] - _quantities[_start], _revenues[_end] - _revenues[_start]
+
+    def top(self, group, k, index=1, start=None, end=None, scope_id=None):
+        """
+        Selecting the entities of a group with the highest sales in a range of days
+
+        ...
+
+        Parameters
+        ----------
+        group : str
+            Group of the entities, such as 'staff'.
+
+        k : int
+            Number of entities returned.
+
+        index : int
+            0 to rank by quantity, 1 to rank by revenue.
+
+        start : datetime or date, optional
+            Sales from the day holding start are summed, from the first day if not given.
+
+        end : datetime or date, optional
+            Sales before the day holding end are summed, up to the last day if not given.
+
+        scope_id : int, optional
+            Only sales within the entity of the scope group with this Id are summed, such as those of a branch.
+
+        Returns
+        -------
+        list
+            Id, quantity and revenue of at most k entities with sales in the range, highest first. Entities with
+            equal sales are in the order of their first purchase, within the scope if one is given.
+        """
+        _scope = () if scope_id is None else (scope_id,)
+        _sums = ((_id, *self.between((group, _id, *_scope), start, end))
+                 for _id in self._members.get((group, *_scope), ()))
+        return heapq.nlargest(k, (_sum for _sum in _sums if _sum[1] or _sum[2]), key=lambda _sum: _sum[index + 1])
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+""" Scaling Benchmark Suite
+
+This script generates responses at multiples of the size of Responses/date.json, times loading them with
+TransactionSystemSchema and running every query of TransactionSystem on the loaded system, and writes the timings
+as JSON, so the results of two versions of the code can be compared.
+
+The staff, customers, transactions and purchases grow with the scale, the branches and products stay as in the sample
+response. Responses larger than the Id ranges of the record schemas allow are loaded with the unbounded schema of
+the generator module, which is recorded with the results.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * generator - To generate the responses
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * json - To write the results
+    * argparse - To read the command line arguments
+
+This file contains the following functions:
+
+    * scaled_counts - Returns the record counts of a response at a given scale.
+    * time_queries - Returns the time taken by every query of a transaction system.
+    * run_suite - Returns the results of the suite at the given scales.
+    * main - Runs the suite with the arguments given on the command line and writes its results.
+
+"""
+# Built-In Packages
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+# User Packages
+from generator import DEFAULT_COUNTS, fits_schema, generate_response, unbounded_schema
+from schema import TransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+SCALES = (1, 10, 100)
+
+RESULTS_FILE = 'benchmark_results.json'
+
+# Counts which stay as in the sample response at every scale
+FIXED_COUNTS = ('branches', 'products')
+
+
+def scaled_counts(scale):
+    """
+    Returns the record counts of a response at the given multiple of the size of Responses/date.json
+    """
+    return {_name: _count if _name in FIXED_COUNTS else max(round(_count * scale), 1)
+            for _name, _count in DEFAULT_COUNTS.items()}
+
+
+def _timed(func, *args, repeat=1):
+    """ Returns the best wall time of func over repeat runs, consuming the iterator it may return """
+    _best = float('inf')
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        _result = func(*args)
+        if isinstance(_result, Iterator):
+            for _ in _result:
+                pass
+        _best = min(_best, time.perf_counter() - _start)
+    return _best
+
+
+def _for_each(query, ids):
+    """ Runs a query for every id, skipping the ids it has nothing for """
+    for _id in ids:
+        try:
+            _result = query(_id)
+        except LookupError:
+            continue
+        if isinstance(_result, Iterator):
+            for _ in _result:
+                pass
+
+
+def time_queries(ts, repeat=1):
+    """
+    Timing every query of a transaction system
+
+    Queries about a staff, customer or branch are run for every one of them.
+
+    ...
+
+    Parameters
+    ----------
+    ts : TransactionSystem
+        Transaction system to be queried.
+
+    repeat : int
+        Number of times each query is run, the best time is kept.
+
+    Returns
+    -------
+    dict
+        Wall time in seconds, keyed by query name.
+    """
+    _staff_ids = [_staff.id for _staff in ts.staffs]
+    _customer_ids = [_customer.id for _customer in ts.customers]
+    _branch_ids = [_branch.id for _branch in ts.branches]
+    _month = (datetime(2018, 6, 1), datetime(2018, 6, 1) + timedelta(days=30))
+    return {
+        'get_staff_details': _timed(_for_each, ts.get_staff_details, _staff_ids, repeat=repeat),
+        'get_customer_details': _timed(_for_each, ts.get_customer_details, _customer_ids, repeat=repeat),
+        'get_transaction_details': _timed(ts.get_transaction_details, repeat=repeat),
+        'get_transaction_details_month': _timed(ts.get_transaction_details, *_month, repeat=repeat),
+        'get_transactions_between_month': _timed(ts.get_transactions_between, *_month, repeat=repeat),
+        'get_staff_performance': _timed(_for_each, ts.get_staff_performance, _staff_ids, repeat=repeat),
+        'get_customer_value': _timed(_for_each, ts.get_customer_value, _customer_ids, repeat=repeat),
+        'get_branch_inventory': _timed(_for_each, ts.get_branch_inventory, _branch_ids, repeat=repeat),
+        'get_sales_summary': _timed(ts.get_sales_summary, repeat=repeat),
+        'get_rollup_branch_month': _timed(_for_each, lambda _id: ts.get_rollup('branch', _id), _branch_ids,
+                                          repeat=repeat),
+        'get_sales_between_branch_month': _timed(_for_each, lambda _id: ts.get_sales_between('branch', _id, *_month),
+                                                 _branch_ids, repeat=repeat),
+        'get_top_staff': _timed(ts.get_top, 'staff', repeat=repeat),
+        'get_top_customer_month': _timed(ts.get_top, 'customer', 10, 'revenue', *_month, repeat=repeat),
+    }
+
+
+def run_suite(scales=SCALES, skew=0.0, repeat=1, seed=0):
+    """
+    Running the suite at the given scales
+
+    ...
+
+    Parameters
+    ----------
+    scales : tuple
+        Multiples of the size of Responses/date.json.
+
+    skew : float
+        Zipf exponent of the generated responses.
+
+    repeat : int
+        Number of times each load and query is run, the best time is kept.
+
+    seed : int
+        Seed for the generated responses.
+
+    Returns
+    -------
+    list
+        Result of every scale: its counts, the schema used, the load time and the query times.
+    """
+    _results = []
+    for _scale in scales:
+        _counts = scaled_counts(_scale)
+        _data = generate_response(skew=skew, seed=seed, **_counts)
+        _schema = TransactionSystemSchema() if fits_schema(_counts) else unbounded_schema()()
+        _ts = _schema.load(_data)
+        _results.append({
+            'scale': _scale,
+            'counts': _counts,
+            'records': sum(len(_records) for _records in _data.values()),
+            'schema': type(_schema).__name__,
+            'load_seconds': _timed(_schema.load, _data, repeat=repeat),
+            'queries': time_queries(_ts, repeat),
+        })
+    return _results
+
+
+def _commit():
+    """ Returns the commit of the working tree, None outside a git repository """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """
+    Runs the suite with the arguments given on the command line and writes its results
+    """
+    parser = argparse.ArgumentParser(description="Time loading and querying generated responses at several scales")
+    parser.add_argument('--scales', type=float, nargs='+', default=list(SCALES),
+                        help="Multiples of the size of Responses/date.json")
+    parser.add_argument('--skew', type=float, default=0.0, help="Zipf exponent of the generated responses")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs of each timing, the best is kept")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated responses")
+    parser.add_argument('--output', default=RESULTS_FILE, help="File the results are written to")
+    args = parser.parse_args()
+
+    _results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'skew': args.skew,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': run_suite(args.scales, args.skew, args.repeat, args.seed),
+    }
+    with open(args.output, 'w') as json_file:
+        json.dump(_results, json_file, indent=4)
+
+    for _result in _results['results']:
+        print(f"Scale {_result['scale']:g}: {_result['records']} records loaded in {_result['load_seconds']:.3f} s "
+              f"with {_result['schema']}")
+
+
+if __name__ == '__main__':
+    main()
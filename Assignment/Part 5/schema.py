@@ -26,6 +26,11 @@ This file contains the following Classes:
     * TransactionSystemSchema - This class validates the full data from the response by nesting
       the above schema classes.
 
+This file contains the following functions, which add the object made from one validated record
+to a transaction system and are shared by the schema and the streaming loader:
+
+    * make_customer, make_product, make_branch, make_inventory, make_staff, make_transaction, make_purchase
+
 """
 
 # User Packages
@@ -142,58 +147,83 @@ class TransactionSystemSchema(Schema):
         ts = TransactionSystem()
 
         # Making Customer Objects
-        customers = []
         for customer in _data['CUSTOMERS']:
-            customers.append(Customer(customer['Id'], customer['name'], customer['Email']))
-        ts.customers = customers
+            make_customer(ts, customer)
 
         # Making Product Objects
-        products = []
         for product in _data['PRODUCTS']:
-            products.append(Product(product['Id'], product['name'], product['Price']))
-        ts.products = products
+            make_product(ts, product)
 
         # Making Branch Objects
-        branch_ids = set()
-        branches = []
         for branch in _data['BRANCHES']:
-            if branch['B_Id'] not in branch_ids:
-                branch_ids.add(branch['B_Id'])
-                product_id = ts.get_product(branch['Pr_Id'])
-                inventory = [[product_id, branch['Inventory']]]
-                branches.append(Branch(branch['B_Id'], branch['name'], inventory))
-                ts.branches = branches
-            else:
-                try:
-                    product_id = ts.get_product(branch['Pr_Id'])
-                    inventory = [product_id, branch['Inventory']]
-                    ts.get_branch(branch['B_Id']).products.append(inventory)
-                except LookupError:
-                    continue
-        ts.branches = branches
+            make_branch(ts, branch)
+            make_inventory(ts, branch)
 
         # Making Staff Objects
-        staffs = []
         for staff in _data['STAFF']:
-            staffs.append(Staff(staff['Id'], staff['name'], staff['Email'], ts.get_branch(staff['B_Id'])))
-        ts.staffs = staffs
+            make_staff(ts, staff)
 
         # Making Transaction Objects
-        trans = []
         for transaction in _data['TRANSACTIONS']:
-            trans.append(Transaction(transaction['T_Id'], ts.get_staff(transaction['S_Id']),
-                                     ts.get_customer(transaction['C_Id']), ts.get_branch(transaction['B_Id']),
-                                     transaction['DateTime']))
-        ts.transactions = trans
+            make_transaction(ts, transaction)
 
         # Making Purchase Objects
-        purchases = []
         for purchase in _data['PURCHASES']:
-            purchases.append(Purchase(purchase['P_Id'], ts.get_transaction(purchase['T_Id']),
-                                      ts.get_product(purchase['Pr_Id']), purchase['Quantity'],
-                                      purchase['T_price']))
-        ts.purchases = purchases
+            make_purchase(ts, purchase)
 
         # Returning the Transaction System Object
         return ts
 
+
+def make_customer(ts, customer):
+    """Adding a Customer object made from a validated customer record to the transaction system"""
+    ts.add_customer(Customer(customer['Id'], customer['name'], customer['Email']))
+
+
+def make_product(ts, product):
+    """Adding a Product object made from a validated product record to the transaction system"""
+    ts.add_product(Product(product['Id'], product['name'], product['Price']))
+
+
+def make_branch(ts, branch):
+    """Adding a Branch object made from a validated branch record, if the branch is not in the system yet"""
+    try:
+        ts.get_branch(branch['B_Id'])
+    except LookupError:
+        ts.add_branch(Branch(branch['B_Id'], branch['name'], {}))
+
+
+def make_inventory(ts, branch):
+    """Adding the inventory of a validated branch record to its branch
+
+    Raises
+    ------
+    LookupError
+        If the product is not in the system and this is the first inventory record of the branch,
+        unknown products in later records of the branch are skipped.
+    """
+    _branch = ts.get_branch(branch['B_Id'])
+    try:
+        ts.add_inventory(branch['B_Id'], branch['Pr_Id'], branch['Inventory'])
+    except LookupError:
+        if not _branch.products:
+            raise
+
+
+def make_staff(ts, staff):
+    """Adding a Staff object made from a validated staff record to the transaction system"""
+    ts.add_staff(Staff(staff['Id'], staff['name'], staff['Email'], ts.get_branch(staff['B_Id'])))
+
+
+def make_transaction(ts, transaction):
+    """Adding a Transaction object made from a validated transaction record to the transaction system"""
+    ts.add_transaction(Transaction(transaction['T_Id'], ts.get_staff(transaction['S_Id']),
+                                   ts.get_customer(transaction['C_Id']), ts.get_branch(transaction['B_Id']),
+                                   transaction['DateTime']))
+
+
+def make_purchase(ts, purchase):
+    """Adding a Purchase object made from a validated purchase record to the transaction system"""
+    ts.add_purchase(Purchase(purchase['P_Id'], ts.get_transaction(purchase['T_Id']),
+                             ts.get_product(purchase['Pr_Id']), purchase['Quantity'],
+                             purchase['T_price']))
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+""" Sharded Transaction System
+
+This module splits a web api response by branch into independent TransactionSystems, one per branch, and keeps them
+in a pool of worker processes. Every staff belongs to a branch and every transaction records its branch, so the
+transactions of a branch, their purchases, the staff and customers they refer to and the inventory of the branch
+make up a shard which answers the queries about that branch on its own.
+
+A query is sent to every worker at once and each answers it from its shards in parallel. Queries about one branch
+go to the worker holding it only. Answers which span branches, such as the value of a customer who bought in many
+branches, are merged in the calling process from the answers of the shards.
+
+The products are in every shard. A customer is in the shards of the branches they bought in, and customers without
+transactions are in the first shard.
+
+The calling process keeps the position of every transaction in the response, which the transaction records merged
+from the shards are ordered by, so they come in the order a single TransactionSystem gives them.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * parallel - To validate the response across a pool of processes
+    * loader - For the builders of the sections
+    * multiprocessing - To run the worker processes
+
+This file contains the following Classes:
+
+    * ShardedTransactionSystem - This class answers queries from per branch shards held in worker processes.
+
+This file contains the following functions:
+
+    * shard_records - Returns the loaded records of every section split by branch.
+    * build_shard - Returns the TransactionSystem of the records of a shard.
+
+"""
+# Built-In Packages
+import heapq
+import multiprocessing
+import os
+import sys
+from collections.abc import Iterator
+from operator import attrgetter
+
+# User Packages
+from loader import BUILD_STEPS
+from parallel import CHUNK_SIZE, validate_parallel
+from transaction import TransactionSystem, Sales, SalesRecord, RollupRecord
+
+__author__ = 'praveen@gyandata.com'
+
+SECTIONS = ('CUSTOMERS', 'PRODUCTS', 'BRANCHES', 'STAFF', 'TRANSACTIONS', 'PURCHASES')
+
+
+def shard_records(loaded):
+    """
+    Splitting the loaded records of a response by branch
+
+    ...
+
+    Parameters
+    ----------
+    loaded : dict
+        Loaded records of every section, as returned by validate_parallel.
+
+    Returns
+    -------
+    dict
+        Records of every section of a shard, keyed by Branch Id in the order the branches first appear.
+
+    Raises
+    ------
+    LookupError
+        If a record refers to an Id that is not in the response.
+    """
+    _shards = {}
+    for _row in loaded.get('BRANCHES', ()):
+        _shards.setdefault(_row['B_Id'], {_section: [] for _section in SECTIONS})['BRANCHES'].append(_row)
+    for _shard in _shards.values():
+        _shard['PRODUCTS'] = loaded.get('PRODUCTS', [])
+
+    _staff = {}
+    for _record in loaded.get('STAFF', ()):
+        if _record['B_Id'] not in _shards:
+            raise LookupError("Branch Not in DB")
+        _shards[_record['B_Id']]['STAFF'].append(_record)
+        _staff[_record['Id']] = _record
+    _customers = {_record['Id']: _record for _record in loaded.get('CUSTOMERS', ())}
+
+    # Ids of the staff and customers already in each shard
+    _shard_staff = {_branch_id: {_record['Id'] for _record in _shard['STAFF']}
+                    for _branch_id, _shard in _shards.items()}
+    _shard_customers = {_branch_id: set() for _branch_id in _shards}
+    _branch_of = {}
+    for _record in loaded.get('TRANSACTIONS', ()):
+        if _record['S_Id'] not in _staff:
+            raise LookupError("Staff Not in DB")
+        if _record['C_Id'] not in _customers:
+            # Worded as the message of TransactionSystem.get_customer
+            raise LookupError("customer Not in DB")
+        _branch_id = _record['B_Id']
+        if _branch_id not in _shards:
+            raise LookupError("Branch Not in DB")
+        _shard = _shards[_branch_id]
+        if _record['S_Id'] not in _shard_staff[_branch_id]:
+            # A staff of another branch, which is added with the first row of their branch
+            _shard_staff[_branch_id].add(_record['S_Id'])
+            _staff_record = _staff[_record['S_Id']]
+            _home = _shards[_staff_record['B_Id']]['BRANCHES'][0]
+            if _home not in _shard['BRANCHES']:
+                _shard['BRANCHES'].append(_home)
+            _shard['STAFF'].append(_staff_record)
+        if _record['C_Id'] not in _shard_customers[_branch_id]:
+            _shard_customers[_branch_id].add(_record['C_Id'])
+            _shard['CUSTOMERS'].append(_customers[_record['C_Id']])
+        _shard['TRANSACTIONS'].append(_record)
+        _branch_of[_record['T_Id']] = _branch_id
+
+    if _shards:
+        _first = next(iter(_shards))
+        _referenced = set().union(*_shard_customers.values())
+        _shards[_first]['CUSTOMERS'].extend(_record for _id, _record in _customers.items()
+                                            if _id not in _referenced)
+
+    for _record in loaded.get('PURCHASES', ()):
+        if _record['T_Id'] not in _branch_of:
+            raise LookupError("Transaction Not in DB")
+        _shards[_branch_of[_record['T_Id']]]['PURCHASES'].append(_record)
+    return _shards
+
+
+def build_shard(records):
+    """
+    Building the TransactionSystem of a shard
+
+    ...
+
+    Parameters
+    ----------
+    records : dict
+        Loaded records of every section of the shard.
+
+    Returns
+    -------
+    TransactionSystem
+        Transaction system populated with the records of the shard.
+    """
+    ts = TransactionSystem()
+    for _, _section, _, _builder in BUILD_STEPS:
+        for _record in records[_section]:
+            _builder(ts, _record)
+    return ts
+
+
+def _answer(ts, method, args, kwargs):
+    """ Returns the answer of a shard to a query, or the LookupError or ValueError it raised """
+    try:
+        _result = getattr(ts, method)(*args, **kwargs)
+    except (LookupError, ValueError) as err:
+        return err
+    # Iterators are read out, to be sent back to the calling process
+    if isinstance(_result, Iterator):
+        _result = list(_result)
+    return _result
+
+
+def _serve(connection, shards):
+    """ Worker process which builds its shards and answers the queries sent over connection until it gets None """
+    try:
+        _systems = {_branch_id: build_shard(_records) for _branch_id, _records in shards.items()}
+    except LookupError as err:
+        connection.send(err)
+        return
+    del shards
+    connection.send(None)
+    while True:
+        _request = connection.recv()
+        if _request is None:
+            break
+        _method, _args, _kwargs, _branch_ids, _with_branch = _request
+        connection.send({_branch_id: _answer(_systems[_branch_id], _method,
+                                             (_branch_id, *_args) if _with_branch else _args, _kwargs)
+                         for _branch_id in _branch_ids})
+    connection.close()
+
+
+class ShardedTransactionSystem:
+    """
+    ShardedTransactionSystem class which answers queries from per branch shards held in worker processes.
+
+    It is used as a context manager, which stops the workers on exit.
+
+    ...
+
+    Attributes
+    ----------
+    branch_ids : list
+        Ids of the branches, one shard each.
+
+    workers : int
+        Number of worker processes, 0 if the shards are kept in the calling process.
+
+    Methods
+    -------
+    map_branches(method, *args, **kwargs)
+        Runs a TransactionSystem query about every branch on its shard.
+
+    get_staff_details(_id), get_customer_details(_id)
+        Returns the TransactionRecord of each transaction of a staff or customer, across branches, in the order of
+        the response.
+
+    get_transaction_details(start, end, staff_id, customer_id, branch_id)
+        Returns the PurchaseRecord of each purchase of the matching transactions, sorted by datetime and then in the
+        order of the response.
+
+    get_staff_performance(_id), get_customer_value(_id)
+        Returns the SalesRecord of a staff or customer, summed across branches.
+
+    get_branch_inventory(_id)
+        Returns the InventoryRecord of each product of a branch.
+
+    get_sales_summary()
+        Returns the sales of every staff, customer, branch and product, summed across branches.
+
+    get_rollup(group, id_, period), get_sales_between(group, id_, start, end, period)
+        Returns the sales of an entity per period, or over a range, summed across branches.
+
+    get_top(group, k, by, start, end, branch_id)
+        Returns the SalesRecord of the entities with the highest sales across branches.
+
+    close()
+        Stops the worker processes.
+
+    Raises
+    ------
+    ValidationError
+        If the response is invalid.
+
+    LookupError
+        If Id (Staff Id, Branch Id, etc) is not found.
+
+    """
+    def __init__(self, data, workers=None, chunk_size=CHUNK_SIZE):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        _loaded = validate_parallel(data, workers, chunk_size)
+        # Position of every transaction in the response, the first of a repeated Id as with its lookups
+        self._sequence = {}
+        for _seq, _record in enumerate(_loaded.get('TRANSACTIONS', ())):
+            self._sequence.setdefault(_record['T_Id'], _seq)
+        _shards = shard_records(_loaded)
+        del _loaded
+        self.branch_ids = list(_shards)
+        self.workers = min(workers, len(_shards)) if workers > 1 else 0
+        self._systems = {}
+        self._connections = []
+        self._processes = []
+        self._owner = {}
+        if not self.workers:
+            self._systems = {_branch_id: build_shard(_records) for _branch_id, _records in _shards.items()}
+            return
+
+        # The largest shards are handed out first, each to the worker with the fewest transactions so far
+        _assigned = [{} for _ in range(self.workers)]
+        _sizes = [0] * self.workers
+        for _branch_id in sorted(_shards, key=lambda _id: -len(_shards[_id]['TRANSACTIONS'])):
+            _worker = _sizes.index(min(_sizes))
+            _assigned[_worker][_branch_id] = _shards[_branch_id]
+            _sizes[_worker] += len(_shards[_branch_id]['TRANSACTIONS'])
+            self._owner[_branch_id] = _worker
+        del _shards
+        try:
+            for _worker_shards in _assigned:
+                _parent, _child = multiprocessing.Pipe()
+                _process = multiprocessing.Process(target=_serve, args=(_child, _worker_shards), daemon=True)
+                _process.start()
+                _child.close()
+                self._connections.append(_parent)
+                self._processes.append(_process)
+            for _connection in self._connections:
+                _error = _connection.recv()
+                if _error is not None:
+                    raise _error
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """ Stopping the worker processes """
+        for _connection, _process in zip(self._connections, self._processes):
+            if _process.is_alive():
+                try:
+                    _connection.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            _connection.close()
+        for _process in self._processes:
+            _process.join()
+        self._connections = []
+        self._processes = []
+
+    def _send(self, method, args, kwargs, branch_ids, with_branch=False):
+        """ Sending a query to the shards of the branches, returns the answer of each keyed by Branch Id """
+        if not self.workers:
+            return {_branch_id: _answer(self._systems[_branch_id], method,
+                                        (_branch_id, *args) if with_branch else args, kwargs)
+                    for _branch_id in branch_ids}
+        _requests = {}
+        for _branch_id in branch_ids:
+            _requests.setdefault(self._owner[_branch_id], []).append(_branch_id)
+        # Every worker is sent its query before any answer is read, so they answer at the same time
+        for _worker, _worker_branches in _requests.items():
+            self._connections[_worker].send((method, args, kwargs, _worker_branches, with_branch))
+        _answers = {}
+        for _worker in _requests:
+            _answers.update(self._connections[_worker].recv())
+        return {_branch_id: _answers[_branch_id] for _branch_id in branch_ids}
+
+    def _ask(self, method, *args, branch_ids=None, **kwargs):
+        """
+        Sending a query to the shards, every shard if branch_ids is not given, returns the answer of each keyed by
+        Branch Id
+
+        A LookupError raised by a shard is its answer, a ValueError is raised again.
+        """
+        _answers = self._send(method, args, kwargs, self.branch_ids if branch_ids is None else branch_ids)
+        for _result in _answers.values():
+            if isinstance(_result, ValueError):
+                raise _result
+        return _answers
+
+    @staticmethod
+    def _found(answers, message):
+        """
+        Returns the answers of the shards which did not raise a LookupError, raises the first one if all did, or a
+        LookupError with message if no shard was asked
+        """
+        _found = [_result for _result in answers.values() if not isinstance(_result, LookupError)]
+        if not _found:
+            raise next(iter(answers.values()), LookupError(message))
+        return _found
+
+    def _branch(self, branch_id):
+        """ Returns the Branch Id as a list, the shards to ask about it """
+        if branch_id not in self._owner and branch_id not in self._systems:
+            raise LookupError("Branch Not in DB")
+        return [branch_id]
+
+    def _single(self, method, branch_id, *args, **kwargs):
+        """ Returns the answer of the shard of a branch, raising its LookupError """
+        _result = self._ask(method, *args, branch_ids=self._branch(branch_id), **kwargs)[branch_id]
+        if isinstance(_result, LookupError):
+            raise _result
+        return _result
+
+    def map_branches(self, method, *args, **kwargs):
+        """
+        Running a TransactionSystem query about every branch, each on its shard
+
+        ...
+
+        Parameters
+        ----------
+        method : str
+            Name of the TransactionSystem query, which is given the Branch Id as its first argument.
+
+        args, kwargs
+            Further arguments of the query.
+
+        Returns
+        -------
+        dict
+            Answer of the query about each branch, keyed by Branch Id. Iterators are returned as lists.
+        """
+        _answers = self._send(method, args, kwargs, self.branch_ids, with_branch=True)
+        for _result in _answers.values():
+            if isinstance(_result, (LookupError, ValueError)):
+                raise _result
+        return _answers
+
+    def _in_response_order(self, answers):
+        """ Returns the records of the shards merged in the order of their transactions in the response """
+        return list(heapq.merge(*answers, key=lambda _record: self._sequence[_record.transaction_id]))
+
+    def get_staff_details(self, _id):
+        """ Returns the TransactionRecord of each transaction handled by the staff, in the order of the response """
+        return self._in_response_order(self._found(self._ask('get_staff_details', _id), "Staff Not in DB"))
+
+    def get_customer_details(self, _id):
+        """ Returns the TransactionRecord of each transaction of the customer, in the order of the response """
+        return self._in_response_order(self._found(self._ask('get_customer_details', _id), "Customer Not in DB"))
+
+    def get_transaction_details(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        """
+        Getting the transaction details between two dates, see TransactionSystem.get_transaction_details
+
+        Each shard sorts its purchases by datetime, and the sorted lists are merged by datetime and then by the
+        order of the transactions in the response.
+        """
+        if branch_id is None:
+            _branch_ids = self.branch_ids
+        else:
+            _branch_ids = [branch_id] if branch_id in self._owner or branch_id in self._systems else []
+        _answers = self._ask('get_transaction_details', start, end, staff_id, customer_id, branch_id,
+                             branch_ids=_branch_ids)
+        return heapq.merge(*_answers.values(),
+                           key=lambda _record: (_record.datetime, self._sequence[_record.transaction_id]))
+
+    def _sales(self, query, _id, message):
+        """ Summing a SalesRecord query across the shards """
+        _found = self._found(self._ask(query, _id), message)
+        return SalesRecord(_id, _found[0].name, sum(_record.quantity for _record in _found),
+                           sum(_record.revenue for _record in _found))
+
+    def get_staff_performance(self, _id):
+        """ Returns the SalesRecord of the products sold by the staff, across branches """
+        return self._sales('get_staff_performance', _id, "Staff Not in DB")
+
+    def get_customer_value(self, _id):
+        """ Returns the SalesRecord of the products bought by the customer, across branches """
+        return self._sales('get_customer_value', _id, "Customer Not in DB")
+
+    def get_branch_inventory(self, _id):
+        """ Returns the InventoryRecord of each product of the branch """
+        return self._single('get_branch_inventory', _id, _id)
+
+    def get_sales_summary(self):
+        """
+        Getting the sales of every staff, customer, branch and product, see TransactionSystem.get_sales_summary
+
+        The summaries of the shards are summed in the calling process.
+        """
+        _summary = {}
+        for _shard_summary in self._ask('get_sales_summary').values():
+            for _group, _sales in _shard_summary.items():
+                _totals = _summary.setdefault(_group, {})
+                for _id, (_quantity, _revenue) in _sales.items():
+                    _total = _totals.get(_id)
+                    _totals[_id] = Sales(_quantity, _revenue) if _total is None else \
+                        Sales(_total.quantity + _quantity, _total.revenue + _revenue)
+        return _summary
+
+    def get_rollup(self, group, id_, period='month'):
+        """ Returns the RollupRecord of every day or month of an entity, summed across branches """
+        _totals = {}
+        for _records in self._found(self._ask('get_rollup', group, id_, period), f"{group.title()} Not in DB"):
+            for _start, _quantity, _revenue in _records:
+                _total = _totals.setdefault(_start, [0, 0])
+                _total[0] += _quantity
+                _total[1] += _revenue
+        return [RollupRecord(_start, *_total) for _start, _total in sorted(_totals.items())]
+
+    def get_sales_between(self, group, id_, start=None, end=None, period='day'):
+        """ Returns the Sales of an entity over a range of days or months, summed across branches """
+        _found = self._found(self._ask('get_sales_between', group, id_, start, end, period),
+                             f"{group.title()} Not in DB")
+        return Sales(sum(_sales.quantity for _sales in _found), sum(_sales.revenue for _sales in _found))
+
+    def get_top(self, group, k=10, by='revenue', start=None, end=None, branch_id=None):
+        """
+        Getting the entities with the highest sales, see TransactionSystem.get_top
+
+        Each shard ranks the entities of its branch. Branches are disjoint, so the top branches are the top of the
+        shards, while the sales of a staff, customer or product are summed across the shards before ranking.
+        Entities with equal sales are in the order of the branches they first sold in.
+        """
+        if branch_id is not None:
+            return self._single('get_top', branch_id, group, k, by, start, end, branch_id)
+        if by not in Sales._fields:
+            raise ValueError(f"Unknown Ranking: {by}")
+        _key = attrgetter(by)
+        if group == 'branch':
+            _ranked = self._ask('get_top', group, k, by, start, end).values()
+            return heapq.nlargest(k, (_record for _records in _ranked for _record in _records), key=_key)
+        _totals = {}
+        for _records in self._ask('get_top', group, sys.maxsize, by, start, end).values():
+            for _record in _records:
+                _total = _totals.get(_record.id)
+                _totals[_record.id] = _record if _total is None else \
+                    _total._replace(quantity=_total.quantity + _record.quantity,
+                                    revenue=_total.revenue + _record.revenue)
+        return heapq.nlargest(k, _totals.values(), key=_key)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+""" Snapshot Cache
+
+This module caches the TransactionSystem loaded from a response file as a binary pickle snapshot, so that later runs
+on the same file skip decoding, validating and linking it.
+
+A snapshot is keyed by the SHA-256 of the response file together with a fingerprint of the code that shapes the
+loaded objects (the source of the schema, transaction, loader and validator modules and of every module of this
+package they take classes or functions from, such as rollup, the snapshot format version, the Python version and the
+marshmallow version). Editing the response, the schema or the loading rules changes the key, so a stale snapshot is
+never read, and it is removed when the new one is written. The snapshots of a response file are named after the file
+and a hash of its absolute path, so files of the same name in different directories may share a cache directory.
+
+Snapshots are pickles and are only meant to be read back by the same user on the same machine, never take one from
+an untrusted source.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * loader - To validate and load the response record by record
+    * pickle - To store the snapshots
+    * hashlib - To key the snapshots
+
+This file contains the following functions:
+
+    * code_fingerprint - Returns the fingerprint of the code that shapes the loaded objects.
+    * snapshot_key - Returns the key of the snapshot of a response file.
+    * load_cached - Returns the TransactionSystem of a response file, from its snapshot if it has a fresh one.
+
+"""
+# Built-In Packages
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+from importlib.metadata import version
+
+# User Packages
+import loader
+import schema
+import transaction
+import validator
+
+__author__ = 'praveen@gyandata.com'
+
+# Version of the snapshot layout, bumped when the way snapshots are written changes
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_DIR = '.snapshots'
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Directory of the modules of this package
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _shaping_modules(modules):
+    """ Returns the modules with every module of this package they take classes or functions from, by name """
+    _found = {}
+    _queue = list(modules)
+    while _queue:
+        _module = _queue.pop()
+        if _module.__name__ in _found:
+            continue
+        _found[_module.__name__] = _module
+        for _value in vars(_module).values():
+            _source = _value if inspect.ismodule(_value) else inspect.getmodule(_value)
+            _file = getattr(_source, '__file__', None)
+            if _file and os.path.dirname(os.path.abspath(_file)) == _SOURCE_DIR:
+                _queue.append(_source)
+    return [_found[_name] for _name in sorted(_found)]
+
+
+def code_fingerprint(modules=(schema, transaction, loader, validator)):
+    """
+    Fingerprinting the code that shapes the loaded objects
+
+    ...
+
+    Parameters
+    ----------
+    modules : tuple
+        Modules whose source is part of the fingerprint, with the modules of this package they take classes or
+        functions from.
+
+    Returns
+    -------
+    str
+        Hex digest over the snapshot version, the Python and marshmallow versions and the source of the modules.
+    """
+    _versions = f"{SNAPSHOT_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:{version('marshmallow')}"
+    _hash = hashlib.sha256(_versions.encode())
+    for _module in _shaping_modules(modules):
+        with open(inspect.getsourcefile(_module), 'rb') as source_file:
+            _hash.update(source_file.read())
+    return _hash.hexdigest()
+
+
+def snapshot_key(path):
+    """
+    Keying the snapshot of a response file
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        Path of the response file.
+
+    Returns
+    -------
+    str
+        Hex digest over the content of the file and the code fingerprint.
+    """
+    _hash = hashlib.sha256(code_fingerprint().encode())
+    with open(path, 'rb') as json_file:
+        for _chunk in iter(lambda: json_file.read(_HASH_CHUNK_SIZE), b''):
+            _hash.update(_chunk)
+    return _hash.hexdigest()
+
+
+def load_cached(path, cache_dir=None):
+    """
+    Loading the transaction system of a response file through the snapshot cache
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        Path of the response file.
+
+    cache_dir : str, optional
+        Directory holding the snapshots, SNAPSHOT_DIR next to the response file if not given.
+
+    Returns
+    -------
+    TransactionSystem
+        Transaction system populated with the data from the response.
+
+    Raises
+    ------
+    ValidationError
+        If the response is invalid, nothing is cached then.
+
+    LookupError
+        If a record refers to an Id that is not in the response.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), SNAPSHOT_DIR)
+    # The hash of the path keeps apart the snapshots of files of the same name in different directories
+    _path_hash = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    _prefix = os.path.join(cache_dir, f"{os.path.basename(path)}.{_path_hash}")
+    _snapshot = f"{_prefix}.{snapshot_key(path)[:32]}.pickle"
+
+    try:
+        with open(_snapshot, 'rb') as snapshot_file:
+            return pickle.load(snapshot_file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        pass
+
+    with open(path, 'r') as json_file:
+        _ts = loader.load_stream(json_file, compiled=True)
+
+    # Writing to a temporary file first, so that a reader never sees a partial snapshot
+    os.makedirs(cache_dir, exist_ok=True)
+    _temporary = f"{_snapshot}.{os.getpid()}.tmp"
+    with open(_temporary, 'wb') as snapshot_file:
+        pickle.dump(_ts, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(_temporary, _snapshot)
+
+    for _stale in glob.glob(f"{glob.escape(_prefix)}.*.pickle"):
+        if _stale != _snapshot:
+            os.remove(_stale)
+    return _ts
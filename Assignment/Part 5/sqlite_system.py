@@ -0,0 +1,755 @@
+# -*- coding: utf-8 -*-
+""" SQLite Transaction System
+
+This module stores a TransactionSystem in an indexed SQLite database instead of Python objects, so transaction
+histories larger than memory can be loaded and queried with the same API.
+
+load_sqlite validates a response record by record with the record schemas and writes the records with bulk inserts
+inside one database transaction, so a response which is invalid, or refers to an Id that is not in it, leaves the
+database as it was. The get_* lookups and the performance, value, inventory and date range queries of
+SQLiteTransactionSystem run as indexed SQL, and build Staff, Customer, Branch, Transaction, Product and Purchase
+objects only for the rows they return.
+
+Every table keeps its rows in the order they were added (the seq column), so the queries return them in the same
+order as TransactionSystem. A staff, customer, transaction, product or purchase Id can only be written once, a record
+repeating one is rejected with a ValidationError rather than kept alongside the first as TransactionSystem does.
+Records whose Id was loaded into the database before, by an earlier response, are skipped as merge_stream does.
+The first branch record of an Id, and the first inventory of a branch and product, win as in make_branch and
+make_inventory.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * sqlite3 - To store the records
+    * loader - To read the response record by record
+    * validator - To validate the records with compiled schemas
+
+This file contains the following Classes:
+
+    * SQLiteTransactionSystem - This class is a TransactionSystem stored in a SQLite database.
+
+This file contains the following functions:
+
+    * load_sqlite - Returns the SQLiteTransactionSystem of a response file.
+
+"""
+# Built-In Packages
+import json
+import sqlite3
+from collections.abc import Iterator, Sequence
+from datetime import date, datetime, timedelta
+
+# User Packages
+from loader import iter_sections, SECTION_IDS
+from rollup import PERIODS
+from schema import TransactionSystemSchema, ValidationError
+from transaction import Staff, Customer, Branch, Transaction, Product, Purchase, TransactionSystem, QueryCache, \
+    Sales, SalesRecord, InventoryRecord, PurchaseRecord, RollupRecord, PurchaseFact, SALES_GROUPS, QUERY_CACHE_SIZE, \
+    FACT_CHUNK_SIZE
+from validator import CompiledTransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+BATCH_SIZE = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+
+_MICROSECOND = timedelta(microseconds=1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS staff (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE, name TEXT NOT NULL,
+    email TEXT NOT NULL, branch_id INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS customers (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE, name TEXT NOT NULL,
+    email TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS branches (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS inventory (seq INTEGER PRIMARY KEY, branch_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL, count INTEGER NOT NULL, UNIQUE (branch_id, product_id));
+CREATE INDEX IF NOT EXISTS inventory_product ON inventory (product_id);
+CREATE TABLE IF NOT EXISTS transactions (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE,
+    datetime INTEGER NOT NULL, staff_id INTEGER NOT NULL, customer_id INTEGER NOT NULL, branch_id INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS transactions_datetime ON transactions (datetime, seq);
+CREATE INDEX IF NOT EXISTS transactions_staff ON transactions (staff_id, datetime);
+CREATE INDEX IF NOT EXISTS transactions_customer ON transactions (customer_id, datetime);
+CREATE INDEX IF NOT EXISTS transactions_branch ON transactions (branch_id, datetime);
+CREATE TABLE IF NOT EXISTS products (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE, name TEXT NOT NULL,
+    price REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS purchases (seq INTEGER PRIMARY KEY, id INTEGER NOT NULL UNIQUE,
+    transaction_id INTEGER NOT NULL, product_id INTEGER NOT NULL, quantity INTEGER NOT NULL,
+    total_price REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS purchases_transaction ON purchases (transaction_id);
+CREATE INDEX IF NOT EXISTS purchases_product ON purchases (product_id);
+"""
+
+_INSERTS = {
+    'staff': "INSERT INTO staff (id, name, email, branch_id) VALUES (?, ?, ?, ?)",
+    'customers': "INSERT INTO customers (id, name, email) VALUES (?, ?, ?)",
+    'branches': "INSERT OR IGNORE INTO branches (id, name) VALUES (?, ?)",
+    'inventory': "INSERT OR IGNORE INTO inventory (branch_id, product_id, count) VALUES (?, ?, ?)",
+    'transactions': "INSERT INTO transactions (id, datetime, staff_id, customer_id, branch_id) VALUES (?, ?, ?, ?, ?)",
+    'products': "INSERT INTO products (id, name, price) VALUES (?, ?, ?)",
+    'purchases': "INSERT INTO purchases (id, transaction_id, product_id, quantity, total_price) "
+                 "VALUES (?, ?, ?, ?, ?)",
+}
+
+# Tables whose Ids can only be written once, with the message raised by the add_* methods for a repeated Id
+_UNIQUE_IDS = {'staff': "Staff Already in DB", 'customers': "Customer Already in DB",
+               'transactions': "Transaction Already in DB", 'products': "Product Already in DB",
+               'purchases': "Purchase Already in DB"}
+
+# Rows written for the validated records of each section of a response: (table, row of a record)
+_SECTION_ROWS = {
+    'STAFF': (('staff', lambda _r: (_r['Id'], _r['name'], _r['Email'], _r['B_Id'])),),
+    'CUSTOMERS': (('customers', lambda _r: (_r['Id'], _r['name'], _r['Email'])),),
+    'BRANCHES': (('branches', lambda _r: (_r['B_Id'], _r['name'])),
+                 ('inventory', lambda _r: (_r['B_Id'], _r['Pr_Id'], _r['Inventory']))),
+    'TRANSACTIONS': (('transactions', lambda _r: (_r['T_Id'], (_r['DateTime'] - _EPOCH) // _MICROSECOND, _r['S_Id'],
+                                                  _r['C_Id'], _r['B_Id'])),),
+    'PRODUCTS': (('products', lambda _r: (_r['Id'], _r['name'], _r['Price'])),),
+    'PURCHASES': (('purchases', lambda _r: (_r['P_Id'], _r['T_Id'], _r['Pr_Id'], _r['Quantity'], _r['T_price'])),),
+}
+
+# References checked once a response is written: (table, column, table referred to, message if missing)
+_REFERENCES = (
+    ('staff', 'branch_id', 'branches', "Branch Not in DB"),
+    ('transactions', 'staff_id', 'staff', "Staff Not in DB"),
+    ('transactions', 'customer_id', 'customers', "customer Not in DB"),
+    ('transactions', 'branch_id', 'branches', "Branch Not in DB"),
+    ('purchases', 'transaction_id', 'transactions', "Transaction Not in DB"),
+    ('purchases', 'product_id', 'products', "Product Not in DB"),
+)
+
+# Column holding the Id of each group of the rollups, and the lookup of its entities
+_ROLLUP_GROUPS = {'staff': ('t.staff_id', 'get_staff'), 'customer': ('t.customer_id', 'get_customer'),
+                  'branch': ('t.branch_id', 'get_branch'), 'product': ('p.product_id', 'get_product')}
+
+# Format of the first day of the bucket of a datetime, keyed by the name of the period
+_BUCKET_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m-01'}
+
+_TRANSACTION_COLUMNS = "t.id, t.datetime, t.staff_id, t.customer_id, t.branch_id"
+
+_PURCHASE_COLUMNS = "p.id, p.transaction_id, p.product_id, p.quantity, p.total_price"
+
+
+class _TableView(Sequence):
+    """ Read only sequence over the rows of a table in the order they were added, made into objects on access """
+    def __init__(self, system, table, columns, make):
+        self._system = system
+        self._table = table
+        self._columns = columns
+        self._make = make
+
+    def __len__(self):
+        return self._system._db.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def __getitem__(self, index):
+        # Rows are never deleted from these tables, so the row at index i has seq i + 1
+        if isinstance(index, slice):
+            _range = range(*index.indices(len(self)))
+            if not _range:
+                return []
+            _first = min(_range)
+            _rows = self._system._db.execute(f"SELECT {self._columns} FROM {self._table} t WHERE t.seq BETWEEN ? AND ? "
+                                             f"ORDER BY t.seq", (_first + 1, max(_range) + 1)).fetchall()
+            return [self._make(_rows[_index - _first]) for _index in _range]
+        if index < 0:
+            index += len(self)
+        _row = self._system._db.execute(f"SELECT {self._columns} FROM {self._table} t WHERE t.seq = ?",
+                                        (index + 1,)).fetchone() if index >= 0 else None
+        if _row is None:
+            raise IndexError(f"{self._table} index out of range")
+        return self._make(_row)
+
+    def __iter__(self):
+        for _row in self._system._db.execute(f"SELECT {self._columns} FROM {self._table} t ORDER BY t.seq"):
+            yield self._make(_row)
+
+
+class SQLiteTransactionSystem(TransactionSystem):
+    """
+    SQLiteTransactionSystem class, a TransactionSystem whose records are stored in a SQLite database.
+
+    The staffs, customers, branches, transactions, products and purchases attributes are read only sequences over
+    the tables. Entities added with the add_* methods are written in the open database transaction, which commit
+    (or close) writes to the database file.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        Path of the database file, ':memory:' for a database in memory.
+
+    Methods
+    -------
+    commit()
+        Commits the records added since the last commit.
+
+    close()
+        Commits and closes the database.
+
+    write_records(section, records)
+        Writes validated records of a response section with bulk inserts.
+
+    check_references()
+        Raises LookupError if a record refers to an Id that is not in the database.
+
+    Raises
+    ------
+    LookupError
+        If Id (Product Id, Branch Id, etc) is not found.
+
+    ValueError
+        If an entity added with an add_* method repeats the Id of a staff, customer, transaction, product or
+        purchase.
+
+    """
+    # pylint: disable=super-init-not-called
+    def __init__(self, path=':memory:', cache_size=QUERY_CACHE_SIZE):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+        # Last row of each table with unique Ids which was written before this system was opened, by earlier loads
+        self._loaded_seqs = {_table: self._db.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {_table}").fetchone()[0]
+                             for _table in _UNIQUE_IDS}
+
+        # Staff, customers, branches and products made so far, keyed by Id, so every Transaction and Purchase refers
+        # to the same objects, as in TransactionSystem
+        self._staff_objects = {}
+        self._customer_objects = {}
+        self._branch_objects = {}
+        self._product_objects = {}
+        self._sales_summary = None
+        self._query_cache = QueryCache(cache_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def commit(self):
+        """ Commits the records added since the last commit """
+        self._db.commit()
+
+    def close(self):
+        """ Commits and closes the database """
+        self._db.commit()
+        self._db.close()
+
+    @property
+    def staffs(self):
+        return _TableView(self, 'staff', "t.id, t.name, t.email, t.branch_id", self._make_staff)
+
+    @property
+    def customers(self):
+        return _TableView(self, 'customers', "t.id, t.name, t.email", self._make_customer)
+
+    @property
+    def branches(self):
+        return _TableView(self, 'branches', "t.id, t.name", self._make_branch)
+
+    @property
+    def transactions(self):
+        return _TableView(self, 'transactions', _TRANSACTION_COLUMNS, self._make_transaction)
+
+    @property
+    def products(self):
+        return _TableView(self, 'products', "t.id, t.name, t.price", self._make_product)
+
+    @property
+    def purchases(self):
+        return _TableView(self, 'purchases', _PURCHASE_COLUMNS.replace('p.', 't.'), self._make_purchase)
+
+    def _make_staff(self, row):
+        _staff = self._staff_objects.get(row[0])
+        if _staff is None:
+            _staff = self._staff_objects[row[0]] = Staff(row[0], row[1], row[2], self.get_branch(row[3]))
+        return _staff
+
+    def _make_customer(self, row):
+        _customer = self._customer_objects.get(row[0])
+        if _customer is None:
+            _customer = self._customer_objects[row[0]] = Customer(*row)
+        return _customer
+
+    def _make_branch(self, row):
+        _branch = self._branch_objects.get(row[0])
+        if _branch is None:
+            _products = dict(self._db.execute("SELECT product_id, count FROM inventory WHERE branch_id = ? "
+                                              "ORDER BY seq", (row[0],)))
+            _branch = self._branch_objects[row[0]] = Branch(row[0], row[1], _products)
+        return _branch
+
+    def _make_product(self, row):
+        _product = self._product_objects.get(row[0])
+        if _product is None:
+            _product = self._product_objects[row[0]] = Product(*row)
+        return _product
+
+    def _make_transaction(self, row):
+        return Transaction(row[0], self.get_staff(row[2]), self.get_customer(row[3]), self.get_branch(row[4]),
+                           _EPOCH + row[1] * _MICROSECOND)
+
+    def _make_purchase(self, row, transaction_=None):
+        return Purchase(row[0], transaction_ or self.get_transaction(row[1]), self.get_product(row[2]), row[3],
+                        row[4])
+
+    def _lookup(self, cache, table, columns, make, id_, message):
+        """ Returns the cached object of an Id, or the object made from its row """
+        _entity = cache.get(id_)
+        if _entity is not None:
+            return _entity
+        _row = self._db.execute(f"SELECT {columns} FROM {table} t WHERE t.id = ?", (id_,)).fetchone()
+        if _row is None:
+            raise LookupError(message)
+        return make(_row)
+
+    def write_records(self, section, records, first_index=0):
+        """
+        Writing validated records of a response section with bulk inserts
+
+        References are not checked, see check_references. Records whose Id was written before this system was opened
+        are skipped.
+
+        ...
+
+        Parameters
+        ----------
+        section : str
+            Name of the section, such as 'PURCHASES'.
+
+        records : list
+            Records as loaded by the record schema of the section.
+
+        first_index : int
+            Index of the first record in its section, for the error messages.
+
+        Raises
+        ------
+        ValidationError
+            If a record repeats the Id of a staff, customer, transaction, product or purchase written by this system.
+            The records before it in the list are written.
+        """
+        for _table, _row in _SECTION_ROWS[section]:
+            if _table in _UNIQUE_IDS:
+                self._write_unique(section, _table, list(map(_row, records)), first_index)
+            else:
+                self._db.executemany(_INSERTS[_table], map(_row, records))
+        self._sales_summary = None
+        if not self._query_cache:
+            return
+        # Dropping the cached results of the staff, customers and branches the records touch
+        if section == 'TRANSACTIONS':
+            for _record in records:
+                self._query_cache.discard('staff_performance', _record['S_Id'])
+                self._query_cache.discard('customer_value', _record['C_Id'])
+        elif section == 'PURCHASES':
+            _transaction_ids = json.dumps(sorted({_record['T_Id'] for _record in records}))
+            for _staff_id, _customer_id in self._db.execute(
+                    "SELECT DISTINCT staff_id, customer_id FROM transactions "
+                    "WHERE id IN (SELECT value FROM json_each(?))", (_transaction_ids,)):
+                self._query_cache.discard('staff_performance', _staff_id)
+                self._query_cache.discard('customer_value', _customer_id)
+        elif section == 'BRANCHES':
+            for _record in records:
+                self._query_cache.discard('branch_inventory', _record['B_Id'])
+
+    def _write_unique(self, section, table, rows, first_index):
+        """ Writing rows whose first column is a unique Id, raising ValidationError for the first repeated Id """
+        _rows = list(enumerate(rows))
+        if self._loaded_seqs[table]:
+            _loaded = {_id for (_id,) in self._db.execute(
+                f"SELECT id FROM {table} WHERE seq <= ? AND id IN (SELECT value FROM json_each(?))",
+                (self._loaded_seqs[table], json.dumps([_row[0] for _row in rows])))}
+            _rows = [(_index, _row) for _index, _row in _rows if _row[0] not in _loaded]
+        _last = self._db.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {table}").fetchone()[0]
+        try:
+            self._db.executemany(_INSERTS[table], (_row for _, _row in _rows))
+        except sqlite3.IntegrityError:
+            _field = SECTION_IDS[section][0]
+            _seen = set()
+            for _index, _row in _rows:
+                if _row[0] in _seen or self._db.execute(f"SELECT 1 FROM {table} WHERE id = ? AND seq > ? AND seq <= ?",
+                                                        (_row[0], self._loaded_seqs[table], _last)).fetchone():
+                    raise ValidationError({section: {first_index + _index: {_field: ['Duplicate Id']}}})
+                _seen.add(_row[0])
+            raise
+
+    def _insert(self, table, row):
+        """ Inserting the row of an entity added with an add_* method """
+        try:
+            self._db.execute(_INSERTS[table], row)
+        except sqlite3.IntegrityError as err:
+            raise ValueError(_UNIQUE_IDS[table]) from err
+
+    def check_references(self):
+        """
+        Checking that every record refers to Ids in the database
+
+        Inventory of a product which is not in the database is dropped, unless no earlier inventory of its branch
+        was kept, as make_inventory does.
+
+        ...
+
+        Raises
+        ------
+        LookupError
+            If a record refers to an Id that is not in the database.
+        """
+        for _table, _column, _target, _message in _REFERENCES:
+            if self._db.execute(f"SELECT 1 FROM {_table} t WHERE NOT EXISTS (SELECT 1 FROM {_target} x "
+                                f"WHERE x.id = t.{_column}) LIMIT 1").fetchone():
+                raise LookupError(_message)
+        _unknown = "product_id NOT IN (SELECT id FROM products)"
+        if self._db.execute(f"SELECT 1 FROM inventory i WHERE {_unknown} AND NOT EXISTS (SELECT 1 FROM inventory j "
+                            f"WHERE j.branch_id = i.branch_id AND j.seq < i.seq "
+                            f"AND j.product_id IN (SELECT id FROM products)) LIMIT 1").fetchone():
+            raise LookupError("Product Not in DB")
+        self._db.execute(f"DELETE FROM inventory WHERE {_unknown}")
+        if self._db.execute("SELECT 1 FROM inventory t WHERE NOT EXISTS (SELECT 1 FROM branches x "
+                            "WHERE x.id = t.branch_id) LIMIT 1").fetchone():
+            raise LookupError("Branch Not in DB")
+
+    def add_staff(self, staff_):
+        self._insert('staff', (staff_.id, staff_.name, staff_.email, staff_.branch.id))
+
+    def add_customer(self, customer_):
+        self._insert('customers', (customer_.id, customer_.name, customer_.email))
+
+    def add_branch(self, branch_):
+        if self._db.execute(_INSERTS['branches'], (branch_.id, branch_.name)).rowcount:
+            self._db.executemany(_INSERTS['inventory'], ((branch_.id, _product_id, _count)
+                                                         for _product_id, _count in branch_.products.items()))
+
+    def add_transaction(self, transaction_):
+        self._insert('transactions', (transaction_.id, (transaction_.datetime - _EPOCH) // _MICROSECOND,
+                                      transaction_.staff.id, transaction_.customer.id, transaction_.branch.id))
+        self._invalidate_sales(transaction_)
+
+    def add_product(self, product_):
+        self._insert('products', (product_.id, product_.name, product_.price))
+
+    def add_purchase(self, purchase_):
+        self._insert('purchases', (purchase_.id, purchase_.transaction.id, purchase_.product.id, purchase_.quantity,
+                                   purchase_.total_price))
+        self._sales_summary = None
+        self._invalidate_sales(purchase_.transaction)
+
+    def _set_stock(self, branch_, product_id, count):
+        self._db.execute("INSERT INTO inventory (branch_id, product_id, count) VALUES (?, ?, ?) "
+                         "ON CONFLICT (branch_id, product_id) DO UPDATE SET count = excluded.count",
+                         (branch_.id, product_id, count))
+        branch_.products[product_id] = count
+        self._query_cache.discard('branch_inventory', branch_.id)
+
+    def add_inventory(self, branch_id, product_id, count):
+        _branch = self.get_branch(branch_id)
+        self.get_product(product_id)
+        if self._db.execute(_INSERTS['inventory'], (branch_id, product_id, count)).rowcount:
+            _branch.products[product_id] = count
+            self._query_cache.discard('branch_inventory', branch_id)
+
+    def get_staff(self, id_):
+        return self._lookup(self._staff_objects, 'staff', "t.id, t.name, t.email, t.branch_id", self._make_staff,
+                            id_, "Staff Not in DB")
+
+    def get_customer(self, id_):
+        return self._lookup(self._customer_objects, 'customers', "t.id, t.name, t.email", self._make_customer, id_,
+                            "customer Not in DB")
+
+    def get_branch(self, id_):
+        return self._lookup(self._branch_objects, 'branches', "t.id, t.name", self._make_branch, id_,
+                            "Branch Not in DB")
+
+    def get_product(self, id_):
+        return self._lookup(self._product_objects, 'products', "t.id, t.name, t.price", self._make_product, id_,
+                            "Product Not in DB")
+
+    def get_transaction(self, id_):
+        _row = self._db.execute(f"SELECT {_TRANSACTION_COLUMNS} FROM transactions t WHERE t.id = ?",
+                                (id_,)).fetchone()
+        if _row is None:
+            raise LookupError("Transaction Not in DB")
+        return self._make_transaction(_row)
+
+    def get_purchase(self, id_):
+        _row = self._db.execute(f"SELECT {_PURCHASE_COLUMNS} FROM purchases p WHERE p.id = ?", (id_,)).fetchone()
+        if _row is None:
+            raise LookupError("Purchase Not in DB")
+        return self._make_purchase(_row)
+
+    def _has_purchase(self, id_):
+        return self._db.execute("SELECT 1 FROM purchases WHERE id = ?", (id_,)).fetchone() is not None
+
+    def _transactions_where(self, condition, params):
+        return [self._make_transaction(_row) for _row in self._db.execute(
+            f"SELECT {_TRANSACTION_COLUMNS} FROM transactions t WHERE {condition} ORDER BY t.seq", params)]
+
+    def get_staff_transactions(self, id_):
+        return self._transactions_where("t.staff_id = ?", (id_,))
+
+    def get_customer_transactions(self, id_):
+        return self._transactions_where("t.customer_id = ?", (id_,))
+
+    def get_branch_transactions(self, id_):
+        return self._transactions_where("t.branch_id = ?", (id_,))
+
+    def get_transaction_purchases(self, id_):
+        _rows = self._db.execute(f"SELECT {_PURCHASE_COLUMNS} FROM purchases p WHERE p.transaction_id = ? "
+                                 f"ORDER BY p.seq", (id_,)).fetchall()
+        if not _rows:
+            return []
+        _transaction = self.get_transaction(id_)
+        return [self._make_purchase(_row, _transaction) for _row in _rows]
+
+    def _range_condition(self, start, end, staff_id, customer_id, branch_id):
+        """ Returns the WHERE clause and parameters selecting the transactions of get_transactions_between """
+        _conditions = []
+        _params = []
+        for _column, _operator, _value in (('datetime', '>=', self._as_datetime(start)),
+                                           ('datetime', '<', self._as_datetime(end)),
+                                           ('staff_id', '=', staff_id), ('customer_id', '=', customer_id),
+                                           ('branch_id', '=', branch_id)):
+            if _value is not None:
+                _conditions.append(f"t.{_column} {_operator} ?")
+                _params.append((_value - _EPOCH) // _MICROSECOND if _column == 'datetime' else _value)
+        return ' AND '.join(_conditions) or '1', _params
+
+    def get_transactions_between(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        _condition, _params = self._range_condition(start, end, staff_id, customer_id, branch_id)
+        return [self._make_transaction(_row) for _row in self._db.execute(
+            f"SELECT {_TRANSACTION_COLUMNS} FROM transactions t WHERE {_condition} ORDER BY t.datetime, t.seq",
+            _params)]
+
+    def get_transaction_details(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        _condition, _params = self._range_condition(start, end, staff_id, customer_id, branch_id)
+        for _row in self._db.execute(
+                f"SELECT t.id, t.datetime, p.id, p.product_id, x.name, p.quantity, p.total_price "
+                f"FROM transactions t LEFT JOIN purchases p ON p.transaction_id = t.id "
+                f"LEFT JOIN products x ON x.id = p.product_id WHERE {_condition} ORDER BY t.datetime, t.seq, p.seq",
+                _params):
+            yield PurchaseRecord(_row[0], _EPOCH + _row[1] * _MICROSECOND, *_row[2:])
+
+    def get_purchase_facts(self, chunk_size=FACT_CHUNK_SIZE):
+        """ Yields the purchases joined with their transaction, staff, customer, branch and product, in chunks """
+        _cursor = self._db.execute(
+            "SELECT p.id, t.id, t.datetime, s.id, s.name, c.id, c.name, b.id, b.name, x.id, x.name, p.quantity, "
+            "x.price, p.total_price FROM purchases p JOIN transactions t ON t.id = p.transaction_id "
+            "JOIN staff s ON s.id = t.staff_id JOIN customers c ON c.id = t.customer_id "
+            "JOIN branches b ON b.id = t.branch_id JOIN products x ON x.id = p.product_id ORDER BY p.seq")
+        while True:
+            _rows = _cursor.fetchmany(chunk_size)
+            if not _rows:
+                break
+            yield [PurchaseFact(_row[0], _row[1], _EPOCH + _row[2] * _MICROSECOND, *_row[3:]) for _row in _rows]
+
+    def get_sales_summary(self):
+        if self._sales_summary is None:
+            _groups = {}
+            for _name, _column in zip(SALES_GROUPS, ('t.staff_id', 't.customer_id', 't.branch_id', 'p.product_id')):
+                _groups[_name] = {_id: Sales(_quantity, _revenue) for _id, _quantity, _revenue in self._db.execute(
+                    f"SELECT {_column}, SUM(p.quantity), SUM(p.total_price) FROM purchases p "
+                    f"JOIN transactions t ON t.id = p.transaction_id GROUP BY {_column} ORDER BY MIN(p.seq)")}
+            self._sales_summary = _groups
+        return self._sales_summary
+
+    def _sales_of(self, column, id_, message):
+        """ Returns the quantity and revenue of the purchases of the transactions whose column is id_ """
+        if not self._db.execute(f"SELECT 1 FROM transactions WHERE {column} = ? LIMIT 1", (id_,)).fetchone():
+            raise LookupError(message)
+        _quantity, _revenue = self._db.execute(
+            f"SELECT SUM(p.quantity), SUM(p.total_price) FROM transactions t "
+            f"JOIN purchases p ON p.transaction_id = t.id WHERE t.{column} = ?", (id_,)).fetchone()
+        return (0, 0) if _quantity is None else (_quantity, _revenue)
+
+    def _staff_performance(self, _id):
+        _sales = self._sales_of('staff_id', _id, "Staff Not in DB")
+        return SalesRecord(_id, self.get_staff(_id).name, *_sales)
+
+    def _customer_value(self, _id):
+        _sales = self._sales_of('customer_id', _id, "Customer Not in DB")
+        return SalesRecord(_id, self.get_customer(_id).name, *_sales)
+
+    def _rollup_column(self, group, id_, period):
+        """ Returns the column holding the Id of a group, after checking the entity is in the database """
+        if group not in _ROLLUP_GROUPS:
+            raise ValueError(f"Unknown Group: {group}")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown Period: {period}")
+        _column, _lookup = _ROLLUP_GROUPS[group]
+        getattr(self, _lookup)(id_)
+        return _column
+
+    def get_rollup(self, group, id_, period='month'):
+        _column = self._rollup_column(group, id_, period)
+        return [RollupRecord(date.fromisoformat(_bucket), _quantity, _revenue)
+                for _bucket, _quantity, _revenue in self._db.execute(
+                    f"SELECT strftime('{_BUCKET_FORMATS[period]}', t.datetime / 1000000, 'unixepoch') AS bucket, "
+                    f"SUM(p.quantity), SUM(p.total_price) FROM purchases p "
+                    f"JOIN transactions t ON t.id = p.transaction_id WHERE {_column} = ? "
+                    f"GROUP BY bucket ORDER BY bucket", (id_,))]
+
+    def get_sales_between(self, group, id_, start=None, end=None, period='day'):
+        _column = self._rollup_column(group, id_, period)
+        _conditions = [f"{_column} = ?"]
+        _params = [id_]
+        for _operator, _bound in (('>=', start), ('<', end)):
+            if _bound is not None:
+                _conditions.append(f"t.datetime {_operator} ?")
+                _params.append((self._as_datetime(PERIODS[period](_bound)) - _EPOCH) // _MICROSECOND)
+        _quantity, _revenue = self._db.execute(
+            f"SELECT SUM(p.quantity), SUM(p.total_price) FROM purchases p "
+            f"JOIN transactions t ON t.id = p.transaction_id WHERE {' AND '.join(_conditions)}", _params).fetchone()
+        return Sales(0, 0) if _quantity is None else Sales(_quantity, _revenue)
+
+    def get_top(self, group, k=10, by='revenue', start=None, end=None, branch_id=None):
+        if group not in _ROLLUP_GROUPS:
+            raise ValueError(f"Unknown Group: {group}")
+        if by not in Sales._fields:
+            raise ValueError(f"Unknown Ranking: {by}")
+        _column, _lookup = _ROLLUP_GROUPS[group]
+        _condition, _params = self._range_condition(self._day_start(start), self._day_start(end), None, None,
+                                                    branch_id)
+        if branch_id is not None:
+            self.get_branch(branch_id)
+        _lookup = getattr(self, _lookup)
+        # Ties are broken by the first purchase of each entity, as in TransactionSystem
+        return [SalesRecord(_id, _lookup(_id).name, _quantity, _revenue)
+                for _id, _quantity, _revenue in self._db.execute(
+                    f"SELECT {_column}, SUM(p.quantity) AS quantity, SUM(p.total_price) AS revenue FROM purchases p "
+                    f"JOIN transactions t ON t.id = p.transaction_id WHERE {_condition} GROUP BY {_column} "
+                    f"ORDER BY {by} DESC, MIN(p.seq) LIMIT ?", (*_params, k))]
+
+    def _day_start(self, when):
+        """ Returns the midnight starting the day holding when, None if when is None """
+        return None if when is None else self._as_datetime(PERIODS['day'](when))
+
+    def _branch_inventory(self, _id):
+        self.get_branch(_id)
+        return tuple(InventoryRecord(_id, _product_id, _count) for _product_id, _count in self._db.execute(
+            "SELECT product_id, count FROM inventory WHERE branch_id = ? ORDER BY seq", (_id,)))
+
+    def get_stock(self, branch_id, product_id):
+        self.get_branch(branch_id)
+        _row = self._db.execute("SELECT count FROM inventory WHERE branch_id = ? AND product_id = ?",
+                                (branch_id, product_id)).fetchone()
+        return 0 if _row is None else _row[0]
+
+    def get_product_stock(self, product_id):
+        self.get_product(product_id)
+        return self._db.execute("SELECT COALESCE(SUM(count), 0) FROM inventory WHERE product_id = ?",
+                                (product_id,)).fetchone()[0]
+
+    def get_branches_stocking(self, product_id):
+        self.get_product(product_id)
+        return [InventoryRecord(_branch_id, product_id, _count) for _branch_id, _count in self._db.execute(
+            "SELECT branch_id, count FROM inventory WHERE product_id = ? AND count > 0 ORDER BY seq", (product_id,))]
+
+    def get_low_stock(self, threshold, branch_id=None):
+        if branch_id is not None:
+            self.get_branch(branch_id)
+        return [InventoryRecord(*_row) for _row in self._db.execute(
+            "SELECT i.branch_id, i.product_id, i.count FROM inventory i JOIN branches b ON b.id = i.branch_id "
+            "WHERE i.count < ? AND (? IS NULL OR i.branch_id = ?) ORDER BY b.seq, i.seq",
+            (threshold, branch_id, branch_id))]
+
+    def get_inventory_matrix(self):
+        _branch_ids = [_row[0] for _row in self._db.execute("SELECT id FROM branches ORDER BY seq")]
+        _product_ids = [_row[0] for _row in self._db.execute("SELECT id FROM products ORDER BY seq")]
+        _columns = {_product_id: _index for _index, _product_id in enumerate(_product_ids)}
+        _rows = {_branch_id: [0] * len(_product_ids) for _branch_id in _branch_ids}
+        for _branch_id, _product_id, _count in self._db.execute("SELECT branch_id, product_id, count FROM inventory"):
+            if _branch_id in _rows and _product_id in _columns:
+                _rows[_branch_id][_columns[_product_id]] = _count
+        return _branch_ids, _product_ids, [_rows[_branch_id] for _branch_id in _branch_ids]
+
+
+def load_sqlite(json_file, path=':memory:', compiled=True, batch_size=BATCH_SIZE):
+    """
+    Loading a response file into a SQLite database
+
+    The records are validated one at a time as they are read, and written with bulk inserts of batch_size records,
+    all in one database transaction. A response can be loaded into a database which already holds others, records
+    whose Id is already in the database are skipped. A staff, customer, transaction, product or purchase Id repeated
+    within the response is rejected.
+
+    ...
+
+    Parameters
+    ----------
+    json_file : file
+        Text file holding the response.
+
+    path : str
+        Path of the database file, ':memory:' for a database in memory.
+
+    compiled : bool
+        Whether records are validated with the compiled schemas of the validator module.
+
+    batch_size : int
+        Number of records written by one bulk insert.
+
+    Returns
+    -------
+    SQLiteTransactionSystem
+        Transaction system stored in the database.
+
+    Raises
+    ------
+    ValidationError
+        If the response does not match TransactionSystemSchema, or repeats an Id. Nothing is written then.
+
+    LookupError
+        If a record refers to an Id that is neither in the response nor in the database. Nothing is written then.
+    """
+    schema = TransactionSystemSchema()
+    if compiled:
+        _compiled = CompiledTransactionSystemSchema()
+        _record_schemas = {_name: _compiled.record_schema(_name) for _name in schema.fields}
+    else:
+        _record_schemas = {_name: type(_field.schema)() for _name, _field in schema.fields.items()}
+
+    ts = SQLiteTransactionSystem(path)
+    _errors = {}
+    try:
+        for _section, _records in iter_sections(json_file):
+            if _section is None:
+                try:
+                    schema.load(_records)
+                except ValidationError as err:
+                    _errors.update(err.messages)
+            elif _section not in _record_schemas:
+                _errors[_section] = ['Unknown field.']
+            elif not isinstance(_records, Iterator):
+                try:
+                    schema.fields[_section].deserialize(_records)
+                except ValidationError as err:
+                    _errors[_section] = err.messages
+            else:
+                _batch = []
+                _first = 0
+                for _index, _record in _records:
+                    try:
+                        _batch.append(_record_schemas[_section].load(_record))
+                    except ValidationError as err:
+                        _errors.setdefault(_section, {})[_index] = err.messages
+                    if len(_batch) >= batch_size or _errors:
+                        if not _errors:
+                            ts.write_records(_section, _batch, _first)
+                        _batch = []
+                        _first = _index + 1
+                if not _errors:
+                    ts.write_records(_section, _batch, _first)
+        if _errors:
+            raise ValidationError(_errors)
+        ts.check_references()
+    except BaseException:
+        ts._db.rollback()
+        ts._db.close()
+        raise
+    ts.commit()
+    return ts
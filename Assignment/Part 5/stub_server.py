@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+""" Stub Web Api Server
+
+This script serves the files of the Responses directory over HTTP/1.1, so the fetcher can be run and tested without
+the web api. GET /date returns Responses/date.json, GET /staff returns Responses/staff.json and so on, with
+keep-alive connections like the web api.
+
+It can fail every nth request with 503 Service Unavailable, and delay every response, to exercise the retries and
+the concurrency of the fetcher.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * asyncio - To serve the connections
+    * argparse - To read the command line arguments
+
+This file contains the following Classes:
+
+    * StubServer - This class serves the response files over HTTP.
+
+This file contains the following functions:
+
+    * main - Serves the Responses directory on the host and port given on the command line.
+
+"""
+# Built-In Packages
+import argparse
+import asyncio
+import os
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses')
+
+HOST = '127.0.0.1'
+
+PORT = 8080
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            503: 'Service Unavailable'}
+
+
+class StubServer:
+    """
+    StubServer class which serves the response files over HTTP.
+
+    ...
+
+    Attributes
+    ----------
+    directory : str
+        Directory whose .json files are served, by name without the extension.
+
+    fail_every : int
+        Every fail_every-th request is answered with 503, 0 to never fail.
+
+    delay : float
+        Seconds each response is delayed by.
+
+    requests : int
+        Number of requests received.
+
+    connections : int
+        Number of connections accepted.
+
+    Methods
+    -------
+    start(host, port)
+        Starts serving, returns the asyncio server.
+
+    """
+    def __init__(self, directory=RESPONSES_DIR, fail_every=0, delay=0.0):
+        self.directory = directory
+        self.fail_every = fail_every
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+
+    async def start(self, host=HOST, port=PORT):
+        """
+        Starting to serve
+
+        ...
+
+        Parameters
+        ----------
+        host : str
+            Address to listen on.
+
+        port : int
+            Port to listen on, 0 for any free port.
+
+        Returns
+        -------
+        asyncio.Server
+            The server, whose sockets give the port it listens on.
+        """
+        return await asyncio.start_server(self._serve, host, port)
+
+    def _body(self, method, target):
+        """ Returns the status and the body of the response to a request """
+        self.requests += 1
+        if method != 'GET':
+            return 405, b''
+        if self.fail_every and self.requests % self.fail_every == 0:
+            return 503, b''
+        _name = target.split('?', 1)[0].strip('/')
+        if not _name or os.sep in _name or '/' in _name or _name.startswith('.'):
+            return 404, b''
+        try:
+            with open(os.path.join(self.directory, f"{_name}.json"), 'rb') as json_file:
+                return 200, json_file.read()
+        except OSError:
+            return 404, b''
+
+    async def _serve(self, reader, writer):
+        """ Answering the requests of a connection until the client closes it """
+        self.connections += 1
+        try:
+            while True:
+                _request = await reader.readline()
+                if not _request:
+                    break
+                _parts = _request.decode('latin-1').split()
+                _headers = {}
+                while True:
+                    _line = await reader.readline()
+                    if _line in (b'\r\n', b'\n', b''):
+                        break
+                    _key, _, _value = _line.decode('latin-1').partition(':')
+                    _headers[_key.strip().lower()] = _value.strip()
+                if len(_parts) != 3:
+                    _status, _body = 400, b''
+                else:
+                    _status, _body = self._body(_parts[0], _parts[1])
+                _close = _headers.get('connection', '').lower() == 'close' or _status == 400
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(f"HTTP/1.1 {_status} {_REASONS[_status]}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(_body)}\r\n"
+                             f"Connection: {'close' if _close else 'keep-alive'}\r\n\r\n".encode('latin-1') + _body)
+                await writer.drain()
+                if _close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _run(host, port, fail_every, delay):
+    """ Serving until interrupted """
+    _server = await StubServer(fail_every=fail_every, delay=delay).start(host, port)
+    print(f"Serving {RESPONSES_DIR} on http://{host}:{port}/")
+    async with _server:
+        await _server.serve_forever()
+
+
+def main():
+    """
+    Serves the Responses directory on the host and port given on the command line
+    """
+    parser = argparse.ArgumentParser(description="Serve Responses/*.json like the web api")
+    parser.add_argument('--host', default=HOST, help=f"Address to listen on (default {HOST})")
+    parser.add_argument('--port', type=int, default=PORT, help=f"Port to listen on (default {PORT})")
+    parser.add_argument('--fail-every', type=int, default=0, help="Answer every nth request with 503")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds each response is delayed by")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args.host, args.port, args.fail_every, args.delay))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -11,24 +11,69 @@ and perform operation to get insights like:
     * Inventory left for a given branch.
     * Transaction details between two given details.
 
+It answers every staff, customer and branch given on the command line from one load of the response, and writes
+all the reports to one output:
+
+    python supermarket.py Responses/date.json --staff 100000 100001 --customer 100000 --branch 100000 100001
+    python supermarket.py --start 2018-06-01 --end 2018-07-01 --format csv --output june.csv
+
+Without any Ids or date range it writes the reports of staff, customer and branch 100000, as it always has.
+
+With --metrics the loaders and every TransactionSystem query are instrumented with the Decorator module of
+Practice/Part 5, and the totals of their metrics are logged as JSON to the metrics logger of SerializationLog.json.
+With --trace-memory the allocation delta of each call is measured as well, which slows the calls down:
+
+    python supermarket.py Responses/date.json --staff 100000 --metrics --trace-memory
+
 This script requires that the following packages be installed within the Python
 environment you are running this script in.
 
     * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+    * snapshot - To load the response through the snapshot cache
+    * report - To write the results of the queries
+    * Decorator - To record the metrics of the loaders and queries, with --metrics
+    * tracemalloc - To measure the allocation deltas, with --trace-memory
     * json - To deal with Json Files
     * logging - To log Errors
+    * argparse - To read the command line arguments
+
+This file contains the following functions:
+
+    * log - Creates the logger.
+    * start_metrics - Instruments the loaders and the queries of the transaction system.
+    * write_reports - Writes the reports of many staff, customers and branches from one transaction system.
+    * main - Loads a response and writes the reports asked for on the command line.
 
 """
 # Built-In Packages
+import argparse
 import json
 import logging
 import logging.config
+import os
+import sys
+import tracemalloc
+from datetime import datetime
 
 # User Packages
+import loader
+import snapshot
+from report import TextWriter, JsonLinesWriter, CsvWriter
 from schema import *
+from transaction import TransactionSystem
 
 __author__ = 'praveen@gyandata.com'
 
+RESPONSE_FILE = os.path.join('Responses', 'date.json')
+
+# Id reported on when none are given
+DEFAULT_ID = 100000
+
+WRITERS = {'text': TextWriter, 'jsonl': JsonLinesWriter, 'csv': CsvWriter}
+
+# Directory of the Decorator module
+PRACTICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, 'Practice', 'Part 5')
+
 
 def log():
     """
@@ -41,39 +86,158 @@ def log():
     logger = logging.getLogger(__name__)
 
 
-def main():
+def start_metrics(trace_memory=False):
+    """
+    Instrumenting the loaders and every query of the transaction system
+
+    The loaders are load_stream and load_cached, called through their modules, and the queries are the get_
+    methods of TransactionSystem. Both are decorated in place.
+
+    ...
+
+    Parameters
+    ----------
+    trace_memory : bool
+        Whether tracemalloc is started, so the allocation delta of every call is recorded.
+
+    Returns
+    -------
+    Metrics
+        Registry the metrics are recorded in, whose totals are logged with log_summary.
+    """
+    sys.path.insert(0, PRACTICE_DIR)
+    # pylint: disable=import-outside-toplevel
+    from Decorator import METRICS, instrument
+    instrument(TransactionSystem)
+    instrument(loader, ['load_stream'])
+    instrument(snapshot, ['load_cached'])
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return METRICS
+
+
+def _write_each(writer, heading, ids, report, query, subject=None):
+    """ Writing a report for every Id, logging the Ids which are not in the response """
+    if not ids:
+        return
+    if isinstance(writer, TextWriter):
+        writer.write_heading(heading)
+    for _id in ids:
+        try:
+            writer.write(report, query(_id), subject(_id).name if subject else None)
+        except LookupError as err:
+            logger.error(f"{report} of {_id}: {err}")
+
+
+def write_reports(transaction_system, writer, staff_ids=(), customer_ids=(), branch_ids=(), transactions=False,
+                  start=None, end=None):
+    """
+    Writing the reports of many staff, customers and branches from one transaction system
+
+    The sales of every staff and customer are summed in one pass over the purchases, which the performance and value
+    of each are then read from. An Id which is not in the response is logged and skipped, the other reports are
+    still written.
+
+    ...
+
+    Parameters
+    ----------
+    transaction_system : TransactionSystem
+        Transaction system the reports are about.
+
+    writer : ReportWriter
+        Writer the reports are written to, text reports get a heading per report.
+
+    staff_ids : Iterable
+        Ids of the staff whose details and performance are written.
+
+    customer_ids : Iterable
+        Ids of the customers whose details and value are written.
+
+    branch_ids : Iterable
+        Ids of the branches whose inventory is written.
+
+    transactions : bool
+        Whether the details of the transactions from start up to end are written.
+
+    start : datetime, optional
+        Transactions on or after this datetime are written, unbounded if not given.
+
+    end : datetime, optional
+        Transactions before this datetime are written, unbounded if not given.
+
+    """
+    if staff_ids or customer_ids:
+        transaction_system.get_sales_summary()
+
+    _write_each(writer, "Getting Staff Details", staff_ids, 'staff_details', transaction_system.get_staff_details,
+                transaction_system.get_staff)
+    _write_each(writer, "Getting Customer Details", customer_ids, 'customer_details',
+                transaction_system.get_customer_details, transaction_system.get_customer)
+    if transactions:
+        if isinstance(writer, TextWriter):
+            writer.write_heading("Getting Transaction Details")
+        writer.write('transaction_details', transaction_system.get_transaction_details(start, end))
+    _write_each(writer, "Getting Staff Performance Details", staff_ids, 'staff_performance',
+                transaction_system.get_staff_performance)
+    _write_each(writer, "Getting Customer Value Details", customer_ids, 'customer_value',
+                transaction_system.get_customer_value)
+    _write_each(writer, "Getting Branch Inventory Details", branch_ids, 'branch_inventory',
+                transaction_system.get_branch_inventory, transaction_system.get_branch)
+    if isinstance(writer, TextWriter):
+        writer.write_heading()
+
+
+def main(argv=None):
     """
     Main function to get data from web api, store them using transaction system class and perform operation on them.
+
+    The reports of every Id given on the command line are written from one load of the response.
     """
+    parser = argparse.ArgumentParser(description="Write the reports of many staff, customers and branches")
+    parser.add_argument('path', nargs='?', default=RESPONSE_FILE, help=f"Response file (default {RESPONSE_FILE})")
+    parser.add_argument('--staff', type=int, nargs='+', default=[], help="Ids of the staff to report on")
+    parser.add_argument('--customer', type=int, nargs='+', default=[], help="Ids of the customers to report on")
+    parser.add_argument('--branch', type=int, nargs='+', default=[], help="Ids of the branches to report on")
+    parser.add_argument('--start', type=datetime.fromisoformat,
+                        help="Report the transactions on or after this date, such as 2018-06-01")
+    parser.add_argument('--end', type=datetime.fromisoformat, help="Report the transactions before this date")
+    parser.add_argument('--transactions', action='store_true', help="Report the transactions of every date")
+    parser.add_argument('--format', choices=WRITERS, default='text', help="Format of the reports (default text)")
+    parser.add_argument('--output', help="File the reports are written to (default standard output)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Log the wall time and calls of the loaders and queries to the metrics logger")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also log the allocation delta of each call, with --metrics")
+    args = parser.parse_args(argv)
+
+    _transactions = args.transactions or args.start is not None or args.end is not None
+    if not (args.staff or args.customer or args.branch or _transactions):
+        args.staff, args.customer, args.branch, _transactions = [DEFAULT_ID], [DEFAULT_ID], [DEFAULT_ID], True
 
     log()
+    _metrics = start_metrics(args.trace_memory) if args.metrics else None
 
     try:
-        with open('Responses\\date.json', 'r') as json_file:
-            data = json.load(json_file)
-
-        trans_schema = TransactionSystemSchema()
-        transaction_system = trans_schema.load(data)
-
-        print("\nGetting Staff Details\n--------------------------------------------------------")
-        transaction_system.get_staff_details(100000)
-        print("\nGetting Customer Details\n--------------------------------------------------------")
-        transaction_system.get_customer_details(100000)
-        print("\nGetting Transaction Details\n--------------------------------------------------------")
-        transaction_system.get_transaction_details()
-        print("\nGetting Staff Performance Details\n--------------------------------------------------------")
-        transaction_system.get_staff_performance(100000)
-        print("\nGetting Customer Value Details\n--------------------------------------------------------")
-        transaction_system.get_customer_value(100000)
-        print("\nGetting Branch Inventory Details\n--------------------------------------------------------")
-        transaction_system.get_branch_inventory(100000)
-        print("\n--------------------------------------------------------")
+        transaction_system = snapshot.load_cached(args.path)
+
+        _output = sys.stdout if args.output is None else open(args.output, 'w', newline='')
+        try:
+            with WRITERS[args.format](_output) as writer:
+                write_reports(transaction_system, writer, args.staff, args.customer, args.branch, _transactions,
+                              args.start, args.end)
+        finally:
+            if _output is not sys.stdout:
+                _output.close()
     except FileNotFoundError as err:
         logger.error(f"{err}")
     except LookupError as err:
         logger.error(f"{err}")
     except ValidationError as err:
         logger.error(f"Validation Error Occurred While Loading data\n{err.messages}")
+    finally:
+        if _metrics is not None:
+            _metrics.log_summary()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+""" Tests of the columnar transaction system
+
+The columnar system loaded from a response, or copied from a loaded TransactionSystem, must answer the queries as
+TransactionSystemSchema.load's system does and reject the invalid response with a ValidationError.
+
+Purchases must refer to a transaction in the system, and adding transactions and purchases in turn must not rebuild
+the columns on every purchase.
+
+"""
+# Built-In Packages
+import io
+import os
+
+# External Packages
+import pytest
+
+# User Packages
+from columnar import ColumnarTransactionSystem
+from loader import load_stream
+from schema import ValidationError
+from transaction import Transaction, Purchase
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses', 'date.json')
+
+
+@pytest.fixture(name='ts')
+def fixture_ts():
+    with open(RESPONSE_FILE, 'r') as json_file:
+        return load_stream(json_file, compiled=True)
+
+
+def test_columnar_matches_the_schema(response_text, report, expected_report):
+    _ts = load_stream(io.StringIO(response_text), compiled=True, system=ColumnarTransactionSystem())
+    assert report(_ts) == expected_report
+
+
+def test_copied_columnar_matches_the_schema(response_text, report, expected_report):
+    assert report(ColumnarTransactionSystem.from_system(load_stream(io.StringIO(response_text)))) == expected_report
+
+
+def test_invalid_response_is_rejected(invalid_text):
+    with pytest.raises(ValidationError):
+        load_stream(io.StringIO(invalid_text), compiled=True, system=ColumnarTransactionSystem())
+
+
+def test_purchase_of_an_unknown_transaction_is_rejected(ts):
+    _columnar = ColumnarTransactionSystem.from_system(ts)
+    _transaction = Transaction(102000, ts.staffs[0], ts.customers[0], ts.branches[0], ts.transactions[0].datetime)
+    with pytest.raises(LookupError, match="Transaction Not in DB"):
+        _columnar.add_purchase(Purchase(104000, _transaction, ts.products[0], 1, 1.0))
+    assert len(_columnar.purchases) == len(ts.purchases)
+
+
+def test_interleaved_adds_do_not_read_the_columns(ts):
+    _columnar = ColumnarTransactionSystem()
+    for _entities, _add in ((ts.products, _columnar.add_product), (ts.branches, _columnar.add_branch),
+                            (ts.customers, _columnar.add_customer), (ts.staffs, _columnar.add_staff)):
+        for _entity in _entities:
+            _add(_entity)
+    for _transaction in ts.transactions:
+        _columnar.add_transaction(_transaction)
+        for _purchase in ts.get_transaction_purchases(_transaction.id):
+            _columnar.add_purchase(_purchase)
+    # The columns are only built by the first query
+    assert _columnar._transaction_table.version == 0
+    assert [_columnar.get_staff_performance(_staff.id) for _staff in ts.staffs] == \
+        [ts.get_staff_performance(_staff.id) for _staff in ts.staffs]
+    assert list(_columnar.get_transaction_details()) == list(ts.get_transaction_details())
+
+
+def test_rollups_follow_added_purchases(ts):
+    _columnar = ColumnarTransactionSystem.from_system(ts)
+    _transaction = ts.transactions[0]
+    _before = _columnar.get_sales_between('staff', _transaction.staff.id)
+    _top = _columnar.get_top('product', 3, branch_id=_transaction.branch.id)
+    assert _columnar.get_sales_between('staff', _transaction.staff.id) == _before
+    _purchase = Purchase(104000, _transaction, ts.products[0], 7, 1e6)
+    _columnar.add_purchase(_purchase)
+    ts.add_purchase(_purchase)
+    assert _columnar.get_sales_between('staff', _transaction.staff.id) == (_before.quantity + 7, _before.revenue + 1e6)
+    assert _columnar.get_top('product', 3, branch_id=_transaction.branch.id) != _top
+    assert _columnar.get_top('product', 3, branch_id=_transaction.branch.id) == \
+        ts.get_top('product', 3, branch_id=_transaction.branch.id)
+    assert _columnar.get_rollup('staff', _transaction.staff.id, 'day') == \
+        ts.get_rollup('staff', _transaction.staff.id, 'day')
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+""" Tests of the fetcher against the stub server
+
+The stub server serves the Responses directory on a free port, failing or delaying requests to exercise the retries
+and the concurrency bound of the fetcher.
+
+"""
+# Built-In Packages
+import asyncio
+import io
+import os
+import threading
+
+# External Packages
+import pytest
+
+# User Packages
+import fetcher
+from fetcher import Fetcher, load_responses
+from loader import load_stream
+from stub_server import StubServer, RESPONSES_DIR
+
+__author__ = 'praveen@gyandata.com'
+
+
+def _serve(stub, test):
+    """ Running a test coroutine with the base url of a stub server listening on a free port """
+    async def _run():
+        _server = await stub.start(port=0)
+        async with _server:
+            return await test(f"http://127.0.0.1:{_server.sockets[0].getsockname()[1]}")
+    return asyncio.run(_run())
+
+
+def _file(name):
+    """ Returns the bytes of a response of the Responses directory """
+    with open(os.path.join(RESPONSES_DIR, f"{name}.json"), 'rb') as json_file:
+        return json_file.read()
+
+
+def _fetch_all(paths, **kwargs):
+    """ Returns a test coroutine fetching paths, which returns the bodies by path and the fetcher """
+    async def _test(base_url):
+        async with Fetcher(base_url, **kwargs) as _fetcher:
+            return {_path: _body async for _path, _body in _fetcher.fetch_all(paths)}, _fetcher
+    return _test
+
+
+def test_failed_requests_are_retried():
+    _stub = StubServer(fail_every=2)
+    _bodies, _ = _serve(_stub, _fetch_all(['date', 'staff', 'customer', 'branch'], backoff=0.01))
+    assert _bodies == {_name: _file(_name) for _name in ('date', 'staff', 'customer', 'branch')}
+    assert _stub.requests > 4
+
+
+def test_requests_failing_every_retry_raise_connection_error():
+    with pytest.raises(ConnectionError):
+        _serve(StubServer(fail_every=1), _fetch_all(['staff'], retries=2, backoff=0.01))
+
+
+def test_unknown_path_raises_lookup_error():
+    with pytest.raises(LookupError):
+        _serve(StubServer(), _fetch_all(['staff', 'supplier']))
+
+
+def test_concurrency_bounds_the_connections():
+    _stub = StubServer(delay=0.05)
+    _paths = ['staff', 'customer', 'branch'] * 3
+    _bodies, _fetcher = _serve(_stub, _fetch_all(_paths, concurrency=2))
+    assert len(_bodies) == 3
+    assert _fetcher.connections == _stub.connections == 2
+    assert _stub.requests == len(_paths)
+
+
+def test_responses_are_loaded_off_the_event_loop(monkeypatch):
+    _threads = []
+
+    def _load_stream(*args, **kwargs):
+        _threads.append(threading.get_ident())
+        return load_stream(*args, **kwargs)
+    monkeypatch.setattr(fetcher, 'load_stream', _load_stream)
+
+    async def _test(base_url):
+        return {_path: _ts async for _path, _ts in load_responses(base_url, ['staff', 'branch'])}
+    _systems = _serve(StubServer(), _test)
+    assert len(_systems['staff'].staffs) == len(load_stream(io.StringIO(_file('staff').decode('utf-8'))).staffs)
+    assert _threads and threading.get_ident() not in _threads
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" Tests of the lazy transaction system
+
+The lazy system, with the compiled validators or with the schemas, must answer the queries as
+TransactionSystemSchema.load's system does for the responses of the Responses directory, and reject the invalid
+response with a ValidationError when it is first queried.
+
+A section which is missing from the response, or a reference to an Id which is not in it, must fail with the
+LookupError of load_stream when the section referring to it is first used.
+
+"""
+# Built-In Packages
+import io
+import json
+import os
+
+# External Packages
+import pytest
+
+# User Packages
+from lazy import load_lazy
+from loader import load_stream
+from schema import ValidationError
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses', 'date.json')
+
+
+def _response():
+    """ Returns the decoded records of Responses/date.json """
+    with open(RESPONSE_FILE, 'r') as json_file:
+        return json.load(json_file)
+
+
+def _stream_error(data):
+    """ Returns the message of the LookupError load_stream raises for a response """
+    with pytest.raises(LookupError) as err:
+        load_stream(io.StringIO(json.dumps(data)))
+    return str(err.value)
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_lazy_matches_the_schema(compiled, response_text, report, expected_report):
+    assert report(load_lazy(io.StringIO(response_text), compiled=compiled)) == expected_report
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_invalid_response_is_rejected(compiled, invalid_text, report):
+    with pytest.raises(ValidationError):
+        report(load_lazy(io.StringIO(invalid_text), compiled=compiled))
+
+
+@pytest.mark.parametrize('section', ['STAFF', 'CUSTOMERS', 'BRANCHES', 'PRODUCTS', 'TRANSACTIONS'])
+def test_missing_section_fails_like_load_stream(section):
+    _data = _response()
+    del _data[section]
+    _ts = load_lazy(io.StringIO(json.dumps(_data)))
+    for _ in range(2):
+        with pytest.raises(LookupError) as err:
+            _ts.get_sales_summary()
+        assert str(err.value) == _stream_error(_data)
+
+
+def test_unknown_reference_fails_like_load_stream():
+    _data = _response()
+    _data['STAFF'] = [_staff for _staff in _data['STAFF'] if _staff['Id'] != _data['TRANSACTIONS'][5]['S_Id']]
+    _ts = load_lazy(io.StringIO(json.dumps(_data)))
+    with pytest.raises(LookupError) as err:
+        list(_ts.get_transaction_details())
+    assert str(err.value) == _stream_error(_data)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Tests of merge_stream
+
+A delta which merges is checked against a single load of the whole response, and a delta which is rejected must
+leave the transaction system as it was.
+
+"""
+# Built-In Packages
+import io
+import json
+import os
+
+# External Packages
+import pytest
+
+# User Packages
+from loader import load_stream, merge_stream
+from schema import ValidationError
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses', 'date.json')
+
+
+def _response():
+    """ Returns the decoded records of Responses/date.json """
+    with open(RESPONSE_FILE, 'r') as json_file:
+        return json.load(json_file)
+
+
+def _load(data):
+    """ Returns the transaction system of a response """
+    return load_stream(io.StringIO(json.dumps(data)))
+
+
+def _merge(ts, delta):
+    """ Merging a delta into a transaction system """
+    return merge_stream(ts, io.StringIO(json.dumps(delta)))
+
+
+def _state(ts):
+    """ Returns everything the queries can tell about a transaction system """
+    return ([len(_entities) for _entities in (ts.staffs, ts.customers, ts.branches, ts.products, ts.transactions,
+                                              ts.purchases)],
+            [(_branch.id, sorted(_branch.products.items())) for _branch in ts.branches],
+            list(ts.get_transaction_details()), ts.get_sales_summary(), ts.get_top('staff', 5))
+
+
+@pytest.fixture(name='data')
+def fixture_data():
+    return _response()
+
+
+def test_merged_halves_match_a_single_load(data):
+    _first = {**data, 'TRANSACTIONS': data['TRANSACTIONS'][:1000],
+              'PURCHASES': [_p for _p in data['PURCHASES'] if _p['T_Id'] < 101000]}
+    _second = {'TRANSACTIONS': data['TRANSACTIONS'][900:],
+               'PURCHASES': [_p for _p in data['PURCHASES'] if _p['T_Id'] >= 100900]}
+    _ts = _load(_first)
+    _merge(_ts, _second)
+    assert _state(_ts) == _state(_load(data))
+
+
+def test_merging_a_loaded_response_changes_nothing(data):
+    _ts = _load(data)
+    _before = _state(_ts)
+    _merge(_ts, data)
+    assert _state(_ts) == _before
+
+
+@pytest.mark.parametrize('delta', [
+    # New branch whose first inventory is of an unknown product
+    {'BRANCHES': [{'B_Id': 100010, 'name': 'branch100010', 'Pr_Id': 100021, 'Inventory': 5}]},
+    {'STAFF': [{'Id': 100100, 'name': 'staff100100', 'Email': 'staff100100@gmail.com', 'B_Id': 100010}]},
+    {'CUSTOMERS': [{'Id': 100100, 'name': 'customer100100', 'Email': 'customer100100@gmail.com'}],
+     'TRANSACTIONS': [{'T_Id': 102000, 'DateTime': '2019-01-01 10:00:00', 'C_Id': 100100, 'S_Id': 100100,
+                       'B_Id': 100000}]},
+    {'PURCHASES': [{'P_Id': 104000, 'T_Id': 102000, 'Pr_Id': 100000, 'Quantity': 1, 'T_price': 1}]},
+])
+def test_rejected_reference_leaves_the_system_unchanged(data, delta):
+    _ts = _load(data)
+    _before = _state(_ts)
+    with pytest.raises(LookupError):
+        _merge(_ts, delta)
+    assert _state(_ts) == _before
+
+
+def test_invalid_record_leaves_the_system_unchanged(data):
+    _ts = _load(data)
+    _before = _state(_ts)
+    _delta = {'CUSTOMERS': [{'Id': 100100, 'name': 'customer100100', 'Email': 'customer100100@gmail.com'}],
+              'PURCHASES': [{'P_Id': 104000, 'T_Id': 100000, 'Pr_Id': 100000, 'Quantity': 0, 'T_price': 1}]}
+    with pytest.raises(ValidationError):
+        _merge(_ts, _delta)
+    assert _state(_ts) == _before
+
+
+def test_unknown_product_of_a_stocked_branch_is_skipped(data):
+    _delta = {'BRANCHES': [{'B_Id': 100000, 'name': 'branch100000', 'Pr_Id': 100021, 'Inventory': 5},
+                           {'B_Id': 100010, 'name': 'branch100010', 'Pr_Id': 100000, 'Inventory': 5},
+                           {'B_Id': 100010, 'name': 'branch100010', 'Pr_Id': 100021, 'Inventory': 5}]}
+    _ts = _load(data)
+    _merge(_ts, _delta)
+    assert _state(_ts) == _state(_load({**data, 'BRANCHES': data['BRANCHES'] + _delta['BRANCHES']}))
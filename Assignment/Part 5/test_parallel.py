@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+""" Tests of the parallel loader
+
+load_parallel, validating the sections in chunks across worker processes, must give the transaction system
+TransactionSystemSchema.load gives for the responses of the Responses directory, and reject the invalid response with
+a ValidationError.
+
+"""
+# Built-In Packages
+import json
+
+# External Packages
+import pytest
+
+# User Packages
+from parallel import load_parallel
+from schema import ValidationError
+
+__author__ = 'praveen@gyandata.com'
+
+
+def test_parallel_matches_the_schema(response_text, report, expected_report):
+    assert report(load_parallel(json.loads(response_text), workers=2, chunk_size=500)) == expected_report
+
+
+def test_invalid_response_is_rejected(invalid_text):
+    with pytest.raises(ValidationError):
+        load_parallel(json.loads(invalid_text), workers=2, chunk_size=500)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+""" Tests of the sales rollups
+
+The rollups, the sales over a range and the top sellers of the object, columnar, SQLite and lazy transaction systems
+are checked against sums over the purchases of Responses/date.json.
+
+"""
+# Built-In Packages
+import functools
+import os
+from datetime import date, datetime
+
+# External Packages
+import pytest
+
+# User Packages
+from columnar import ColumnarTransactionSystem
+from lazy import load_lazy
+from loader import load_stream
+from sqlite_system import load_sqlite
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses', 'date.json')
+
+SYSTEMS = ('object', 'columnar', 'sqlite', 'lazy')
+
+GROUP_IDS = (('staff', 100000), ('staff', 100050), ('customer', 100003), ('branch', 100001), ('branch', 100009),
+             ('product', 100000), ('product', 100020))
+
+RANGES = ((None, None), (date(2018, 2, 10), datetime(2019, 7, 3, 5)), (datetime(2019, 1, 1, 12), None),
+          (None, date(2017, 3, 15)), (date(2018, 5, 1), date(2018, 5, 1)))
+
+
+@functools.lru_cache(maxsize=None)
+def _system(kind):
+    """ Returns the transaction system of a kind loaded from Responses/date.json """
+    with open(RESPONSE_FILE, 'r') as json_file:
+        if kind == 'columnar':
+            return load_stream(json_file, compiled=True, system=ColumnarTransactionSystem())
+        if kind == 'sqlite':
+            return load_sqlite(json_file)
+        if kind == 'lazy':
+            return load_lazy(json_file)
+        return load_stream(json_file, compiled=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _purchases():
+    """ Returns the datetime, staff, customer, branch and product Ids, quantity and total price of every purchase """
+    return [(_purchase.transaction.datetime, {'staff': _purchase.transaction.staff.id,
+                                              'customer': _purchase.transaction.customer.id,
+                                              'branch': _purchase.transaction.branch.id,
+                                              'product': _purchase.product.id},
+             _purchase.quantity, _purchase.total_price) for _purchase in _system('object').purchases]
+
+
+def _bucket(value, period):
+    """ Returns the first day of the day or month holding a datetime or date """
+    _day = value.date() if isinstance(value, datetime) else value
+    return _day if period == 'day' else _day.replace(day=1)
+
+
+def _brute_rollup(group, id_, period):
+    """ Returns the period, quantity and revenue of every day or month with sales, summed over the purchases """
+    _sums = {}
+    for _datetime, _ids, _quantity, _price in _purchases():
+        if _ids[group] == id_:
+            _sum = _sums.setdefault(_bucket(_datetime, period), [0, 0.0])
+            _sum[0] += _quantity
+            _sum[1] += _price
+    return [(_period, *_sums[_period]) for _period in sorted(_sums)]
+
+
+def _brute_top(group, by, start, end, branch_id):
+    """ Returns the Id, quantity and revenue of every entity with sales, highest first and then by Id """
+    _sums = {}
+    for _datetime, _ids, _quantity, _price in _purchases():
+        if ((start is None or _datetime.date() >= _bucket(start, 'day')) and
+                (end is None or _datetime.date() < _bucket(end, 'day')) and
+                (branch_id is None or _ids['branch'] == branch_id)):
+            _sum = _sums.setdefault(_ids[group], [0, 0.0])
+            _sum[0] += _quantity
+            _sum[1] += _price
+    _index = 0 if by == 'quantity' else 1
+    return sorted(((_id, *_sum) for _id, _sum in _sums.items()), key=lambda _row: (-_row[1 + _index], _row[0]))
+
+
+def _rounded(rows):
+    """ Returns rows with their floats rounded, as the systems sum prices in another order """
+    return [tuple(round(_value, 6) if isinstance(_value, float) else _value for _value in _row) for _row in rows]
+
+
+@pytest.mark.parametrize('period', ['day', 'month'])
+@pytest.mark.parametrize('group, id_', GROUP_IDS)
+@pytest.mark.parametrize('kind', SYSTEMS)
+def test_rollup_matches_the_purchases(kind, group, id_, period):
+    _rollup = _system(kind).get_rollup(group, id_, period)
+    assert _rollup
+    assert _rounded(_rollup) == _rounded(_brute_rollup(group, id_, period))
+
+
+@pytest.mark.parametrize('period', ['day', 'month'])
+@pytest.mark.parametrize('group, id_', GROUP_IDS)
+@pytest.mark.parametrize('kind', SYSTEMS)
+def test_sales_between_matches_the_purchases(kind, group, id_, period):
+    _rollup = _brute_rollup(group, id_, period)
+    for _start, _end in RANGES:
+        _in_range = [_row for _row in _rollup if (_start is None or _row[0] >= _bucket(_start, period)) and
+                     (_end is None or _row[0] < _bucket(_end, period))]
+        _quantity, _revenue = _system(kind).get_sales_between(group, id_, _start, _end, period)
+        assert _quantity == sum(_row[1] for _row in _in_range)
+        assert _revenue == pytest.approx(sum(_row[2] for _row in _in_range))
+
+
+@pytest.mark.parametrize('branch_id', [None, 100004])
+@pytest.mark.parametrize('by', ['revenue', 'quantity'])
+@pytest.mark.parametrize('group', ['staff', 'customer', 'branch', 'product'])
+@pytest.mark.parametrize('kind', SYSTEMS)
+def test_top_matches_the_purchases(kind, group, by, branch_id):
+    for _start, _end in RANGES:
+        _expected = _rounded(_brute_top(group, by, _start, _end, branch_id))
+        _top = _system(kind).get_top(group, len(_expected) + 1, by, _start, _end, branch_id)
+        # Entities with equal sales are compared in order of Id
+        _index = 1 if by == 'quantity' else 2
+        _ranked = sorted(_rounded((_row.id, _row.quantity, _row.revenue) for _row in _top),
+                         key=lambda _row: (-_row[_index], _row[0]))
+        assert [getattr(_row, by) for _row in _top] == sorted((getattr(_row, by) for _row in _top), reverse=True)
+        assert _ranked == _expected
+        assert _top[:3] == _system(kind).get_top(group, 3, by, _start, _end, branch_id)
+
+
+@pytest.mark.parametrize('kind', SYSTEMS)
+def test_unknown_group_is_rejected(kind):
+    with pytest.raises(ValueError):
+        _system(kind).get_rollup('supplier', 100000)
+    with pytest.raises(ValueError):
+        _system(kind).get_top('staff', 5, 'profit')
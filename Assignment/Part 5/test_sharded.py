@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+""" Tests of the sharded transaction system
+
+The sharded system must answer the queries as TransactionSystemSchema.load's system does for the responses of the
+Responses directory, with the records merged from the shards in the same order, and reject the invalid response with
+a ValidationError.
+
+"""
+# Built-In Packages
+import io
+import json
+
+# External Packages
+import pytest
+
+# User Packages
+from loader import load_stream
+from schema import ValidationError
+from sharded import ShardedTransactionSystem
+
+__author__ = 'praveen@gyandata.com'
+
+
+def test_sharded_system_matches_the_schema(response_text, report, expected_report):
+    with ShardedTransactionSystem(json.loads(response_text), workers=2) as _ts:
+        assert report(_ts) == expected_report
+
+
+def test_details_across_branches_keep_the_response_order(response_text):
+    # Transactions out of the order of their Ids
+    _data = json.loads(response_text)
+    _data['TRANSACTIONS'].reverse()
+    _expected = load_stream(io.StringIO(json.dumps(_data)))
+    with ShardedTransactionSystem(_data, workers=0) as _ts:
+        for _customer in _expected.customers:
+            assert _ts.get_customer_details(_customer.id) == list(_expected.get_customer_details(_customer.id))
+        for _staff in _expected.staffs:
+            assert _ts.get_staff_details(_staff.id) == list(_expected.get_staff_details(_staff.id))
+        for _customer in _expected.customers:
+            assert list(_ts.get_transaction_details(customer_id=_customer.id)) == \
+                list(_expected.get_transaction_details(customer_id=_customer.id))
+
+
+def test_invalid_response_is_rejected(invalid_text):
+    with pytest.raises(ValidationError):
+        ShardedTransactionSystem(json.loads(invalid_text), workers=2)
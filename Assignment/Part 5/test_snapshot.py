@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" Tests of the snapshot cache
+
+The system written to a snapshot and read back must answer the queries as TransactionSystemSchema.load's system does,
+and the invalid response must be rejected with a ValidationError without writing a snapshot.
+
+Snapshots of response files of the same name in different directories must not replace each other, and a changed
+response must replace its own stale snapshot.
+
+"""
+# Built-In Packages
+import os
+import shutil
+
+# External Packages
+import pytest
+
+# User Packages
+import loader
+import validator
+from schema import ValidationError
+from snapshot import load_cached, code_fingerprint
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses')
+
+
+def _copy(name, directory):
+    """ Returns the path of a copy of a response of the Responses directory, named response.json """
+    os.makedirs(directory)
+    return shutil.copy(os.path.join(RESPONSES_DIR, f"{name}.json"), os.path.join(directory, 'response.json'))
+
+
+def test_cached_system_matches_the_schema(response_path, report, expected_report, tmp_path):
+    load_cached(response_path, str(tmp_path))
+    assert report(load_cached(response_path, str(tmp_path))) == expected_report
+
+
+def test_invalid_response_is_not_cached(tmp_path):
+    with pytest.raises(ValidationError):
+        load_cached(os.path.join(RESPONSES_DIR, 'staff_testing.json'), str(tmp_path))
+    assert not os.listdir(tmp_path)
+
+
+def test_files_of_the_same_name_keep_their_snapshots(tmp_path):
+    _cache = str(tmp_path / 'cache')
+    _staff = _copy('staff', tmp_path / 'staff')
+    _branch = _copy('branch', tmp_path / 'branch')
+    _staff_count = len(load_cached(_staff, _cache).staffs)
+    _branch_count = len(load_cached(_branch, _cache).staffs)
+    assert len(os.listdir(_cache)) == 2
+    assert len(load_cached(_staff, _cache).staffs) == _staff_count
+    assert len(load_cached(_branch, _cache).staffs) == _branch_count
+    assert len(os.listdir(_cache)) == 2
+
+
+def test_changed_response_replaces_its_snapshot(tmp_path):
+    _cache = str(tmp_path / 'cache')
+    _path = _copy('staff', tmp_path / 'response')
+    load_cached(_path, _cache)
+    _before = os.listdir(_cache)
+    shutil.copy(os.path.join(RESPONSES_DIR, 'branch.json'), _path)
+    load_cached(_path, _cache)
+    _after = os.listdir(_cache)
+    assert len(_after) == 1 and _after != _before
+
+
+def test_fingerprint_covers_the_loading_modules():
+    assert {loader, validator} <= set(code_fingerprint.__defaults__[0])
+    assert code_fingerprint() != code_fingerprint(modules=code_fingerprint.__defaults__[0][:2])
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+""" Tests of the SQLite transaction system
+
+The SQLite system must answer the queries as TransactionSystemSchema.load's system does for the responses of the
+Responses directory, and reject the invalid response with a ValidationError.
+
+Repeated Ids, loading into a database which already holds a response, and the table views.
+
+"""
+# Built-In Packages
+import io
+import json
+import os
+
+# External Packages
+import pytest
+
+# User Packages
+from schema import ValidationError
+from sqlite_system import load_sqlite
+
+__author__ = 'praveen@gyandata.com'
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Responses')
+
+
+def _response(name='date'):
+    """ Returns the decoded records of a response of the Responses directory """
+    with open(os.path.join(RESPONSES_DIR, f"{name}.json"), 'r') as json_file:
+        return json.load(json_file)
+
+
+def _load(data, path=':memory:', batch_size=1000):
+    """ Returns the SQLiteTransactionSystem of a response """
+    return load_sqlite(io.StringIO(json.dumps(data)), path, batch_size=batch_size)
+
+
+def test_sqlite_matches_the_schema(response_text, report, expected_report):
+    assert report(load_sqlite(io.StringIO(response_text))) == expected_report
+
+
+def test_invalid_response_is_rejected(invalid_text):
+    with pytest.raises(ValidationError):
+        load_sqlite(io.StringIO(invalid_text))
+
+
+@pytest.mark.parametrize('section, index, field', [('STAFF', 1, 'Id'), ('CUSTOMERS', 7, 'Id'),
+                                                   ('TRANSACTIONS', 1500, 'T_Id'), ('PRODUCTS', 0, 'Id'),
+                                                   ('PURCHASES', 3999, 'P_Id')])
+def test_repeated_id_is_rejected(section, index, field):
+    _data = _response()
+    _data[section].append(dict(_data[section][index]))
+    with pytest.raises(ValidationError) as err:
+        _load(_data)
+    assert err.value.messages == {section: {len(_data[section]) - 1: {field: ['Duplicate Id']}}}
+
+
+def test_repeated_id_in_a_later_batch_is_reported_at_its_index():
+    _data = _response()
+    _data['PURCHASES'].insert(2500, dict(_data['PURCHASES'][10]))
+    with pytest.raises(ValidationError) as err:
+        _load(_data, batch_size=300)
+    assert err.value.messages == {'PURCHASES': {2500: {'P_Id': ['Duplicate Id']}}}
+
+
+def test_rejected_response_writes_nothing(tmp_path):
+    _path = str(tmp_path / 'ts.db')
+    _load(_response(), _path).close()
+    _data = _response('staff')
+    _staff = {'Id': 100100, 'name': 'staff100100', 'Email': 'staff100100@gmail.com', 'B_Id': 100000}
+    _data['STAFF'] += [_staff, _staff]
+    with pytest.raises(ValidationError):
+        _load(_data, _path)
+    with load_sqlite(io.StringIO('{}'), _path) as _ts:
+        assert (len(_ts.staffs), len(_ts.transactions), len(_ts.purchases)) == (100, 2000, 4000)
+
+
+def test_ids_of_an_earlier_load_are_skipped(tmp_path):
+    _path = str(tmp_path / 'ts.db')
+    _load(_response(), _path).close()
+    with _load(_response(), _path) as _ts:
+        assert (len(_ts.staffs), len(_ts.transactions), len(_ts.purchases)) == (100, 2000, 4000)
+
+
+def test_added_entity_with_a_known_id_is_rejected():
+    _ts = _load(_response())
+    with pytest.raises(ValueError):
+        _ts.add_staff(_ts.staffs[0])
+    with pytest.raises(ValueError):
+        _ts.add_purchase(_ts.purchases[0])
+    assert (len(_ts.staffs), len(_ts.purchases)) == (100, 4000)
+
+
+def test_table_view_indexes_in_order():
+    _data = _response()
+    _ids = [_purchase['P_Id'] for _purchase in _data['PURCHASES']]
+    _purchases = _load(_data).purchases
+    assert [_purchase.id for _purchase in _purchases] == _ids
+    assert _purchases[0].id == _ids[0] and _purchases[-1].id == _ids[-1]
+    for _slice in (slice(3, 9), slice(3, 20, 4), slice(20, 3, -5), slice(-3, None), slice(5, 5)):
+        assert [_purchase.id for _purchase in _purchases[_slice]] == _ids[_slice]
+    with pytest.raises(IndexError):
+        _purchases[len(_ids)]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+""" Tests of the streaming loader
+
+load_stream must give the transaction system TransactionSystemSchema.load gives for the responses of the Responses
+directory, and reject the invalid response with a ValidationError.
+
+"""
+# Built-In Packages
+import io
+
+# External Packages
+import pytest
+
+# User Packages
+from loader import load_stream
+from schema import ValidationError
+
+__author__ = 'praveen@gyandata.com'
+
+
+def test_stream_matches_the_schema(response_text, report, expected_report):
+    assert report(load_stream(io.StringIO(response_text))) == expected_report
+
+
+def test_invalid_response_is_rejected(invalid_text):
+    with pytest.raises(ValidationError):
+        load_stream(io.StringIO(invalid_text))
@@ -3,6 +3,9 @@
 
 This module has class for storing the transaction details and performing operations using them.
 
+The entity classes use __slots__ instead of a per instance __dict__, and intern their names and emails so that
+the same string read again (for example from another response) is stored once.
+
 This file contains the following Classes:
 
     * Staff - This class contains the data of the staff.
@@ -10,12 +13,70 @@ This file contains the following Classes:
     * Transaction - This class contains the data of the transaction.
     * Product - This class contains the data of the product.
     * Purchase - This class contains the data of the purchase.
+    * QueryCache - This class keeps the results of the most recently used queries.
     * TransactionSystem - This class contains the data of the whole transaction system.
 
+This file contains the following Named Tuples, which the queries return:
+
+    * Sales - Quantity sold and revenue of a staff, customer, branch or product.
+    * TransactionRecord - A transaction with its staff, customer and branch.
+    * PurchaseRecord - A purchase with its transaction, or a transaction without purchases.
+    * SalesRecord - Quantity sold and revenue of a named staff or customer.
+    * InventoryRecord - Inventory of a product in a branch.
+    * CacheInfo - Hits, misses, size and capacity of a QueryCache.
+    * RollupRecord - Quantity sold and revenue in a day or month.
+    * PurchaseFact - A purchase joined with its transaction, staff, customer, branch and product.
+
 """
 
+# Built-In Packages
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time
+from sys import intern
+
+# User Packages
+from rollup import Rollup
+
 __author__ = 'praveen@gyandata.com'
 
+Sales = namedtuple('Sales', ['quantity', 'revenue'])
+
+TransactionRecord = namedtuple('TransactionRecord', ['transaction_id', 'datetime', 'staff_id', 'staff_name',
+                                                     'customer_id', 'customer_name', 'branch_id', 'branch_name'])
+
+PurchaseRecord = namedtuple('PurchaseRecord', ['transaction_id', 'datetime', 'purchase_id', 'product_id',
+                                               'product_name', 'quantity', 'total_price'])
+
+SalesRecord = namedtuple('SalesRecord', ['id', 'name', 'quantity', 'revenue'])
+
+InventoryRecord = namedtuple('InventoryRecord', ['branch_id', 'product_id', 'quantity'])
+
+RollupRecord = namedtuple('RollupRecord', ['period_start', 'quantity', 'revenue'])
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+PurchaseFact = namedtuple('PurchaseFact', ['purchase_id', 'transaction_id', 'datetime', 'staff_id', 'staff_name',
+                                           'customer_id', 'customer_name', 'branch_id', 'branch_name', 'product_id',
+                                           'product_name', 'quantity', 'price', 'total_price'])
+
+# Groups of the sales summary
+SALES_GROUPS = ('staff', 'customer', 'branch', 'product')
+
+# Lookup of the entities of each group of the rollups
+_GROUP_LOOKUPS = {'staff': 'get_staff', 'customer': 'get_customer', 'branch': 'get_branch', 'product': 'get_product'}
+
+# Number of query results a TransactionSystem keeps by default
+QUERY_CACHE_SIZE = 1024
+
+# Number of PurchaseFacts in a chunk of get_purchase_facts
+FACT_CHUNK_SIZE = 10000
+
+
+def _intern(value):
+    """ Returns the interned copy of a string, other values are returned unchanged """
+    return intern(value) if type(value) is str else value
+
 
 class Staff:
     """
@@ -35,11 +96,13 @@ class Staff:
         Reference to an instance of branch class, representing the branch to which the
         staff belongs to.
     """
+    __slots__ = ('id', 'name', 'email', 'branch')
+
     def __init__(self, id_, name, email, branch_):
 
-        self.name = name
+        self.name = _intern(name)
         self.id = id_
-        self.email = email
+        self.email = _intern(email)
         self.branch = branch_
 
     def __str__(self):
@@ -60,10 +123,12 @@ class Customer:
     email : Str
         Customer Email.
     """
+    __slots__ = ('id', 'name', 'email')
+
     def __init__(self, id_, name, email):
-        self.name = name
+        self.name = _intern(name)
         self.id = id_
-        self.email = email
+        self.email = _intern(email)
 
     def __str__(self):
         return f"Customer name: {self.name}, Email: {self.email}"
@@ -80,12 +145,14 @@ class Branch:
     id : int
         Customer Id.
 
-    products : list
-        List consisting of list of product (Instance of Product Class) reference,
-        and its inventory details for the product.
+    products : dict
+        Inventory of the branch, keyed by Product Id. It is changed through the TransactionSystem the branch is
+        in, which keeps the inventory of every product across branches in step.
     """
+    __slots__ = ('id', 'name', 'products')
+
     def __init__(self, id_, name, products_):
-        self.name = name
+        self.name = _intern(name)
         self.id = id_
         self.products = products_
 
@@ -115,7 +182,12 @@ class Transaction:
 
     datetime : datetime
         The datetime during which the transaction occurred.
+
+    staff_id, customer_id, branch_id : int
+        Ids of the staff, customer and branch, which the transaction system indexes the transaction by.
     """
+    __slots__ = ('id', 'staff', 'customer', 'branch', 'datetime')
+
     def __init__(self, id_, staff_, customer_, branch_, _datetime):
         self.id = id_
         self.staff = staff_
@@ -123,6 +195,18 @@ class Transaction:
         self.branch = branch_
         self.datetime = _datetime
 
+    @property
+    def staff_id(self):
+        return self.staff.id
+
+    @property
+    def customer_id(self):
+        return self.customer.id
+
+    @property
+    def branch_id(self):
+        return self.branch.id
+
     def __str__(self):
         return f"Transaction Id: {self.id}, Handling Staff: {self.staff.id}, " \
                f" Customer: {self.customer.id}, Handling Branch: {self.branch.id}, Date: {self.datetime}"
@@ -142,8 +226,10 @@ class Product:
     price : float
         Price of the product.
     """
+    __slots__ = ('id', 'name', 'price')
+
     def __init__(self, id_, name, price):
-        self.name = name
+        self.name = _intern(name)
         self.id = id_
         self.price = price
 
@@ -173,7 +259,12 @@ class Purchase:
 
     total_price : float
         Total Price in this purchase.
+
+    transaction_id, product_id : int
+        Ids of the transaction and product, which the transaction system indexes the purchase by.
     """
+    __slots__ = ('id', 'transaction', 'product', 'quantity', 'total_price')
+
     def __init__(self, pu_id_, transaction_, product_, quantity, total_price):
         self.id = pu_id_
         self.transaction = transaction_
@@ -181,11 +272,99 @@ class Purchase:
         self.quantity = quantity
         self.total_price = total_price
 
+    @property
+    def transaction_id(self):
+        return self.transaction.id
+
+    @property
+    def product_id(self):
+        return self.product.id
+
     def __str__(self):
         return f"Purchase Id: {self.id}\nTransaction Id: {self.transaction.id}\nProduct: {self.product.id}\n" \
                f"Quantity: {self.quantity}\nTotal Price: {self.total_price}"
 
 
+class QueryCache:
+    """
+    QueryCache class which keeps the results of the most recently used queries.
+
+    Results are keyed by query name and Id, such as ('staff_performance', 100001). Once maxsize results are kept,
+    adding one drops the least recently used.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        Largest number of results kept, 0 to keep none.
+
+    hits : int
+        Number of lookups which found a result.
+
+    misses : int
+        Number of lookups which did not.
+
+    Methods
+    -------
+    get(query, id_)
+        Returns the result of a query, or None if it is not kept.
+
+    put(query, id_, result)
+        Keeps the result of a query.
+
+    discard(query, id_)
+        Drops the result of a query, if it is kept.
+
+    clear()
+        Drops every result.
+
+    info()
+        Returns the hits, misses, size and capacity of the cache.
+
+    """
+    __slots__ = ('maxsize', 'hits', 'misses', '_results')
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, query, id_):
+        """ Returns the result of a query for an Id, or None if it is not kept """
+        _result = self._results.get((query, id_))
+        if _result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results.move_to_end((query, id_))
+        return _result
+
+    def put(self, query, id_, result):
+        """ Keeping the result of a query for an Id, dropping the least recently used if the cache is full """
+        if self.maxsize <= 0:
+            return
+        self._results[query, id_] = result
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def discard(self, query, id_):
+        """ Dropping the result of a query for an Id """
+        self._results.pop((query, id_), None)
+
+    def clear(self):
+        """ Dropping every result, the hit and miss counts are kept """
+        self._results.clear()
+
+    def info(self):
+        """ Returns the hits, misses, capacity and size of the cache """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._results))
+
+
 class TransactionSystem:
     """
     TransactionSystem class with associated information.
@@ -214,6 +393,11 @@ class TransactionSystem:
 
     Methods
     -------
+    add_staff(staff_), add_customer(customer_), add_branch(branch_), add_transaction(transaction_),
+    add_product(product_), add_purchase(purchase_)
+        Appends the entity to its list and indexes it by Id. Entities must be added through these
+        methods (not by appending to the lists) so that the get_* lookups stay O(1) and correct.
+
     get_staff(id_)
         Returns the reference to Staff object whose Id matches id_.
 
@@ -232,23 +416,74 @@ class TransactionSystem:
     get_product(id_)
         Returns the reference to Product object whose Id matches id_.
 
+    get_staff_transactions(id_), get_customer_transactions(id_), get_branch_transactions(id_)
+        Returns the Transactions of the staff, customer or branch whose Id matches id_.
+
+    get_transaction_purchases(id_)
+        Returns the Purchases made in the Transaction whose Id matches id_.
+
+    get_transactions_between(start, end, staff_id, customer_id, branch_id)
+        Returns the Transactions in [start, end), optionally filtered by staff, customer and branch.
+
     get_staff_details(id_)
-        Displays the Staff Details such as the transactions he was involved, customer handled.
+        Returns the Staff Details such as the transactions he was involved, customer handled.
 
     get_customer_details(id_)
-        Displays the Customer Details such as the transactions he was involved, staff who handled.
+        Returns the Customer Details such as the transactions he was involved, staff who handled.
+
+    get_transaction_details(start, end, staff_id, customer_id, branch_id)
+        Yields the Transaction Details between two dates such as the Products and Purchase involved.
+
+    get_purchase_facts(chunk_size)
+        Yields the purchases joined with their transaction, staff, customer, branch and product, in chunks.
+
+    get_sales_summary()
+        Returns the quantity and revenue of every staff, customer, branch and product, from one pass.
 
-    get_transaction_details()
-        Displays the Transaction Details between two dates such as the Products and Purchase involved.
+    get_rollup(group, id_, period)
+        Returns the quantity and revenue of a staff, customer, branch or product per day or month.
+
+    get_sales_between(group, id_, start, end, period)
+        Returns the quantity and revenue of a staff, customer, branch or product over a range of days or months.
+
+    get_top(group, k, by, start, end, branch_id)
+        Returns the k staff, customers, branches or products with the highest revenue or quantity.
 
     get_staff_performance(id_)
-        Displays the Staff's Total sales and monetary value.
+        Returns the Staff's Total sales and monetary value.
 
     get_customer_value(id_)
-        Displays the Customer's Total number of products bought and monetary value.
+        Returns the Customer's Total number of products bought and monetary value.
+
+    cache_info(), clear_cache()
+        Returns the hits and misses of the query cache, or empties it.
+
+    add_inventory(branch_id, product_id, count)
+        Adds the inventory of a product to a branch.
+
+    apply_purchase(purchase_), apply_purchases(purchases_)
+        Adds new purchases and takes what they bought out of the inventory of their branches.
 
     get_branch_inventory(id_)
-        Displays the Inventory details of products in the given branch.
+        Returns the Inventory details of products in the given branch.
+
+    get_staff_performance, get_customer_value and get_branch_inventory keep their results in a QueryCache of
+    cache_size results. Adding a transaction or purchase drops only the results of its staff and customer, and
+    changing the inventory of a branch only the inventory of that branch.
+
+    get_stock(branch_id, product_id), get_product_stock(product_id)
+        Returns the inventory of a product in a branch, or its total across every branch.
+
+    get_branches_stocking(product_id)
+        Returns the inventory of the branches which have the product in stock.
+
+    get_low_stock(threshold, branch_id)
+        Returns the inventory below threshold, of every branch or of the given branch.
+
+    get_inventory_matrix()
+        Returns the branch x product inventory matrix.
+
+    The report module renders the results of these queries as text, JSON lines or CSV.
 
     Raises
     ------
@@ -256,7 +491,7 @@ class TransactionSystem:
         If Id (Product Id, Branch Id, etc) is not found.
 
     """
-    def __init__(self):
+    def __init__(self, cache_size=QUERY_CACHE_SIZE):
         self.staffs = []
         self.customers = []
         self.branches = []
@@ -264,6 +499,295 @@ class TransactionSystem:
         self.products = []
         self.purchases = []
 
+        # Id keyed indexes, kept in step with the lists above by the add_* methods
+        self._staff_index = {}
+        self._customer_index = {}
+        self._branch_index = {}
+        self._transaction_index = {}
+        self._product_index = {}
+        self._purchase_index = {}
+
+        # Reverse relationship indexes, kept in step by add_transaction and add_purchase
+        self._transactions_by_staff = {}
+        self._transactions_by_customer = {}
+        self._transactions_by_branch = {}
+        self._purchases_by_transaction = {}
+
+        # Transactions and their datetimes sorted by datetime, for range queries. Transactions added out of
+        # order only mark the index dirty, it is re-sorted once on the next range query.
+        self._datetimes = []
+        self._transactions_by_datetime = []
+        self._datetime_index_dirty = False
+
+        # Sales of every staff, customer, branch and product, computed by get_sales_summary and dropped on insert
+        self._sales_summary = None
+
+        # Columns of the branch x product inventory matrix, whose rows are the products dicts of the branches:
+        # the inventory of every product keyed by Branch Id, and its total across branches
+        self._stock_by_product = {}
+        self._stock_totals = {}
+
+        # Results of get_staff_performance, get_customer_value and get_branch_inventory
+        self._query_cache = QueryCache(cache_size)
+
+        # Daily sales of every staff, customer, branch and product, overall and within each branch, updated by
+        # add_purchase
+        self._rollup = Rollup(SALES_GROUPS, scope=SALES_GROUPS.index('branch'))
+
+    @staticmethod
+    def _add(entities, index, entity):
+        """
+        Appending an entity to its list and indexing it by Id
+
+        The first entity added for an Id wins, mirroring the old linear scans which returned the first match.
+
+        ...
+
+        Parameters
+        ----------
+        entities : list
+            List to which the entity is appended.
+
+        index : dict
+            Id keyed index of the list.
+
+        entity : object
+            Entity to be added.
+
+        """
+        entities.append(entity)
+        index.setdefault(entity.id, entity)
+
+    def add_staff(self, staff_):
+        """
+        Adding a Staff
+
+        ...
+
+        Parameters
+        ----------
+        staff_ : Staff
+            Staff to be added.
+
+        """
+        self._add(self.staffs, self._staff_index, staff_)
+
+    def add_customer(self, customer_):
+        """
+        Adding a Customer
+
+        ...
+
+        Parameters
+        ----------
+        customer_ : Customer
+            Customer to be added.
+
+        """
+        self._add(self.customers, self._customer_index, customer_)
+
+    def add_branch(self, branch_):
+        """
+        Adding a Branch
+
+        ...
+
+        Parameters
+        ----------
+        branch_ : Branch
+            Branch to be added.
+
+        """
+        self._add(self.branches, self._branch_index, branch_)
+        if self._branch_index[branch_.id] is branch_:
+            for _product_id, _count in branch_.products.items():
+                self._index_stock(branch_.id, _product_id, 0, _count)
+
+    def add_transaction(self, transaction_):
+        """
+        Adding a Transaction
+
+        ...
+
+        Parameters
+        ----------
+        transaction_ : Transaction
+            Transaction to be added.
+
+        """
+        self._add(self.transactions, self._transaction_index, transaction_)
+        self._transactions_by_staff.setdefault(transaction_.staff_id, []).append(transaction_)
+        self._transactions_by_customer.setdefault(transaction_.customer_id, []).append(transaction_)
+        self._transactions_by_branch.setdefault(transaction_.branch_id, []).append(transaction_)
+        if self._datetimes and transaction_.datetime < self._datetimes[-1]:
+            self._datetime_index_dirty = True
+        self._datetimes.append(transaction_.datetime)
+        self._transactions_by_datetime.append(transaction_)
+        self._invalidate_sales(transaction_)
+
+    def add_product(self, product_):
+        """
+        Adding a Product
+
+        ...
+
+        Parameters
+        ----------
+        product_ : Product
+            Product to be added.
+
+        """
+        self._add(self.products, self._product_index, product_)
+
+    def add_purchase(self, purchase_):
+        """
+        Adding a Purchase
+
+        ...
+
+        Parameters
+        ----------
+        purchase_ : Purchase
+            Purchase to be added.
+
+        """
+        self._add(self.purchases, self._purchase_index, purchase_)
+        self._purchases_by_transaction.setdefault(purchase_.transaction_id, []).append(purchase_)
+        self._sales_summary = None
+        self._invalidate_sales(purchase_.transaction)
+        self._add_to_rollups(purchase_)
+
+    @staticmethod
+    def _sales_ids(purchase_):
+        """ Returns the transaction of a purchase, and the Ids of its staff, customer, branch and product """
+        _trans = purchase_.transaction
+        return _trans, (_trans.staff_id, _trans.customer_id, _trans.branch_id, purchase_.product_id)
+
+    def _add_to_rollups(self, purchase_):
+        """ Adding a purchase to the daily sales of its staff, customer, branch and product """
+        _trans, _ids = self._sales_ids(purchase_)
+        self._rollup.add(_ids, _trans.datetime, purchase_.quantity, purchase_.total_price)
+
+    def _invalidate_sales(self, transaction_):
+        """ Dropping the cached performance of the staff and value of the customer of a transaction """
+        self._query_cache.discard('staff_performance', transaction_.staff_id)
+        self._query_cache.discard('customer_value', transaction_.customer_id)
+
+    def _index_stock(self, branch_id, product_id, old, count):
+        """ Updating the inventory column of a product for a change of the inventory of a branch """
+        self._stock_by_product.setdefault(product_id, {})[branch_id] = count
+        self._stock_totals[product_id] = self._stock_totals.get(product_id, 0) + count - old
+
+    def _set_stock(self, branch_, product_id, count):
+        """ Setting the inventory of a product in a branch, in its row and in its column """
+        _old = branch_.products.get(product_id, 0)
+        branch_.products[product_id] = count
+        self._index_stock(branch_.id, product_id, _old, count)
+        self._query_cache.discard('branch_inventory', branch_.id)
+
+    def add_inventory(self, branch_id, product_id, count):
+        """
+        Adding the inventory of a product to a branch
+
+        The first inventory added for a product of a branch wins, like the first entity added for an Id.
+
+        ...
+
+        Parameters
+        ----------
+        branch_id : int
+            Id of the branch.
+
+        product_id : int
+            Id of the product.
+
+        count : int
+            Inventory of the product in the branch.
+
+        Raises
+        ------
+        LookupError
+            If the branch or the product is not in the system.
+        """
+        _branch = self.get_branch(branch_id)
+        self.get_product(product_id)
+        if product_id not in _branch.products:
+            self._set_stock(_branch, product_id, count)
+
+    def _has_purchase(self, id_):
+        """ Returns whether a purchase with the Id is in the system """
+        try:
+            self.get_purchase(id_)
+        except LookupError:
+            return False
+        return True
+
+    def apply_purchases(self, purchases_):
+        """
+        Adding new purchases and taking what they bought out of the inventory of their branches
+
+        Purchases are applied in order. A purchase which would make the inventory of its product in the branch of its
+        transaction negative is rejected, mirroring BranchSchema.validate_inventory, and so is a purchase whose Id is
+        already in the system. The inventory is worked out for the whole batch first and written once per branch
+        and product, so applying a batch costs O(1) per purchase.
+
+        ...
+
+        Parameters
+        ----------
+        purchases_ : Iterable
+            New purchases (Instance of Purchase Class), whose transactions and products are in the system.
+
+        Returns
+        -------
+        dict
+            Error messages of the rejected purchases keyed by their index in purchases_, in the layout of
+            ValidationError.messages. Empty if every purchase was applied.
+        """
+        _errors = {}
+        _applied = []
+        _ids = set()
+        _stock = {}
+        for _index, _purchase in enumerate(purchases_):
+            if _purchase.id in _ids or self._has_purchase(_purchase.id):
+                _errors[_index] = {'P_Id': ['Purchase Already Applied']}
+                continue
+            _key = (self.get_branch(_purchase.transaction.branch.id), _purchase.product.id)
+            _left = _stock[_key] if _key in _stock else _key[0].products.get(_key[1], 0)
+            _left -= _purchase.quantity
+            if _left < 0:
+                _errors[_index] = {'Inventory': ['Inventory Cannot Be Negative']}
+                continue
+            _stock[_key] = _left
+            _ids.add(_purchase.id)
+            _applied.append(_purchase)
+
+        for _purchase in _applied:
+            self.add_purchase(_purchase)
+        for (_branch, _product_id), _left in _stock.items():
+            self._set_stock(_branch, _product_id, _left)
+        return _errors
+
+    def apply_purchase(self, purchase_):
+        """
+        Adding a new purchase and taking what it bought out of the inventory of its branch
+
+        ...
+
+        Parameters
+        ----------
+        purchase_ : Purchase
+            New purchase, whose transaction and product are in the system.
+
+        Raises
+        ------
+        ValueError
+            If the purchase is already in the system, or would make the inventory negative. Nothing is changed then.
+        """
+        _errors = self.apply_purchases((purchase_,))
+        if _errors:
+            raise ValueError(next(iter(_errors[0].values()))[0])
+
     def get_staff(self, id_):
         """
         Finding the Staff
@@ -276,10 +800,10 @@ class TransactionSystem:
             Id of the staff.
 
         """
-        for _staff in self.staffs:
-            if _staff.id == id_:
-                return _staff
-        raise LookupError("Staff Not in DB")
+        _staff = self._staff_index.get(id_)
+        if _staff is None:
+            raise LookupError("Staff Not in DB")
+        return _staff
 
     def get_customer(self, id_):
         """
@@ -293,10 +817,10 @@ class TransactionSystem:
             Id of the customer.
 
         """
-        for _customer in self.customers:
-            if _customer.id == id_:
-                return _customer
-        raise LookupError("customer Not in DB")
+        _customer = self._customer_index.get(id_)
+        if _customer is None:
+            raise LookupError("customer Not in DB")
+        return _customer
 
     def get_branch(self, id_):
         """
@@ -310,10 +834,10 @@ class TransactionSystem:
             Id of the branch.
 
         """
-        for _branch in self.branches:
-            if _branch.id == id_:
-                return _branch
-        raise LookupError("Branch Not in DB")
+        _branch = self._branch_index.get(id_)
+        if _branch is None:
+            raise LookupError("Branch Not in DB")
+        return _branch
 
     def get_transaction(self, id_):
         """
@@ -327,10 +851,10 @@ class TransactionSystem:
             Id of the transaction.
 
         """
-        for _transaction in self.transactions:
-            if _transaction.id == id_:
-                return _transaction
-        raise LookupError("Transaction Not in DB")
+        _transaction = self._transaction_index.get(id_)
+        if _transaction is None:
+            raise LookupError("Transaction Not in DB")
+        return _transaction
 
     def get_purchase(self, id_):
         """
@@ -344,10 +868,10 @@ class TransactionSystem:
             Id of the purchase.
 
         """
-        for _purchase in self.purchases:
-            if _purchase.id == id_:
-                return _purchase
-        raise LookupError("Purchase Not in DB")
+        _purchase = self._purchase_index.get(id_)
+        if _purchase is None:
+            raise LookupError("Purchase Not in DB")
+        return _purchase
 
     def get_product(self, id_):
         """
@@ -361,10 +885,164 @@ class TransactionSystem:
             Id of the product.
 
         """
-        for _product in self.products:
-            if _product.id == id_:
-                return _product
-        raise LookupError("Product Not in DB")
+        _product = self._product_index.get(id_)
+        if _product is None:
+            raise LookupError("Product Not in DB")
+        return _product
+
+    def get_staff_transactions(self, id_):
+        """
+        Finding the Transactions handled by a Staff
+
+        ...
+
+        Parameters
+        ----------
+        id_ : int
+            Id of the staff.
+
+        Returns
+        -------
+        list
+            Transactions handled by the staff, in the order they were added.
+        """
+        return self._transactions_by_staff.get(id_, [])
+
+    def get_customer_transactions(self, id_):
+        """
+        Finding the Transactions in which a Customer was involved
+
+        ...
+
+        Parameters
+        ----------
+        id_ : int
+            Id of the customer.
+
+        Returns
+        -------
+        list
+            Transactions of the customer, in the order they were added.
+        """
+        return self._transactions_by_customer.get(id_, [])
+
+    def get_branch_transactions(self, id_):
+        """
+        Finding the Transactions handled by a Branch
+
+        ...
+
+        Parameters
+        ----------
+        id_ : int
+            Id of the branch.
+
+        Returns
+        -------
+        list
+            Transactions handled by the branch, in the order they were added.
+        """
+        return self._transactions_by_branch.get(id_, [])
+
+    def get_transaction_purchases(self, id_):
+        """
+        Finding the Purchases made in a Transaction
+
+        ...
+
+        Parameters
+        ----------
+        id_ : int
+            Id of the transaction.
+
+        Returns
+        -------
+        list
+            Purchases of the transaction, in the order they were added.
+        """
+        return self._purchases_by_transaction.get(id_, [])
+
+    def _sort_datetime_index(self):
+        """ Re-sorting the datetime index after out of order inserts """
+        if self._datetime_index_dirty:
+            self._transactions_by_datetime.sort(key=lambda _trans: _trans.datetime)
+            self._datetimes = [_trans.datetime for _trans in self._transactions_by_datetime]
+            self._datetime_index_dirty = False
+
+    @staticmethod
+    def _as_datetime(_date):
+        """ Widening a date to the datetime at its midnight, so that it can be compared with transaction datetimes """
+        if isinstance(_date, date) and not isinstance(_date, datetime):
+            return datetime.combine(_date, time.min)
+        return _date
+
+    def get_transactions_between(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        """
+        Finding the Transactions between two dates
+
+        The range is found by bisecting the datetime index, so a query costs O(log n + k) for k matching
+        transactions. When a staff, customer or branch filter has fewer transactions than the range, that
+        entity's own transactions are scanned instead.
+
+        ...
+
+        Parameters
+        ----------
+        start : datetime or date, optional
+            Transactions on or after this datetime are returned, unbounded if not given.
+
+        end : datetime or date, optional
+            Transactions before this datetime are returned, unbounded if not given.
+
+        staff_id : int, optional
+            Only transactions handled by this staff are returned.
+
+        customer_id : int, optional
+            Only transactions of this customer are returned.
+
+        branch_id : int, optional
+            Only transactions handled by this branch are returned.
+
+        Returns
+        -------
+        list
+            Matching transactions, sorted by datetime.
+        """
+        start = self._as_datetime(start)
+        end = self._as_datetime(end)
+        self._sort_datetime_index()
+        _low = 0 if start is None else bisect_left(self._datetimes, start)
+        _high = len(self._datetimes) if end is None else bisect_left(self._datetimes, end)
+        if _high <= _low:
+            return []
+
+        _filters = []
+        if staff_id is not None:
+            _filters.append((self.get_staff_transactions(staff_id), lambda _trans: _trans.staff_id == staff_id))
+        if customer_id is not None:
+            _filters.append((self.get_customer_transactions(customer_id),
+                             lambda _trans: _trans.customer_id == customer_id))
+        if branch_id is not None:
+            _filters.append((self.get_branch_transactions(branch_id), lambda _trans: _trans.branch_id == branch_id))
+        if not _filters:
+            return self._transactions_by_datetime[_low:_high]
+
+        # Scanning the smaller of the date range and the most selective entity's transactions
+        _smallest = min(_filters, key=lambda _filter: len(_filter[0]))
+        if len(_smallest[0]) < _high - _low:
+            _candidates = sorted((_trans for _trans in _smallest[0]
+                                  if (start is None or _trans.datetime >= start)
+                                  and (end is None or _trans.datetime < end)),
+                                 key=lambda _trans: _trans.datetime)
+        else:
+            _candidates = self._transactions_by_datetime[_low:_high]
+        return [_trans for _trans in _candidates if all(_check(_trans) for _, _check in _filters)]
+
+    @staticmethod
+    def _transaction_record(_trans):
+        """ Making the TransactionRecord of a transaction """
+        return TransactionRecord(_trans.id, _trans.datetime, _trans.staff.id, _trans.staff.name, _trans.customer.id,
+                                 _trans.customer.name, _trans.branch.id, _trans.branch.name)
 
     def get_staff_details(self, _id):
         """
@@ -377,18 +1055,17 @@ class TransactionSystem:
         _id : int
             Id of the staff.
 
+        Returns
+        -------
+        Iterator
+            TransactionRecord of each transaction handled by the staff.
+
         """
-        _data = f"The Transactions Handled by Staff: {self.get_staff(_id).name}\n-------------------------------------\n"
-        _match = False
-        for _trans in self.transactions:
-            if _trans.staff.id == _id:
-                _match = True
-                _data += f"Transaction Id: {_trans.id}\nCustomer: {_trans.customer.name}\n" \
-                         f"Handling Branch: {_trans.branch.name}\nDate: {_trans.datetime}\n" \
-                         f"\n-------------------------------------\n"
-        if not _match:
+        self.get_staff(_id)
+        _transactions = self.get_staff_transactions(_id)
+        if not _transactions:
             raise LookupError("Staff Not in DB")
-        print(_data)
+        return map(self._transaction_record, _transactions)
 
     def get_customer_details(self, _id):
         """
@@ -399,75 +1076,506 @@ class TransactionSystem:
         Parameters
         ----------
         _id : int
-            Id of the staff.
+            Id of the customer.
+
+        Returns
+        -------
+        Iterator
+            TransactionRecord of each transaction in which the customer was involved.
+
+        """
+        self.get_customer(_id)
+        return map(self._transaction_record, self.get_customer_transactions(_id))
+
+    def get_transaction_details(self, start=None, end=None, staff_id=None, customer_id=None, branch_id=None):
+        """
+        Getting the transaction details between two dates
+
+        ...
+
+        Parameters
+        ----------
+        start : datetime or date, optional
+            Transactions on or after this datetime are returned, unbounded if not given.
+
+        end : datetime or date, optional
+            Transactions before this datetime are returned, unbounded if not given.
+
+        staff_id : int, optional
+            Only transactions handled by this staff are returned.
+
+        customer_id : int, optional
+            Only transactions of this customer are returned.
+
+        branch_id : int, optional
+            Only transactions handled by this branch are returned.
+
+        Yields
+        ------
+        PurchaseRecord
+            Each purchase of the matching transactions, sorted by datetime. A transaction without purchases
+            yields one record whose purchase fields are None.
+
+        """
+        for _trans in self.get_transactions_between(start, end, staff_id, customer_id, branch_id):
+            _purchases = self.get_transaction_purchases(_trans.id)
+            if not _purchases:
+                yield PurchaseRecord(_trans.id, _trans.datetime, None, None, None, None, None)
+            for _purchase in _purchases:
+                yield PurchaseRecord(_trans.id, _trans.datetime, _purchase.id, _purchase.product.id,
+                                     _purchase.product.name, _purchase.quantity, _purchase.total_price)
+
+    def get_purchase_facts(self, chunk_size=FACT_CHUNK_SIZE):
+        """
+        Getting every purchase joined with its transaction, staff, customer, branch and product
+
+        Only one chunk of facts is made at a time, so exporting them does not hold a row per purchase in memory.
+
+        ...
 
+        Parameters
+        ----------
+        chunk_size : int
+            Number of facts in a chunk.
+
+        Yields
+        ------
+        list
+            PurchaseFact of up to chunk_size purchases, in the order the purchases were added.
         """
-        _data = f"The Transactions In which the Customer: {self.get_customer(_id).name}" \
-                f" was involved:\n-------------------------------------\n"
-        _match = False
-        for _trans in self.transactions:
-            if _trans.customer.id == _id:
-                _match = True
-                _data += f"Transaction Id: {_trans.id}\nStaff: {_trans.staff.name}\n" \
-                         f"Handling Branch: {_trans.branch.name}\nDate: {_trans.datetime}\n" \
-                         f"-------------------------------------\n"
-        if not _match:
-            LookupError("Customer Not in DB")
-        print(_data)
-
-    def get_transaction_details(self):
-        """ Getting the transaction details """
-
-        _data = f"The Transactions Details are\n-------------------------------------\n"
-        for _trans in self.transactions:
-            print(f"\nFor the Transaction: {_trans.id}")
+        _chunk = []
+        for _purchase in self.purchases:
+            _trans = _purchase.transaction
+            _staff, _customer, _branch, _product = _trans.staff, _trans.customer, _trans.branch, _purchase.product
+            _chunk.append(PurchaseFact(_purchase.id, _trans.id, _trans.datetime, _staff.id, _staff.name,
+                                       _customer.id, _customer.name, _branch.id, _branch.name, _product.id,
+                                       _product.name, _purchase.quantity, _product.price, _purchase.total_price))
+            if len(_chunk) == chunk_size:
+                yield _chunk
+                _chunk = []
+        if _chunk:
+            yield _chunk
+
+    def get_sales_summary(self):
+        """
+        Getting the sales of every staff, customer, branch and product
+
+        The quantities and revenues of all four groups are summed in a single pass over the purchases. The result
+        is kept until the next purchase is added, and get_staff_performance and get_customer_value answer from it
+        while it is kept.
+
+        ...
+
+        Returns
+        -------
+        dict
+            Maps each group ('staff', 'customer', 'branch', 'product') to a dict of Sales keyed by Id. Entities
+            without purchases are left out.
+        """
+        if self._sales_summary is None:
+            _staff, _customer, _branch, _product = _totals = ({}, {}, {}, {})
             for _purchase in self.purchases:
-                if _purchase.transaction.id == _trans.id:
-                    print(f"\nPurchase Id: {_purchase.id}\nProduct Id: {_purchase.product.name}\n"
-                          f"Quantity: {_purchase.quantity}"
-                          f"\nTotal Price: {_purchase.total_price}")
-            print("\n-------------------------------------\n")
+                _trans = _purchase.transaction
+                for _group, _id in ((_staff, _trans.staff_id), (_customer, _trans.customer_id),
+                                    (_branch, _trans.branch_id), (_product, _purchase.product_id)):
+                    _sales = _group.get(_id)
+                    if _sales is None:
+                        _group[_id] = [_purchase.quantity, _purchase.total_price]
+                    else:
+                        _sales[0] += _purchase.quantity
+                        _sales[1] += _purchase.total_price
+            self._sales_summary = {_name: {_id: Sales(*_sales) for _id, _sales in _group.items()}
+                                   for _name, _group in zip(SALES_GROUPS, _totals)}
+        return self._sales_summary
+
+    def _check_group(self, group, id_):
+        """ Checking that an entity of a rollup group is in the system """
+        if group not in _GROUP_LOOKUPS:
+            raise ValueError(f"Unknown Group: {group}")
+        getattr(self, _GROUP_LOOKUPS[group])(id_)
+
+    def get_rollup(self, group, id_, period='month'):
+        """
+        Getting the sales of a staff, customer, branch or product per day or month
 
-    def get_staff_performance(self, _id):
-        """ Getting the staff performance details """
+        ...
+
+        Parameters
+        ----------
+        group : str
+            'staff', 'customer', 'branch' or 'product'.
+
+        id_ : int
+            Id of the staff, customer, branch or product.
+
+        period : str
+            'day' or 'month'.
+
+        Returns
+        -------
+        list
+            RollupRecord of every day or month with purchases, in time order. The period_start of a month is its
+            first day.
+
+        Raises
+        ------
+        ValueError
+            If the group or the period is not known.
+        """
+        self._check_group(group, id_)
+        return [RollupRecord(*_bucket) for _bucket in self._rollup.buckets((group, id_), period)]
+
+    def get_sales_between(self, group, id_, start=None, end=None, period='day'):
+        """
+        Getting the sales of a staff, customer, branch or product over a range of days or months
+
+        The range is answered from prefix sums over the daily or monthly buckets, without reading the purchases.
+        It starts with the day (or month) holding start, and stops before the one holding end.
+
+        ...
+
+        Parameters
+        ----------
+        group : str
+            'staff', 'customer', 'branch' or 'product'.
+
+        id_ : int
+            Id of the staff, customer, branch or product.
+
+        start : datetime or date, optional
+            Sales from the day or month holding start are summed, from the first if not given.
+
+        end : datetime or date, optional
+            Sales before the day or month holding end are summed, up to the last if not given.
+
+        period : str
+            'day' or 'month'.
+
+        Returns
+        -------
+        Sales
+            Quantity sold and revenue over the range.
+
+        Raises
+        ------
+        ValueError
+            If the group or the period is not known.
+        """
+        self._check_group(group, id_)
+        return Sales(*self._rollup.between((group, id_), start, end, period))
+
+    def get_top(self, group, k=10, by='revenue', start=None, end=None, branch_id=None):
+        """
+        Getting the staff, customers, branches or products with the highest sales
+
+        The sales of every entity are summed from the rollup, and the k highest are selected with a heap, so the
+        query costs O(n log k) for n entities with purchases, however many purchases they made. Sales within a branch
+        are summed from the rollup of the entities within that branch.
+
+        ...
+
+        Parameters
+        ----------
+        group : str
+            'staff', 'customer', 'branch' or 'product'.
+
+        k : int
+            Number of entities returned.
+
+        by : str
+            'revenue' or 'quantity'.
+
+        start : datetime or date, optional
+            Sales from the day holding start are summed, from the first if not given.
+
+        end : datetime or date, optional
+            Sales before the day holding end are summed, up to the last if not given.
+
+        branch_id : int, optional
+            Only sales made in this branch are summed.
+
+        Returns
+        -------
+        list
+            SalesRecord of at most k entities with sales, highest first. Entities with equal sales are in the order
+            of their first purchase.
+
+        Raises
+        ------
+        ValueError
+            If the group or by is not known.
+        """
+        if group not in _GROUP_LOOKUPS:
+            raise ValueError(f"Unknown Group: {group}")
+        if by not in Sales._fields:
+            raise ValueError(f"Unknown Ranking: {by}")
+        _index = Sales._fields.index(by)
+        if branch_id is not None:
+            self.get_branch(branch_id)
+        _lookup = getattr(self, _GROUP_LOOKUPS[group])
+        return [SalesRecord(_id, _lookup(_id).name, _quantity, _revenue)
+                for _id, _quantity, _revenue in self._top_sales(group, k, _index, start, end, branch_id)]
+
+    def _top_sales(self, group, k, index, start, end, branch_id):
+        """ Returns the Id, quantity and revenue of the k entities of a group with the highest sales, for get_top """
+        if branch_id is None:
+            return self._rollup.top(group, k, index, start, end)
+        if group == 'branch':
+            # The only branch with sales in a branch is the branch itself
+            _sales = self._rollup.between(('branch', branch_id), start, end)
+            return [(branch_id, *_sales)] if k > 0 and any(_sales) else []
+        return self._rollup.top(group, k, index, start, end, branch_id)
+
+    def _purchase_totals(self, transactions_):
+        """
+        Summing the purchases of the given transactions
+
+        ...
+
+        Parameters
+        ----------
+        transactions_ : list
+            Transactions whose purchases are summed.
+
+        Returns
+        -------
+        Sales
+            Total quantity and total price of the purchases.
+        """
         _quantity = 0
         _total_price = 0
-        _match = False
-        for _trans in self.transactions:
-            if _trans.staff.id == _id:
-                _match = True
-                for _purchase in self.purchases:
-                    if _purchase.transaction.id == _trans.id:
-                        _quantity += _purchase.quantity
-                        _total_price += _purchase.total_price
-        if not _match:
+        for _trans in transactions_:
+            for _purchase in self.get_transaction_purchases(_trans.id):
+                _quantity += _purchase.quantity
+                _total_price += _purchase.total_price
+        return Sales(_quantity, _total_price)
+
+    def cache_info(self):
+        """
+        Returns the hits, misses, capacity and size of the query cache, as a CacheInfo
+        """
+        return self._query_cache.info()
+
+    def clear_cache(self):
+        """
+        Empties the query cache, which is only needed if entities were changed other than through the add_* methods
+        """
+        self._query_cache.clear()
+
+    def _cached(self, query, id_, compute):
+        """
+        Returns the cached result of a query, or computes and caches it
+
+        Queries which raise are not cached.
+
+        ...
+
+        Parameters
+        ----------
+        query : str
+            Name of the query.
+
+        id_ : int
+            Id the query is about.
+
+        compute : callable
+            Computes the result of the query from id_.
+
+        Returns
+        -------
+        object
+            Result of the query.
+        """
+        _result = self._query_cache.get(query, id_)
+        if _result is None:
+            _result = compute(id_)
+            self._query_cache.put(query, id_, _result)
+        return _result
+
+    def get_staff_performance(self, _id):
+        """
+        Getting the staff performance details
+
+        ...
+
+        Parameters
+        ----------
+        _id : int
+            Id of the staff.
+
+        Returns
+        -------
+        SalesRecord
+            Number of products sold by the staff and their total monetary value.
+
+        """
+        return self._cached('staff_performance', _id, self._staff_performance)
+
+    def _staff_performance(self, _id):
+        """ Computing get_staff_performance """
+        _transactions = self.get_staff_transactions(_id)
+        if not _transactions:
             raise LookupError("Staff Not in DB")
+        if self._sales_summary is not None:
+            _quantity, _total_price = self._sales_summary['staff'].get(_id, Sales(0, 0))
+        else:
+            _quantity, _total_price = self._purchase_totals(_transactions)
 
-        print(f"The Number of Products sold by Staff {self.get_staff(_id).name} is"
-              f" {_quantity} and Total Monetary Value: {_total_price}")
+        return SalesRecord(_id, self.get_staff(_id).name, _quantity, _total_price)
 
     def get_customer_value(self, _id):
-        """ Getting the customer value details """
-        _quantity = 0
-        _total_price = 0
-        _match = False
-        for _trans in self.transactions:
-            if _trans.customer.id == _id:
-                _match = True
-                for _purchase in self.purchases:
-                    if _purchase.transaction.id == _trans.id:
-                        _quantity += _purchase.quantity
-                        _total_price += _purchase.total_price
-        if not _match:
+        """
+        Getting the customer value details
+
+        ...
+
+        Parameters
+        ----------
+        _id : int
+            Id of the customer.
+
+        Returns
+        -------
+        SalesRecord
+            Number of products bought by the customer and their total monetary value.
+
+        """
+        return self._cached('customer_value', _id, self._customer_value)
+
+    def _customer_value(self, _id):
+        """ Computing get_customer_value """
+        _transactions = self.get_customer_transactions(_id)
+        if not _transactions:
             raise LookupError("Customer Not in DB")
+        if self._sales_summary is not None:
+            _quantity, _total_price = self._sales_summary['customer'].get(_id, Sales(0, 0))
+        else:
+            _quantity, _total_price = self._purchase_totals(_transactions)
 
-        print(f"The Number of Products Bought by Customer {self.get_customer(_id).name} is {_quantity}"
-              f" and Total Monetary Value: {_total_price}")
+        return SalesRecord(_id, self.get_customer(_id).name, _quantity, _total_price)
 
     def get_branch_inventory(self, _id):
-        """ Getting the branch inventory details """
-        _branch = self.get_branch(_id)
-        print(f"\n\nThe Inventory Details for Branch:"
-              f" {self.get_branch(_id).name}\n--------------------------------\n\n")
-        for _product in _branch.products:
-            print(f"The Inventory for Product: {_product[0].id} is {_product[1]}")
+        """
+        Getting the branch inventory details
+
+        ...
+
+        Parameters
+        ----------
+        _id : int
+            Id of the branch.
+
+        Returns
+        -------
+        list
+            InventoryRecord of each product of the branch.
+
+        """
+        # Cached as a tuple, so changes to the returned list do not reach the cache
+        return list(self._cached('branch_inventory', _id, self._branch_inventory))
+
+    def _branch_inventory(self, _id):
+        """ Computing get_branch_inventory, as a tuple """
+        return tuple(InventoryRecord(_id, _product_id, _count)
+                     for _product_id, _count in self.get_branch(_id).products.items())
+
+    def get_stock(self, branch_id, product_id):
+        """
+        Getting the inventory of a product in a branch
+
+        ...
+
+        Parameters
+        ----------
+        branch_id : int
+            Id of the branch.
+
+        product_id : int
+            Id of the product.
+
+        Returns
+        -------
+        int
+            Inventory of the product, 0 if the branch does not stock it.
+        """
+        return self.get_branch(branch_id).products.get(product_id, 0)
+
+    def get_product_stock(self, product_id):
+        """
+        Getting the total inventory of a product across every branch
+
+        ...
+
+        Parameters
+        ----------
+        product_id : int
+            Id of the product.
+
+        Returns
+        -------
+        int
+            Sum of the inventory of the product in every branch.
+        """
+        self.get_product(product_id)
+        return self._stock_totals.get(product_id, 0)
+
+    def get_branches_stocking(self, product_id):
+        """
+        Getting the branches which have a product in stock
+
+        ...
+
+        Parameters
+        ----------
+        product_id : int
+            Id of the product.
+
+        Returns
+        -------
+        list
+            InventoryRecord of each branch whose inventory of the product is above 0.
+        """
+        self.get_product(product_id)
+        return [InventoryRecord(_branch_id, product_id, _count)
+                for _branch_id, _count in self._stock_by_product.get(product_id, {}).items() if _count > 0]
+
+    def get_low_stock(self, threshold, branch_id=None):
+        """
+        Getting the inventory which is below a threshold
+
+        ...
+
+        Parameters
+        ----------
+        threshold : int
+            Inventory below which a product is low on stock.
+
+        branch_id : int, optional
+            Only the inventory of this branch is scanned, every branch if not given.
+
+        Returns
+        -------
+        list
+            InventoryRecord of each product of a branch whose inventory is below threshold.
+        """
+        _branches = self._branch_index.values() if branch_id is None else (self.get_branch(branch_id),)
+        return [InventoryRecord(_branch.id, _product_id, _count)
+                for _branch in _branches for _product_id, _count in _branch.products.items() if _count < threshold]
+
+    def get_inventory_matrix(self):
+        """
+        Getting the branch x product inventory matrix
+
+        ...
+
+        Returns
+        -------
+        tuple
+            Branch Ids (the rows), Product Ids (the columns), and the rows as lists of inventories, with 0 for the
+            products a branch does not stock.
+        """
+        _product_ids = list(self._product_index)
+        _branch_ids = list(self._branch_index)
+        _rows = [[_branch.products.get(_product_id, 0) for _product_id in _product_ids]
+                 for _branch in self._branch_index.values()]
+        return _branch_ids, _product_ids, _rows
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+""" Compiled Validators
+
+This module compiles the rules of the record schemas (field types, required fields, unknown fields, validators such
+as Range and Email, and @validates hooks) into one specialised Python function per schema, which checks a record
+without going through marshmallow's per field dispatch.
+
+The compiled function only decides whether a record is valid exactly as it is. Anything it does not accept outright,
+whether an invalid record or one marshmallow would coerce (such as "100000" for an Integer), is handed to the schema
+itself, so the loaded data and the ValidationError.messages are the same as marshmallow's.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * marshmallow - lightweight Object serialization and deserialization package.
+    * schema - class for validating the responses from the web api and creating instance of TransactionSystem
+
+This file contains the following Classes:
+
+    * CompiledSchema - This class validates single records with the function compiled from a schema.
+
+    * CompiledTransactionSystemSchema - This class validates the full data from the response with compiled
+      schemas and creates the instance of TransactionSystem.
+
+This file contains the following functions:
+
+    * compile_schema - Returns the function compiled from a schema, or None if the schema cannot be compiled.
+
+"""
+# Built-In Packages
+import math
+from datetime import datetime
+
+# External Packages
+from marshmallow import fields, validate, ValidationError, RAISE, EXCLUDE
+from marshmallow.decorators import VALIDATES
+from marshmallow.utils import missing
+
+# User Packages
+from schema import TransactionSystemSchema
+
+__author__ = 'praveen@gyandata.com'
+
+# Exceptions which make the compiled function hand a record back to the schema
+_FALLBACK_ERRORS = (KeyError, TypeError, ValueError, OverflowError, ValidationError)
+
+
+def _validates_hooks(schema):
+    """
+    Finding the @validates hooks of a schema
+
+    ...
+
+    Parameters
+    ----------
+    schema : Schema
+        Schema whose hooks are found.
+
+    Returns
+    -------
+    dict or None
+        Bound hooks keyed by field name, None if the schema has hooks other than @validates.
+    """
+    _hooks = {}
+    try:
+        for _tag, _entries in schema._hooks.items():
+            if not _entries:
+                continue
+            if _tag != VALIDATES:
+                return None
+            for _attr, _many, _kwargs in _entries:
+                _hooks.setdefault(_kwargs['field_name'], []).append(getattr(schema, _attr))
+    except (TypeError, ValueError, KeyError):
+        return None
+    return _hooks
+
+
+def _range_check(name, rule, namespace):
+    """ Returns the source of the condition that a Range validator rejects the value name """
+    _bounds = []
+    if rule.min is not None:
+        namespace[f"{name}_min"] = rule.min
+        _bounds.append(f"{name} {'<' if rule.min_inclusive else '<='} {name}_min")
+    if rule.max is not None:
+        namespace[f"{name}_max"] = rule.max
+        _bounds.append(f"{name} {'>' if rule.max_inclusive else '>='} {name}_max")
+    return ' or '.join(_bounds)
+
+
+def _field_source(name, field_, namespace):
+    """
+    Making the source which checks and converts one field value
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        Name of the local variable holding the value.
+
+    field_ : Field
+        Field whose rules are compiled.
+
+    namespace : dict
+        Globals of the compiled function, to which the objects the source refers to are added.
+
+    Returns
+    -------
+    list or None
+        Lines of the source, None if the field type is not supported.
+    """
+    _type = type(field_)
+    if _type is fields.Integer:
+        _lines = [f"if type({name}) is not int: return None"]
+    elif _type is fields.Float:
+        namespace['_isfinite'] = math.isfinite
+        _lines = [f"if type({name}) is int: {name} = float({name})",
+                  f"elif type({name}) is not float: return None",
+                  f"if not _isfinite({name}): return None"]
+    elif _type in (fields.String, fields.Email):
+        _lines = [f"if type({name}) is not str: return None"]
+    elif _type is fields.DateTime:
+        _format = field_.format or field_.DEFAULT_FORMAT
+        _lines = [f"if type({name}) is not str: return None"]
+        if _format in field_.DESERIALIZATION_FUNCS:
+            namespace[f"{name}_parse"] = field_.DESERIALIZATION_FUNCS[_format]
+            _lines.append(f"{name} = {name}_parse({name})")
+        else:
+            namespace['_strptime'] = datetime.strptime
+            namespace[f"{name}_format"] = _format
+            _lines.append(f"{name} = _strptime({name}, {name}_format)")
+    else:
+        return None
+
+    for _index, _rule in enumerate(field_.validators):
+        if type(_rule) is validate.Range:
+            _condition = _range_check(name, _rule, namespace)
+            if _condition:
+                _lines.append(f"if {_condition}: return None")
+        else:
+            namespace[f"{name}_rule{_index}"] = _rule
+            _lines.append(f"if {name}_rule{_index}({name}) is False: return None")
+    return _lines
+
+
+def compile_schema(schema):
+    """
+    Compiling the rules of a record schema into one function
+
+    The function takes a record and returns the loaded data if the record is valid as it is, None otherwise.
+    Schemas using features that are not compiled (other field types, load defaults, pre/post load and schema
+    level hooks, unknown=INCLUDE) are not compiled at all.
+
+    ...
+
+    Parameters
+    ----------
+    schema : Schema
+        Record schema (not many=True) to be compiled.
+
+    Returns
+    -------
+    function or None
+        Compiled function, None if the schema cannot be compiled.
+    """
+    _hooks = _validates_hooks(schema)
+    if _hooks is None or schema.many or schema.unknown not in (RAISE, EXCLUDE):
+        return None
+
+    namespace = {'_missing': missing}
+    _body = []
+    _output = []
+    _keys = set()
+    _all_required = True
+    for _index, (_attr, _field) in enumerate(schema.load_fields.items()):
+        _name = f"v{_index}"
+        _key = _field.data_key if _field.data_key is not None else _attr
+        _keys.add(_key)
+        _lines = _field_source(_name, _field, namespace)
+        if _lines is None or _field.load_default is not missing:
+            return None
+        for _hook_index, _hook in enumerate(_hooks.pop(_attr, [])):
+            namespace[f"{_name}_hook{_hook_index}"] = _hook
+            _lines.append(f"{_name}_hook{_hook_index}({_name})")
+        _out = repr(_field.attribute or _attr)
+        if _field.required:
+            _body.append(f"{_name} = record[{_key!r}]")
+            _body.extend(_lines)
+            _body.append(f"data[{_out}] = {_name}")
+        else:
+            _all_required = False
+            _body.append(f"{_name} = record.get({_key!r}, _missing)")
+            _body.append(f"if {_name} is not _missing:")
+            _body.extend(f"    {_line}" for _line in _lines)
+            _body.append(f"    data[{_out}] = {_name}")
+        _output.append(_out)
+    if _hooks:
+        # Hooks on fields the schema does not load
+        return None
+
+    _source = ["def check(record):", "    if type(record) is not dict: return None"]
+    if schema.unknown == RAISE:
+        if _all_required:
+            _source.append(f"    if len(record) != {len(_keys)}: return None")
+        else:
+            namespace['_keys'] = frozenset(_keys)
+            _source.append("    if not _keys.issuperset(record): return None")
+    _source += ["    data = {}", "    try:"]
+    _source += [f"        {_line}" for _line in _body]
+    _source += ["    except _fallback_errors:", "        return None", "    return data"]
+
+    namespace['_fallback_errors'] = _FALLBACK_ERRORS
+    exec(compile('\n'.join(_source), f"<compiled {type(schema).__name__}>", 'exec'), namespace)
+    return namespace['check']
+
+
+class CompiledSchema:
+    """
+    CompiledSchema class which validates single records with the function compiled from a schema.
+
+    ...
+
+    Attributes
+    ----------
+    schema : Schema
+        Record schema the function was compiled from, and which records the function does not accept are
+        handed to.
+
+    Methods
+    -------
+    load(record)
+        Returns the loaded record, same as schema.load.
+
+    load_many(records)
+        Returns the loaded records and the error messages of the invalid ones, keyed by their index.
+
+    """
+    def __init__(self, schema):
+        self.schema = schema
+        self._check = compile_schema(schema)
+
+    def load(self, record):
+        """
+        Loading a record
+
+        ...
+
+        Parameters
+        ----------
+        record : dict
+            Record as decoded from the response.
+
+        Returns
+        -------
+        dict
+            Loaded record.
+
+        Raises
+        ------
+        ValidationError
+            If the record is invalid, with the messages of the schema.
+        """
+        if self._check is not None:
+            _data = self._check(record)
+            if _data is not None:
+                return _data
+        return self.schema.load(record)
+
+    def load_many(self, records):
+        """
+        Loading a list of records
+
+        ...
+
+        Parameters
+        ----------
+        records : list
+            Records as decoded from the response.
+
+        Returns
+        -------
+        tuple
+            List of the loaded valid records, and dict of error messages keyed by the index of the invalid records.
+        """
+        _check = self._check
+        _load = self.schema.load
+        _loaded = []
+        _errors = {}
+        for _index, _record in enumerate(records):
+            _data = _check(_record) if _check is not None else None
+            if _data is None:
+                try:
+                    _data = _load(_record)
+                except ValidationError as err:
+                    _errors[_index] = err.messages
+                    continue
+            _loaded.append(_data)
+        return _loaded, _errors
+
+
+class CompiledTransactionSystemSchema:
+    """
+    CompiledTransactionSystemSchema class which validates the full data from the response with compiled schemas.
+
+    It is a drop in for TransactionSystemSchema: load returns the same TransactionSystem and raises the same
+    ValidationError.
+
+    ...
+
+    Methods
+    -------
+    load(data)
+        Returns the TransactionSystem populated with the data from the response.
+
+    """
+    def __init__(self):
+        self._schema = TransactionSystemSchema()
+        self._record_schemas = {_name: CompiledSchema(type(_field.schema)())
+                                for _name, _field in self._schema.fields.items()}
+
+    def record_schema(self, section):
+        """
+        Returns the compiled record schema of a section
+
+        ...
+
+        Parameters
+        ----------
+        section : str
+            Name of the section.
+
+        Returns
+        -------
+        CompiledSchema
+            Compiled schema of the records of the section.
+        """
+        return self._record_schemas[section]
+
+    def load(self, data):
+        """
+        Validating the response and creating the transaction system
+
+        ...
+
+        Parameters
+        ----------
+        data : dict
+            Json response from the web api.
+
+        Returns
+        -------
+        TransactionSystem
+            Populates the transaction system class with data from response and returns an instance of it.
+
+        Raises
+        ------
+        ValidationError
+            If the response is invalid, with the same messages as TransactionSystemSchema.
+        """
+        if type(data) is not dict:
+            return self._schema.load(data)
+
+        _loaded = {}
+        _errors = {}
+        for _section, _records in data.items():
+            if _section not in self._record_schemas:
+                _errors[_section] = ['Unknown field.']
+            elif type(_records) is not list:
+                try:
+                    self._schema.fields[_section].deserialize(_records)
+                except ValidationError as err:
+                    _errors[_section] = err.messages
+            else:
+                _loaded[_section], _section_errors = self._record_schemas[_section].load_many(_records)
+                if _section_errors:
+                    _errors[_section] = _section_errors
+        if _errors:
+            raise ValidationError(_errors)
+        return self._schema.make_transaction_system(_loaded)
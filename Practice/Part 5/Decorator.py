@@ -1 +1,404 @@
-print("Decorator File")
+# -*- coding: utf-8 -*-
+""" Instrumentation Decorators
+
+This module has decorators and context managers which record the wall time, the number of calls and the allocation
+delta of functions and blocks of code, and log them as structured JSON through the logging configuration of the
+application (Assignment/Part 5/SerializationLog.json).
+
+Recording a call costs two perf_counter_ns calls and a dict update. The allocation delta is only measured while
+tracemalloc is tracing, so it costs nothing unless tracemalloc was started, and one JSON line per call is only
+formatted when the metrics logger is enabled for DEBUG. Totals of every metric are kept in a Metrics registry and
+can be logged at INFO, which keeps the overhead low enough to leave the instrumentation on.
+
+Run as a script, it loads Assignment/Part 5/Responses/date.json with every TransactionSystem query instrumented and
+tracemalloc tracing, and logs the totals to Serialization.log next to this script, or to the file given with
+--log-file. supermarket.py instruments the same loaders and queries when run with --metrics. The response is
+loaded three ways: through the marshmallow schema with each load phase (JSON decode, validation and post_load
+linking) recorded apart, through loader.load_stream, which decodes, validates and links record by record and is
+recorded as a whole, and through snapshot.load_cached, cold and then warm.
+
+This script requires that the following packages be installed within the Python
+environment you are running this script in.
+
+    * argparse - To read the command line arguments
+    * logging - To log the metrics
+    * json - To format the metrics
+    * time - To time the calls
+    * tracemalloc - To measure the allocation deltas
+    * tempfile - For the snapshot cache of the script
+
+This file contains the following Classes:
+
+    * Metrics - This class keeps the totals of the recorded metrics.
+
+    * Measure - Context manager which records the metrics of a block of code.
+
+This file contains the following functions:
+
+    * timed - Decorator which records the metrics of every call of a function.
+    * instrument - Decorates the methods of a class, or the functions of a module, with timed.
+    * load_instrumented - Loads a response file, recording the metrics of each load phase.
+    * main - Loads the sample response and runs the queries with the instrumentation on.
+
+"""
+# Built-In Packages
+import argparse
+import functools
+import json
+import logging
+import logging.config
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+__author__ = 'praveen@gyandata.com'
+
+METRICS_LOGGER = 'metrics'
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ASSIGNMENT_DIR = os.path.join(SCRIPT_DIR, os.pardir, os.pardir, 'Assignment', 'Part 5')
+
+LOG_FILE = os.path.join(SCRIPT_DIR, 'Serialization.log')
+
+logger = logging.getLogger(METRICS_LOGGER)
+
+
+class Metrics:
+    """
+    Metrics class which keeps the totals of the recorded metrics.
+
+    ...
+
+    Methods
+    -------
+    record(name, wall_ns, alloc_bytes=None)
+        Adds a call to the totals of a metric.
+
+    snapshot()
+        Returns the totals of every metric.
+
+    reset()
+        Forgets every metric.
+
+    log_summary(log=logger)
+        Logs the totals of every metric as JSON.
+
+    """
+    def __init__(self):
+        self._totals = {}
+
+    def record(self, name, wall_ns, alloc_bytes=None):
+        """
+        Adding a call to the totals of a metric
+
+        ...
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric.
+
+        wall_ns : int
+            Wall time of the call in nanoseconds.
+
+        alloc_bytes : int, optional
+            Change of the traced memory over the call, None if tracemalloc was not tracing.
+
+        Returns
+        -------
+        int
+            Number of calls of the metric so far.
+        """
+        _total = self._totals.get(name)
+        if _total is None:
+            _total = self._totals[name] = [0, 0, 0, None]
+        _total[0] += 1
+        _total[1] += wall_ns
+        if wall_ns > _total[2]:
+            _total[2] = wall_ns
+        if alloc_bytes is not None:
+            _total[3] = (_total[3] or 0) + alloc_bytes
+        return _total[0]
+
+    def snapshot(self):
+        """
+        Returns the calls, total and max wall time in ms and total allocation delta of every metric, the allocation
+        delta is None if it was never measured
+        """
+        return {_name: {'calls': _calls, 'wall_ms': _wall / 1e6, 'max_ms': _max / 1e6, 'alloc_bytes': _alloc}
+                for _name, (_calls, _wall, _max, _alloc) in self._totals.items()}
+
+    def reset(self):
+        """ Forgets every metric """
+        self._totals.clear()
+
+    def log_summary(self, log=logger):
+        """ Logs the totals of every metric at INFO, one JSON line per metric """
+        if log.isEnabledFor(logging.INFO):
+            for _name, _total in self.snapshot().items():
+                log.info(json.dumps({'metric': _name, 'summary': True, **_total}))
+
+
+METRICS = Metrics()
+
+
+def _finish_recorded(name, wall_ns, alloc_bytes, metrics, log):
+    """ Recording a call, and logging it if the logger is enabled for DEBUG """
+    _calls = metrics.record(name, wall_ns, alloc_bytes)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(json.dumps({'metric': name, 'wall_ms': wall_ns / 1e6, 'alloc_bytes': alloc_bytes,
+                              'calls': _calls}))
+
+
+def _finish(name, start_ns, start_alloc, metrics, log):
+    """ Recording a call which started at start_ns, with the traced memory at start_alloc """
+    _wall = time.perf_counter_ns() - start_ns
+    _alloc = tracemalloc.get_traced_memory()[0] - start_alloc if start_alloc is not None else None
+    _finish_recorded(name, _wall, _alloc, metrics, log)
+
+
+class Measure:
+    """
+    Measure context manager which records the metrics of a block of code.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        Name of the metric.
+
+    metrics : Metrics
+        Registry the metric is recorded in.
+
+    log : Logger
+        Logger each run of the block is logged with.
+
+    """
+    def __init__(self, name, metrics=METRICS, log=logger):
+        self.name = name
+        self.metrics = metrics
+        self.log = log
+        self._start = None
+        self._alloc = None
+
+    def __enter__(self):
+        self._alloc = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _finish(self.name, self._start, self._alloc, self.metrics, self.log)
+
+
+def timed(name=None, metrics=METRICS, log=logger):
+    """
+    Decorator recording the metrics of every call of a function
+
+    Calls which raise are recorded too. A function returning an iterator is timed until it returns the iterator,
+    not while the iterator is consumed.
+
+    ...
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of the metric, the qualified name of the function if not given.
+
+    metrics : Metrics
+        Registry the metric is recorded in.
+
+    log : Logger
+        Logger each call is logged with.
+
+    Returns
+    -------
+    function
+        Decorator.
+    """
+    def decorator(func):
+        _name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _alloc = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+            _start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _finish(_name, _start, _alloc, metrics, log)
+        wrapper.__instrumented__ = True
+        return wrapper
+    return decorator
+
+
+def instrument(cls, names=None, metrics=METRICS, log=logger):
+    """
+    Decorating the methods of a class, or the functions of a module, with timed, in place
+
+    ...
+
+    Parameters
+    ----------
+    cls : type or module
+        Class whose methods are decorated, or module whose functions are decorated. Code which imported a
+        function from the module before keeps calling it undecorated.
+
+    names : Iterable, optional
+        Names of the methods, every public method starting with get_ if not given.
+
+    metrics : Metrics
+        Registry the metrics are recorded in.
+
+    log : Logger
+        Logger each call is logged with.
+
+    Returns
+    -------
+    type
+        The class, so instrument can be used as a class decorator.
+    """
+    if names is None:
+        names = [_name for _name in dir(cls) if _name.startswith('get_')]
+    for _name in names:
+        _method = getattr(cls, _name)
+        if getattr(_method, '__instrumented__', False):
+            continue
+        _raw = cls.__dict__.get(_name)
+        if isinstance(_raw, staticmethod):
+            setattr(cls, _name, staticmethod(timed(f"{cls.__name__}.{_name}", metrics, log)(_raw.__func__)))
+        else:
+            setattr(cls, _name, timed(f"{cls.__name__}.{_name}", metrics, log)(_method))
+    return cls
+
+
+def load_instrumented(path, schema, metrics=METRICS, log=logger):
+    """
+    Loading a response file, recording the metrics of each load phase
+
+    The JSON decode is recorded as load.json_decode, the post_load linking as load.linking and the validation,
+    which is the rest of the schema load, as load.validation.
+
+    ...
+
+    Parameters
+    ----------
+    path : str
+        Path of the response file.
+
+    schema : Schema
+        TransactionSystemSchema instance the response is loaded with.
+
+    metrics : Metrics
+        Registry the metrics are recorded in.
+
+    log : Logger
+        Logger the phases are logged with.
+
+    Returns
+    -------
+    TransactionSystem
+        Transaction system populated with the data from the response.
+    """
+    with Measure('load.json_decode', metrics, log):
+        with open(path, 'r') as json_file:
+            _data = json.load(json_file)
+
+    _link = schema.make_transaction_system
+    _linking = []
+
+    def make_transaction_system(data, **kwargs):
+        _alloc = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        _start = time.perf_counter_ns()
+        try:
+            return _link(data, **kwargs)
+        finally:
+            _wall = time.perf_counter_ns() - _start
+            _alloc = tracemalloc.get_traced_memory()[0] - _alloc if _alloc is not None else None
+            _linking.append((_wall, _alloc))
+            _finish_recorded('load.linking', _wall, _alloc, metrics, log)
+
+    # Timing the post_load hook on this instance only, the bound method is what marshmallow calls
+    schema.make_transaction_system = make_transaction_system
+    _alloc = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    _start = time.perf_counter_ns()
+    try:
+        return schema.load(_data)
+    finally:
+        _wall = time.perf_counter_ns() - _start - sum(_ns for _ns, _ in _linking)
+        if _alloc is not None:
+            _alloc = tracemalloc.get_traced_memory()[0] - _alloc - sum(_bytes or 0 for _, _bytes in _linking)
+        del schema.make_transaction_system
+        _finish_recorded('load.validation', _wall, _alloc, metrics, log)
+
+
+def main(argv=None):
+    """
+    Loads the sample response and runs every query of the transaction system with the instrumentation on
+
+    ...
+
+    Parameters
+    ----------
+    argv : list, optional
+        Command line arguments, sys.argv[1:] if not given.
+    """
+    parser = argparse.ArgumentParser(description="Load the sample response and log the metrics of every query")
+    parser.add_argument('--log-file', default=LOG_FILE, help=f"File the metrics are logged to (default {LOG_FILE})")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ASSIGNMENT_DIR)
+    # pylint: disable=import-outside-toplevel
+    import loader
+    import snapshot
+    from schema import TransactionSystemSchema
+    from transaction import TransactionSystem
+
+    with open(os.path.join(ASSIGNMENT_DIR, 'SerializationLog.json'), 'r') as f:
+        _config = json.load(f)
+    for _handler in _config['handlers'].values():
+        if 'filename' in _handler:
+            _handler['filename'] = args.log_file
+    # The metrics logger logs the totals only, every call is logged at DEBUG
+    logging.config.dictConfig(_config)
+    tracemalloc.start()
+
+    instrument(TransactionSystem)
+    instrument(loader, ['load_stream'])
+    instrument(snapshot, ['load_cached'])
+    _response = os.path.join(ASSIGNMENT_DIR, 'Responses', 'date.json')
+    with open(_response, 'r') as json_file:
+        loader.load_stream(json_file, compiled=True)
+    _cache_dir = tempfile.mkdtemp()
+    try:
+        snapshot.load_cached(_response, _cache_dir)
+        snapshot.load_cached(_response, _cache_dir)
+    finally:
+        shutil.rmtree(_cache_dir)
+
+    _ts = load_instrumented(_response, TransactionSystemSchema())
+    for _staff in _ts.staffs:
+        try:
+            list(_ts.get_staff_details(_staff.id))
+            _ts.get_staff_performance(_staff.id)
+        except LookupError:
+            continue
+    for _customer in _ts.customers:
+        try:
+            list(_ts.get_customer_details(_customer.id))
+            _ts.get_customer_value(_customer.id)
+        except LookupError:
+            continue
+    for _branch in _ts.branches:
+        _ts.get_branch_inventory(_branch.id)
+    list(_ts.get_transaction_details())
+    tracemalloc.stop()
+    METRICS.log_summary()
+
+
+if __name__ == '__main__':
+    main()